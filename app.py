@@ -1,28 +1,17 @@
 import streamlit as st
-import subprocess
-import os
-import re
-from pinecone import Pinecone, ServerlessSpec
-import redis
-import json
-import tempfile
 from dotenv import load_dotenv
-import random
+import functools
 import time
-import hashlib
-from config import CONFIG, costs_per_min
+import tempfile
+from datetime import datetime
+from resources import get_user_store, start_metrics
+from users import SESSION_COOKIE, SESSION_TTL
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Redis client for metadata transfer
-redis_client = redis.Redis(
-    host=os.getenv('REDIS_HOST', 'localhost'),
-    port=int(os.getenv('REDIS_PORT', 6380)),  # Azure Cache for Redis uses 6380
-    password=os.getenv('REDIS_PASSWORD', None),
-    ssl=os.getenv('REDIS_SSL', 'True').lower() == 'true',  # Enable SSL for Azure Cache
-    decode_responses=True
-)
+# Call-setup metrics endpoint, if configured (once per process)
+start_metrics()
 
 # Set page config first thing
 st.set_page_config(
@@ -73,70 +62,58 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Helper function to beautify names
-def beautify_name(name):
-    if not name or ":" not in name:
-        return name
-    provider, model = name.split(":", 1)
-    return f"{model} ({provider.upper() + '(Experimental)' if provider == 'iitm' else provider.capitalize()})"
-
-# Format functions with badge-like cost display
-def format_stt_model(name):
-    cost = costs_per_min["STT"].get(name, None)
-    display_name = beautify_name(name)
-    return f"{display_name} - [{'$'+str(cost)+'/min' if cost is not None else 'Cost N/A'}]"
-
-def format_llm_model(name):
-    cost = costs_per_min["LLM"].get(name, None)
-    display_name = beautify_name(name)
-    return f"{display_name} - [{'$'+str(cost)+'/min' if cost is not None else 'Cost N/A'}]"
-
-def format_tts_voice(name):
-    provider = st.session_state.tts_provider
-    cost = costs_per_min["TTS"].get(provider, None)
-    display_name = beautify_name(name)
-    return f"{display_name} - [{'$'+str(cost)+'/min' if cost is not None else 'Cost N/A'}]"
-
-# User Authentication System
+# User Authentication System: accounts and sessions live in Redis, so any replica can
+# serve any operator. The session token is kept in a cookie, which the browser sends with
+# every reload and reconnect; it never appears in the URL, browser history or shared links
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 if 'user' not in st.session_state:
     st.session_state.user = None
-if 'users_db' not in st.session_state:
-    st.session_state.users_db = {
-        "admin@gmail.com": {
-            "password": hashlib.sha256("admin123".encode()).hexdigest(),
-            "name": "Admin User",
-            "role": "admin"
-        },
-        "user@gmail.com": {
-            "password": hashlib.sha256("user123".encode()).hexdigest(),
-            "name": "Demo User",
-            "role": "user"
-        }
-    }
+cookie_token = st.context.cookies.to_dict().get(SESSION_COOKIE)
+if cookie_token and not st.session_state.authenticated and not st.session_state.get("session_cookie_checked"):
+    st.session_state.session_cookie_checked = True
+    try:
+        user = get_user_store().get_session(cookie_token)
+    except Exception:
+        user = None
+    if user:
+        st.session_state.authenticated = True
+        st.session_state.user = user
+        st.session_state.session_token = cookie_token
+    else:
+        st.session_state.clear_session_cookie = True
+
+def write_session_cookie(token, max_age=SESSION_TTL):
+    """Set the session cookie from a zero-height component; ``max_age=0`` deletes it."""
+    st.iframe(
+        f"<script>window.parent.document.cookie = '{SESSION_COOKIE}={token}; Max-Age={max_age}; Path=/; "
+        "SameSite=Strict' + (window.parent.location.protocol === 'https:' ? '; Secure' : '');</script>",
+        height="content",
+    )
 
 def authenticate(username, password):
-    if username in st.session_state.users_db:
-        stored_password = st.session_state.users_db[username]["password"]
-        hashed_input_pwd = hashlib.sha256(password.encode()).hexdigest()
-        if stored_password == hashed_input_pwd:
-            st.session_state.authenticated = True
-            st.session_state.user = {
-                "email": username,
-                "name": st.session_state.users_db[username]["name"],
-                "role": st.session_state.users_db[username]["role"]
-            }
-            return True
-    return False
+    user = get_user_store().authenticate(username, password)
+    if user is None:
+        return False
+    st.session_state.session_token = get_user_store().create_session(user)
+    st.session_state.pop("clear_session_cookie", None)
+    st.session_state.authenticated = True
+    st.session_state.user = user
+    return True
 
 def logout():
+    token = st.session_state.pop("session_token", None)
+    if token:
+        get_user_store().end_session(token)
+    st.session_state.clear_session_cookie = True
     st.session_state.authenticated = False
     st.session_state.user = None
     st.rerun()
 
 # Show login page if not authenticated
 if not st.session_state.authenticated:
+    if st.session_state.pop("clear_session_cookie", False):
+        write_session_cookie("", max_age=0)
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         st.markdown("""
@@ -153,50 +130,99 @@ if not st.session_state.authenticated:
                 login_button = st.form_submit_button("🚀 Login", use_container_width=True)
                 
                 if login_button:
-                    if authenticate(username, password):
-                        st.success("✅ Login successful!")
-                        st.rerun()
+                    try:
+                        authenticated = authenticate(username, password)
+                    except Exception as e:
+                        st.error(f"❌ Login is unavailable right now: {str(e)}")
                     else:
-                        st.error("❌ Invalid email or password")
+                        if authenticated:
+                            st.success("✅ Login successful!")
+                            st.rerun()
+                        else:
+                            st.error("❌ Invalid email or password")
 else:
-    # Initialize Pinecone
-    api_key = os.getenv("PINECONE_API_KEY")
-    pc = Pinecone(api_key=api_key)
-    assistant = pc.assistant.Assistant(assistant_name="test-rag")
-
-    # Provider-dependent model mappings
-    PROVIDER_MODEL_MAPPING = {
-        "STT": {
-            "azure": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("azure:")],
-            "sarvam": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("sarvam:")],
-            "deepgram": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("deepgram:")],
-            # "google": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("google:")],
-            "openai": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("openai:")],
-            "iitm": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("iitm:")],
-            "groq": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("groq:")],
-        },
-        "LLM": {
-            "openai": [model for model in CONFIG["LLM"]["model"]["enum"] if model.startswith("openai:")],
-            # "deepseek": [model for model in CONFIG["LLM"]["model"]["enum"] if model.startswith("deepseek:")],
-            # "google": [model for model in CONFIG["LLM"]["model"]["enum"] if model.startswith("google:")],
-            # "groq": [model for model in CONFIG["LLM"]["model"]["enum"] if model.startswith("groq:")],
-            "togetherai": [model for model in CONFIG["LLM"]["model"]["enum"] if model.startswith("togetherai:")],
-        },
-        "TTS": {
-            "azure": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("azure:")],
-            "sarvam": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("sarvam:")],
-            "elevenlabs": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("elevenlabs:")],
-            "cartesia": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("cartesia:")],
-            "groq": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("groq:")],
-        }
-    }
+    if st.session_state.get("session_token"):
+        # Renewed with every full page run, like the session in Redis
+        write_session_cookie(st.session_state.session_token)
+
+    # Feature modules load on the first page after login: the login page and every new
+    # worker process start without Redis, requests, numpy or the Pinecone SDK
+    from config import CONFIG, costs_per_min
+    from catalog import (
+        COMPONENTS,
+        DEFAULT_VALUES,
+        LANGUAGE_MAPPING,
+        LANGUAGES,
+        PROVIDER_MODEL_MAPPING,
+        beautify_name,
+        format_option,
+        get_models_for_language_provider,
+        get_providers_for_language,
+    )
+    from call_index import calls_between, calls_to, campaign_calls, count_between, recent_campaigns
+    from call_status import STATUSES
+    from calls import RATE_LIMITED, initiate_call_with_retry, validate_phone_number
+    from campaign import build_campaign_metadata, campaign_throughput, parse_campaign_csv, run_campaign, validate_campaign
+    from costs import ENGINE as COST_ENGINE, project_campaign_cost
+    from dispatch_queue import DISPATCH_QUEUE, enqueue_call, enqueue_calls
+    from kb_sync import start_sync, upload_entries
+    from metadata_schema import ensure_valid, metadata_from_settings
+    from knowledge_base import UploadPipeline, start_upload_pipeline
+    from metrics import UI_RENDER_SECONDS
+    from preprocess import cleanup_when_done, preprocess_uploads
+    from rate_limit import get_call_limiter
+    from scheduler import CallWindow, callee_timezone, schedule_call, schedule_calls, scheduled_count
+    from resources import (
+        ASSISTANT_NAME,
+        get_assistant,
+        get_call_status_tracker,
+        get_file_list_cache,
+        get_redis_client,
+    )
 
-    # Language mapping
-    LANGUAGE_MAPPING = {
-        'hi-IN': 'Hindi', 'en-IN': 'English', 'gu-IN': 'Gujarati',
-        'bn-IN': 'Bengali', 'kn-IN': 'Kannada', 'ml-IN': 'Malayalam', 'mr-IN': 'Marathi',
-        'od-IN': 'Odia', 'pa-IN': 'Punjabi', 'ta-IN': 'Tamil', 'te-IN': 'Telugu'
-    }
+    def panel(name, run_every=None):
+        """``st.fragment`` timed as ``ui_render_seconds{panel=name}``.
+
+        Changing a widget inside a panel reruns only that panel, not the whole page.
+        """
+        def decorate(render):
+            @st.fragment(run_every=run_every)
+            @functools.wraps(render)
+            def timed():
+                with UI_RENDER_SECONDS.time(panel=name):
+                    render()
+            return timed
+        return decorate
+
+    # Format functions with badge-like cost display
+    def format_stt_model(name):
+        return format_option("STT", name)
+
+    def format_llm_model(name):
+        return format_option("LLM", name)
+
+    def format_tts_voice(name):
+        return format_option("TTS", name)
+
+    def format_budget(budget):
+        who = f"Trunk {budget.name}" if budget.scope == "trunk" else "You"
+        parts = []
+        if budget.rate:
+            parts.append(f"{int(budget.tokens)}/{budget.burst:g} calls available ({budget.rate:g}/s)")
+        parts.append(f"{budget.active}/{budget.concurrent} in progress" if budget.concurrent
+                     else f"{budget.active} in progress")
+        return f"🚦 {who}: " + ", ".join(parts)
+
+    def format_due(due, phone_number):
+        return datetime.fromtimestamp(due, callee_timezone(phone_number)).strftime("%a %d %b %H:%M %Z")
+
+    # Shared clients, built once per process on first use
+    redis_client = get_redis_client()
+    assistant = get_assistant()
+    file_list_cache = get_file_list_cache()
+    call_status = get_call_status_tracker()
+    call_limiter = get_call_limiter(redis_client)
+    tracked_calls = st.session_state.setdefault("tracked_calls", [])
 
     def _rerun():
         # Calculate total cost
@@ -208,18 +234,6 @@ else:
         cost_display = f"${sum(costs):.4f}/min" if all(c is not None for c in costs) else "N/A"
         st.session_state.cost_display = cost_display
     
-    def get_models_for_language_provider(component: str, language: str, provider: str) -> list:
-        """Get list of models/voices that support a given language and provider."""
-        if component == "STT":
-            return PROVIDER_MODEL_MAPPING[component][provider]
-        else:  # TTS
-            all_voices = PROVIDER_MODEL_MAPPING[component][provider]
-            if provider in ("azure", "elevenlabs", "cartesia"):
-                short = language.split("-")[0]
-                pattern = re.compile(rf"^{provider}:{short}(-|_)")
-                return [v for v in all_voices if pattern.search(v)]
-            return all_voices
-    
     def update_llm_provider():
         """Update LLM model when provider changes."""
         st.session_state.llm_provider = st.session_state["llm_provider_select"]
@@ -273,55 +287,9 @@ else:
         except Exception:
             return st.session_state.tts_language_select
 
-    # Initialize session state with default values
-    def initialize_default_values():
-        # STT defaults
-        all_stt_languages = set()
-        for provider in CONFIG["STT"]["provider"]["enum"]:
-            all_stt_languages.update(CONFIG["STT"]["language"][provider])
-        default_stt_lang = sorted(list(all_stt_languages))[0] if all_stt_languages else ""
-        
-        # Get first provider that supports the default language
-        default_stt_provider = next(
-            (p for p in CONFIG["STT"]["provider"]["enum"] 
-             if default_stt_lang in CONFIG["STT"]["language"][p]),
-            CONFIG["STT"]["provider"]["enum"][0]
-        )
-        
-        # Get first model for the default provider
-        default_stt_model = PROVIDER_MODEL_MAPPING["STT"][default_stt_provider][0] if PROVIDER_MODEL_MAPPING["STT"][default_stt_provider] else ""
-
-        # TTS defaults
-        all_tts_languages = set()
-        for provider in CONFIG["TTS"]["provider"]["enum"]:
-            all_tts_languages.update(CONFIG["TTS"]["language"][provider])
-        default_tts_lang = sorted(list(all_tts_languages))[0] if all_tts_languages else ""
-        
-        # Get first provider that supports the default language
-        default_tts_provider = next(
-            (p for p in CONFIG["TTS"]["provider"]["enum"] 
-             if default_tts_lang in CONFIG["TTS"]["language"][p]),
-            CONFIG["TTS"]["provider"]["enum"][0]
-        )
-        
-        # Get first voice for the default provider and language
-        default_tts_voice = get_models_for_language_provider("TTS", default_tts_lang, default_tts_provider)[0] if get_models_for_language_provider("TTS", default_tts_lang, default_tts_provider) else ""
-
-        return {
-            "stt_language_select": default_stt_lang,
-            "stt_provider": default_stt_provider,
-            "stt_provider_select": default_stt_provider,
-            "stt_model_select": default_stt_model,
-            "tts_language_select": default_tts_lang,
-            "tts_provider": default_tts_provider,
-            "tts_provider_select": default_tts_provider,
-            "tts_voice_select": default_tts_voice
-        }
-
     # Initialize session state
     if "stt_provider" not in st.session_state:
-        defaults = initialize_default_values()
-        for key, value in defaults.items():
+        for key, value in DEFAULT_VALUES.items():
             st.session_state[key] = value
 
     if "llm_provider" not in st.session_state:
@@ -333,18 +301,6 @@ else:
         st.session_state.cost_display = "N/A"
 
     _rerun()  # Initial cost calculation
-    # TTS helper functions
-    def validate_phone_number(phone):
-        return bool(re.match(r'^\+91\d{10}$', phone))
-
-    # Helper functions for language-based provider selection
-    def get_providers_for_language(component: str, language: str) -> list:
-        """Get list of providers that support a given language for a component."""
-        providers = []
-        for provider in CONFIG[component]["provider"]["enum"]:
-            if language in CONFIG[component]["language"][provider]:
-                providers.append(provider)
-        return providers
 
     def update_stt_language():
         """Update STT provider and model when language changes."""
@@ -382,42 +338,120 @@ else:
                 st.session_state.tts_voice_select = voice_options[0]
         _rerun()
 
-    # SIDEBAR - File Upload and User Info
-    with st.sidebar:
+    # SIDEBAR - File Upload and User Info, redrawn on its own when its widgets change
+    @panel("knowledge_base")
+    def knowledge_base_panel():
         # st.markdown('<div class="sidebar-section">', unsafe_allow_html=True)
         st.markdown("### 📄 Knowledge Base Management")
         
         # File Upload
-        uploaded_file = st.file_uploader(
+        upload_mode = st.radio(
+            "Upload",
+            ["Files", "Folder"],
+            horizontal=True,
+            label_visibility="collapsed",
+            key="upload_mode"
+        )
+        uploaded_files = st.file_uploader(
             "Upload documents for the agent",
             type=["txt", "pdf", "docx", "md"],
+            accept_multiple_files=True if upload_mode == "Files" else "directory",
             help="Upload documents to be used by the agent"
         )
+        extract_text = st.checkbox(
+            "🧹 Extract text before upload",
+            help="Upload cleaned-up text instead of the original PDF/DOCX files; faster to upload and index"
+        )
+        sync_folder = upload_mode == "Folder" and st.checkbox(
+            "🔁 Sync (skip unchanged)",
+            help="Only upload documents of this folder that are new or changed since its last sync"
+        )
+        delete_removed = sync_folder and st.checkbox(
+            "🗑️ Delete removed files",
+            help="Also delete documents synced from this folder earlier that are no longer in it"
+        )
         
         upload_button = st.button("📤 Upload", use_container_width=True)
         
         if upload_button:
-            if uploaded_file is not None:
-                with tempfile.TemporaryDirectory() as tmpdirname:
-                    original_filename = uploaded_file.name
-                    file_path = os.path.join(tmpdirname, original_filename)
-                    with open(file_path, 'wb') as f:
-                        f.write(uploaded_file.getvalue())
-                    try:
-                        with st.spinner(f"Uploading {original_filename}..."):
-                            response = assistant.upload_file(file_path=file_path)
-                            st.success(f"✅ Uploaded '{original_filename}'")
-                    except Exception as e:
-                        st.error(f"❌ Error uploading file: {str(e)}")
+            if uploaded_files:
+                try:
+                    if sync_folder:
+                        root, entries = upload_entries(uploaded_files)
+                        sync = start_sync(
+                            assistant,
+                            redis_client,
+                            entries,
+                            ASSISTANT_NAME,
+                            root=root,
+                            delete_missing=delete_removed,
+                            on_file=file_list_cache.add,
+                            on_delete=file_list_cache.remove
+                        )
+                        st.session_state.upload_pipeline = sync.pipeline
+                        st.toast(f"🔁 {len(sync.plan.upload)} to upload, {len(sync.plan.unchanged)} unchanged, "
+                                 f"{len(sync.plan.delete)} to remove")
+                    elif extract_text:
+                        workdir = tempfile.mkdtemp(prefix="kb-preprocess-")
+                        with st.spinner("🧹 Extracting text..."):
+                            results, jobs = preprocess_uploads(uploaded_files, workdir)
+                        pipeline = UploadPipeline(assistant, jobs, on_file=file_list_cache.add)
+                        st.session_state.upload_pipeline = cleanup_when_done(pipeline, workdir).start()
+                        original = sum(r.original_bytes for r in results)
+                        extracted = sum(r.text_bytes if r.parts else r.original_bytes for r in results)
+                        st.toast(f"🧹 {original / 1e6:.1f} MB reduced to {extracted / 1e6:.1f} MB")
+                        for r in results:
+                            if r.error:
+                                st.warning(f"⚠️ Text extraction failed, uploaded unchanged: {r.error}")
+                    else:
+                        st.session_state.upload_pipeline = start_upload_pipeline(
+                            assistant,
+                            uploaded_files,
+                            on_file=file_list_cache.add
+                        )
+                except Exception as e:
+                    st.error(f"❌ Error uploading files: {str(e)}")
             else:
                 st.warning("Please select a file to upload.")
+
+        pipeline = st.session_state.get("upload_pipeline")
+
+        # Redraws itself every second while uploads are running, without rerunning the page
+        @panel("upload_progress", run_every=1.0 if pipeline is not None and not pipeline.done else None)
+        def upload_progress():
+            pipeline = st.session_state.get("upload_pipeline")
+            if pipeline is None:
+                return
+            finished = sum(1 for job in pipeline.jobs if job.finished)
+            st.progress(pipeline.progress, text=f"📤 {finished}/{len(pipeline.jobs)} files processed")
+            status_icons = {"queued": "⏳", "uploading": "📤", "processing": "🟡", "available": "🟢", "failed": "🔴"}
+            st.dataframe(
+                [
+                    {"": status_icons[job.status], "File": job.name, "Status": job.status, "Error": job.error or ""}
+                    for job in pipeline.jobs
+                ],
+                hide_index=True,
+                use_container_width=True
+            )
+            if pipeline.done:
+                failed = sum(1 for job in pipeline.jobs if job.status == "failed")
+                if failed:
+                    st.error(f"❌ {failed} file(s) failed to upload")
+                else:
+                    st.success(f"✅ Uploaded {len(pipeline.jobs)} file(s)")
+                if st.session_state.get("upload_pipeline_reported") is not pipeline:
+                    # Rerun the whole page once so the file list picks up the new files
+                    st.session_state.upload_pipeline_reported = pipeline
+                    st.rerun()
+
+        upload_progress()
         
         
         # Uploaded Files List
         st.markdown("#### 📋 Uploaded Files")
         try:
             with st.spinner("Loading files..."):
-                files = assistant.list_files()
+                files = file_list_cache.get()
                 if files:
                     for file in files:
                         with st.container():
@@ -431,6 +465,7 @@ else:
                                     try:
                                         with st.spinner(f"Deleting {file.name}..."):
                                             assistant.delete_file(file.id)
+                                            file_list_cache.remove(file.id)
                                             st.success(f"Deleted '{file.name}'")
                                     except Exception as e:
                                         st.error(f"Error deleting file: {str(e)}")
@@ -444,37 +479,347 @@ else:
         if st.button("🚪 Logout", type="primary", use_container_width=True):
             logout()
 
+    with st.sidebar:
+        knowledge_base_panel()
+
     # MAIN CONTENT
-    # Header
-    st.markdown("""
-        <div class="main-header">
-            <div style="display: flex; justify-content: space-between; align-items: center;">
-                <h1>📞 StackVoice Telephonic Agent</h1>
-                <div class="cost-badge">
-                    💰 Total Cost: {cost_display}
+    # Header; the tab panels redraw it in place when the configuration changes its cost
+    header = st.empty()
+
+    def render_header():
+        header.markdown("""
+            <div class="main-header">
+                <div style="display: flex; justify-content: space-between; align-items: center;">
+                    <h1>📞 StackVoice Telephonic Agent</h1>
+                    <div class="cost-badge">
+                        💰 Total Cost: {cost_display}
+                    </div>
                 </div>
             </div>
-        </div>
-    """.format(cost_display=st.session_state.cost_display), unsafe_allow_html=True)
+        """.format(cost_display=st.session_state.cost_display), unsafe_allow_html=True)
+
+    render_header()
 
-    # Phone Number Input and Call Initiation
-    # st.markdown("### 📱 Call Initiation")
+    def build_call_metadata(phone_number):
+        """Build the call metadata dict from the current configuration."""
+        metadata = metadata_from_settings(st.session_state, phone_number)
+        total = metadata["total_cost_per_min"]
+        st.session_state.cost_display = f"${total:.4f}/min" if total is not None else "N/A"
+        return metadata
+
+    def track_call(label):
+        """``on_dispatched`` callback adding a call to this session's Live Call Status panel."""
+        def _track(data_id):
+            # A resubmitted call comes back with the data_id it was first dispatched under
+            if data_id not in tracked_calls:
+                call_status.watch(data_id, label)
+                tracked_calls.append(data_id)
+        return _track
+
+    # Call Initiation and Bulk Campaign: a dispatch reruns only this panel
+    @panel("dispatch")
+    def dispatch_panel():
+        # Phone Number Input and Call Initiation
+        # st.markdown("### 📱 Call Initiation")
     
-    col1, col2 = st.columns([3, 1], vertical_alignment="bottom")
-    with col1:
-        phone_number = st.text_input(
-            "Reciever Phone Number",
-            placeholder="+91XXXXXXXXXX",
+        col1, col2 = st.columns([3, 1], vertical_alignment="bottom")
+        with col1:
+            phone_number = st.text_input(
+                "Reciever Phone Number",
+                placeholder="+91XXXXXXXXXX",
+            )
+        with col2:
+            initiate_call = st.button("📞 Initiate Call", type="primary", use_container_width=True)
+        operator = st.session_state.user["email"]
+
+        # Remaining call budget of the SIP trunk and this operator, refreshed while limits apply
+        @panel("call_budget", run_every=5.0 if st.session_state.get("call_limits_apply") else None)
+        def call_budget():
+            try:
+                budgets = [budget for budget in call_limiter.budget(operator) if not budget.unlimited]
+            except Exception as e:
+                st.caption(f"🚦 Call budget unavailable: {str(e)}")
+                return
+            st.session_state.call_limits_apply = bool(budgets)
+            if budgets:
+                st.caption(" · ".join(format_budget(budget) for budget in budgets))
+
+        call_budget()
+
+        # Scheduled calls wait in Redis and are queued by the dispatcher workers when due
+        schedule_at, window = None, None
+        if DISPATCH_QUEUE:
+            with st.expander("🗓️ Schedule for later"):
+                if st.checkbox("Schedule instead of calling now", key="schedule_enabled"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        day = st.date_input("Date", key="schedule_date")
+                    with col2:
+                        at = st.time_input("Time (callee's local time)", key="schedule_time")
+                    schedule_at = datetime.combine(day, at)
+                    business_hours = CallWindow.from_env()
+                    if st.checkbox(
+                        f"Only during business hours ({business_hours.start}:00-{business_hours.end}:00)",
+                        value=True,
+                        help="Calls outside these hours wait for the next business day",
+                        key="schedule_business_hours"
+                    ):
+                        window = business_hours
+                try:
+                    pending = scheduled_count(redis_client)
+                except Exception as e:
+                    st.caption(f"🗓️ Scheduled calls unavailable: {str(e)}")
+                else:
+                    st.caption(f"🗓️ {pending} calls scheduled")
+
+        # Bulk Campaign: one call per CSV row
+        with st.expander("📁 Bulk Campaign"):
+            campaign_file = st.file_uploader(
+                "Upload a CSV with a phone_number column",
+                type=["csv"],
+                help="Other columns can be used as {placeholders} in the first message and system prompt",
+                key="campaign_file"
+            )
+            st.text_input(
+                "🏷️ Campaign name",
+                placeholder="Defaults to the CSV file name",
+                help="Calls are grouped under this name in Call History",
+                key="campaign_name"
+            )
+            col1, col2 = st.columns([3, 1], vertical_alignment="bottom")
+            with col1:
+                st.number_input(
+                    "⚡ Concurrent dispatches",
+                    min_value=1,
+                    max_value=64,
+                    value=8,
+                    step=1,
+                    key="campaign_workers"
+                )
+            with col2:
+                start_campaign = st.button("🚀 Start Campaign", use_container_width=True)
+
+        # Handle Call Initiation
+        if initiate_call:
+            if not phone_number or not st.session_state.get('first_message'):
+                st.error("❌ Please fill in the phone number and first message")
+            elif not validate_phone_number(phone_number):
+                st.error("❌ Invalid phone number format. Please enter a valid Indian phone number starting with +91 followed by 10 digits.")
+            else:
+                try:
+                    # A bad provider/model/language combination is refused here, not after the dial
+                    metadata = ensure_valid(build_call_metadata(phone_number))
+                
+                    st.success("✅ Call configured successfully.")
+                
+                    with st.expander("📊 Review Configuration"):
+                        st.json(metadata)
+
+                    if schedule_at is not None:
+                        data_id, due = schedule_call(redis_client, phone_number, metadata, schedule_at,
+                                                     operator=operator, window=window)
+                        track_call(phone_number)(data_id)
+                        st.success(f"🗓️ Call scheduled for {format_due(due, phone_number)}")
+                    elif DISPATCH_QUEUE:
+                        # A dispatcher worker places the call, even if this page is closed
+                        track_call(phone_number)(enqueue_call(redis_client, phone_number, metadata, operator=operator))
+                        st.success("📥 Call queued for dispatch; follow it in Live Call Status")
+                    else:
+                        with st.spinner("📤 Initiating call with automatic retries..."):
+                            success, stdout, error = initiate_call_with_retry(
+                                redis_client, phone_number, metadata, on_retry=st.warning, on_dispatched=track_call(phone_number),
+                                operator=operator, limit_wait=0
+                            )
+
+                            if success:
+                                st.success("🎉 Call initiated successfully!")
+                                if stdout:
+                                    with st.expander("📋 Command output"):
+                                        st.code(stdout)
+                            elif error.startswith(RATE_LIMITED):
+                                st.warning(f"⏳ {error}")
+                            else:
+                                st.error(f"❌ Failed to initiate call after all retries: {error}")
+                        
+                except Exception as e:
+                    st.error(f"❌ An error occurred: {str(e)}")
+
+        # Handle Bulk Campaign
+        if start_campaign:
+            if campaign_file is None or not st.session_state.get('first_message'):
+                st.error("❌ Please upload a campaign CSV and fill in the first message")
+            else:
+                try:
+                    rows, row_errors = parse_campaign_csv(campaign_file.getvalue())
+                    jobs, invalid_rows = validate_campaign(build_campaign_metadata(build_call_metadata(None), rows))
+                    row_errors = sorted(row_errors + invalid_rows, key=lambda r: r.row_number)
+                    st.info(f"📋 {len(jobs)} calls queued, {len(row_errors)} rows skipped")
+                    campaign = st.session_state.get("campaign_name") or campaign_file.name.rsplit(".", 1)[0]
+
+                    if schedule_at is not None:
+                        scheduled = schedule_calls(
+                            redis_client, [(row.phone_number, metadata) for row, metadata in jobs], schedule_at,
+                            campaign=campaign, operator=operator, window=window
+                        )
+                        for (row, _), (data_id, _) in zip(jobs, scheduled):
+                            track_call(row.phone_number)(data_id)
+                        results = row_errors
+                        if scheduled:
+                            first_due, first_phone = min(
+                                (due, row.phone_number) for (row, _), (_, due) in zip(jobs, scheduled)
+                            )
+                            st.success(f"🗓️ {len(scheduled)} calls scheduled, the first for "
+                                       f"{format_due(first_due, first_phone)}")
+                    elif DISPATCH_QUEUE:
+                        data_ids = enqueue_calls(
+                            redis_client, [(row.phone_number, metadata) for row, metadata in jobs], campaign=campaign,
+                            operator=operator
+                        )
+                        for (row, _), data_id in zip(jobs, data_ids):
+                            track_call(row.phone_number)(data_id)
+                        results = row_errors
+                        st.success(f"📥 {len(data_ids)} calls queued for dispatch; follow them in Live Call Status")
+                    else:
+                        progress_bar = st.progress(0.0, text="📤 Dispatching campaign...")
+
+                        def _campaign_progress(done, total, result):
+                            progress_bar.progress(done / total, text=f"📤 Dispatched {done}/{total} calls")
+
+                        started = time.time()
+                        def _dispatch_and_track(redis_client, phone_number, metadata):
+                            return initiate_call_with_retry(
+                                redis_client, phone_number, metadata, on_dispatched=track_call(phone_number),
+                                campaign=campaign, operator=operator, limit_wait=0
+                            )
+
+                        results = run_campaign(
+                            redis_client,
+                            jobs,
+                            max_workers=int(st.session_state.campaign_workers),
+                            on_progress=_campaign_progress,
+                            dispatch=_dispatch_and_track,
+                        )
+                        elapsed = time.time() - started
+
+                        results = sorted(results + row_errors, key=lambda r: r.row_number)
+                        succeeded = sum(1 for r in results if r.success)
+                        st.success(
+                            f"🎉 Campaign finished: {succeeded}/{len(results)} calls initiated "
+                            f"in {elapsed:.1f}s ({campaign_throughput(jobs, elapsed):.2f} calls/sec)"
+                        )
+                    failures = [
+                        {"row": r.row_number, "phone_number": r.phone_number, "error": r.error}
+                        for r in results if not r.success
+                    ]
+                    if failures:
+                        with st.expander(f"❌ {len(failures)} failed rows"):
+                            st.dataframe(failures, use_container_width=True)
+                except Exception as e:
+                    st.error(f"❌ An error occurred: {str(e)}")
+
+        # Live Call Status: pushed by the agent over the call-status stream, read from memory here
+        active = any(not state.settled for state in call_status.get(tracked_calls))
+
+        @panel("live_call_status", run_every=1.0 if active else None)
+        def live_call_status():
+            states = call_status.get(tracked_calls)
+            if not states:
+                return
+            st.markdown("### 📡 Live Call Status")
+            counts = {status: 0 for status in STATUSES}
+            for state in states:
+                counts[state.status] += 1
+            status_icons = {"scheduled": "🗓️", "queued": "⏳", "dispatched": "📤", "ringing": "🔔", "answered": "🟢", "ended": "✅", "failed": "🔴"}
+            for col, status in zip(st.columns(len(STATUSES)), STATUSES):
+                col.metric(f"{status_icons[status]} {status.capitalize()}", counts[status])
+            now = time.time()
+            st.dataframe(
+                [
+                    {
+                        "": status_icons[state.status],
+                        "Phone": state.label,
+                        "Status": f"{state.status} (stale)" if state.stale else state.status,
+                        "Since": f"{now - state.updated_at:.0f}s" if not state.finished else "",
+                        "Detail": state.detail,
+                        "Call ID": state.data_id,
+                    }
+                    for state in sorted(states, key=lambda s: s.started_at, reverse=True)
+                ],
+                hide_index=True,
+                use_container_width=True
+            )
+            if any(state.settled for state in states) and st.button("🧹 Clear finished calls"):
+                finished = {state.data_id for state in states if state.settled}
+                tracked_calls[:] = [data_id for data_id in tracked_calls if data_id not in finished]
+                st.rerun()
+            if active and all(state.settled for state in states):
+                # Stop the periodic refresh once every call has finished or gone stale
+                st.rerun()
+
+        live_call_status()
+
+    dispatch_panel()
+
+    # Cost Planner: cheapest configurations for the selected languages, and campaign projections
+    @panel("cost_planner")
+    def cost_planner():
+        stt_language = st.session_state.get("stt_language_select", DEFAULT_VALUES["stt_language_select"])
+        tts_language = st.session_state.get("tts_language_select", DEFAULT_VALUES["tts_language_select"])
+        st.caption(f"STT in {LANGUAGE_MAPPING.get(stt_language, stt_language)}, "
+                   f"TTS in {LANGUAGE_MAPPING.get(tts_language, tts_language)}")
+        providers = {}
+        for col, component in zip(st.columns(3), COMPONENTS):
+            with col:
+                choice = st.selectbox(
+                    f"{component} provider",
+                    ["Any"] + list(CONFIG[component]["provider"]["enum"]),
+                    key=f"planner_{component.lower()}_provider"
+                )
+                providers[f"{component.lower()}_provider"] = None if choice == "Any" else choice
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            max_cost = st.number_input("Max $/min (0 = any)", min_value=0.0, value=0.0, step=0.005, format="%.4f")
+        with col2:
+            top_n = st.number_input("Show", min_value=1, max_value=100, value=10)
+        with col3:
+            calls = st.number_input("Campaign calls", min_value=1, value=1000, step=100)
+        with col4:
+            median_minutes = st.number_input("Median call (min)", min_value=0.1, value=2.0, step=0.5)
+
+        configurations = COST_ENGINE.cheapest(
+            stt_language, tts_language, n=int(top_n), max_cost=max_cost or None, **providers
+        )
+        if not configurations:
+            st.info("No configuration matches these constraints.")
+            return
+        projection = project_campaign_cost(
+            [c.cost_per_min for c in configurations], int(calls), median_minutes=median_minutes, seed=0
+        )
+        st.dataframe(
+            [
+                {
+                    "STT": beautify_name(c.stt_model),
+                    "LLM": beautify_name(c.llm_model),
+                    "TTS": f"{c.tts_provider.capitalize()} ({len(c.tts_voices)} voices)",
+                    "$/min": round(c.cost_per_min, 5),
+                    "Campaign (mean)": f"${mean:,.2f}",
+                    "Campaign (p90)": f"${p90:,.2f}",
+                }
+                for c, mean, p90 in zip(configurations, projection["mean"], projection["p90"])
+            ],
+            hide_index=True,
+            use_container_width=True
         )
-    with col2:
-        initiate_call = st.button("📞 Initiate Call", type="primary", use_container_width=True)
-    
+
+    with st.expander("💰 Cost Planner"):
+        cost_planner()
 
     # Configuration Tabs
     tab1, tab2, tab3, tab4 = st.tabs(["🤖 LLM Configuration", "🎤 STT Configuration", "🔊 TTS Configuration", "⚙️ Additional Settings"])
 
     # LLM Tab
-    with tab1:
+    @panel("llm_tab")
+    def llm_tab():
         # First Message Input
         st.markdown("##### 💬 First Message")
         first_message = st.text_input(
@@ -523,19 +868,20 @@ else:
                 key="llm_temperature",
                 on_change=_rerun
             )
-    
+        # The cost badge sits outside this panel
+        render_header()
+
+    with tab1:
+        llm_tab()
 
     # STT Tab
-    with tab2:
+    @panel("stt_tab")
+    def stt_tab():
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
-            # Get all available languages across all providers
-            all_stt_languages = set()
-            for provider in CONFIG["STT"]["provider"]["enum"]:
-                all_stt_languages.update(CONFIG["STT"]["language"][provider])
             stt_language = st.selectbox(
                 "🌐 Language",
-                options=sorted(list(all_stt_languages)),
+                options=LANGUAGES["STT"],
                 format_func=lambda x: LANGUAGE_MAPPING.get(x, x),
                 key="stt_language_select",
                 on_change=lambda: update_stt_language()
@@ -565,18 +911,19 @@ else:
                 index=0,
                 on_change=_rerun
             )
+        render_header()
+
+    with tab2:
+        stt_tab()
 
     # TTS Tab
-    with tab3:
+    @panel("tts_tab")
+    def tts_tab():
         col1, col2, col3 = st.columns([1, 1, 1])
         with col1:
-            # Get all available languages across all providers
-            all_tts_languages = set()
-            for provider in CONFIG["TTS"]["provider"]["enum"]:
-                all_tts_languages.update(CONFIG["TTS"]["language"][provider])
             tts_language = st.selectbox(
                 "🌐 Language",
-                options=sorted(list(all_tts_languages)),
+                options=LANGUAGES["TTS"],
                 format_func=lambda x: LANGUAGE_MAPPING.get(x, x),
                 key="tts_language_select",
                 on_change=lambda: update_tts_language()
@@ -611,9 +958,14 @@ else:
         if 'stt_language_select' in st.session_state and 'tts_language_select' in st.session_state:
             if st.session_state.stt_language_select != st.session_state.tts_language_select:
                 st.warning("⚠️ Warning: STT and TTS languages do not match. This may affect the conversation quality.")
+        render_header()
+
+    with tab3:
+        tts_tab()
 
     # Additional Settings Tab
-    with tab4:
+    @panel("settings_tab")
+    def settings_tab():
         st.markdown("##### 🛠️ Agent Configuration")
         
         # Create a container for better styling
@@ -661,128 +1013,73 @@ else:
                     key="vad_min_silence"
                 )
 
-    def initiate_call_with_retry(phone_number, metadata, max_retries=5):
-        """Handle call initiation with automatic retries for both data verification and call initiation."""
-        for attempt in range(max_retries):
-            try:
-                # Generate new data ID for each attempt
-                data_id = f"call-{phone_number}-{int(time.time())}-{random.randint(100000, 999999)}"
-                
-                # Store metadata in Redis with expiration (24 hours)
-                redis_client.setex(
-                    data_id,
-                    86400,  # 24 hours in seconds
-                    json.dumps(metadata)
-                )
-                
-                # Verify data was stored successfully
-                data_verified = False
-                verification_retries = 3  # Reduced retries since Redis is faster
-                
-                for verify_attempt in range(verification_retries):
-                    try:
-                        stored_data = redis_client.get(data_id)
-                        if stored_data:
-                            stored_meta = json.loads(stored_data)
-                            if stored_meta == metadata:
-                                data_verified = True
-                                break
-                    except Exception as e:
-                        if verify_attempt < verification_retries - 1:
-                            time.sleep(0.5)  # Reduced sleep time
-                            continue
-                    
-                if not data_verified:
-                    if attempt < max_retries - 1:
-                        st.warning(f"Attempt {attempt + 1}: Data verification failed, retrying...")
-                        time.sleep(1)  # Reduced wait time
-                        continue
-                    else:
-                        raise Exception("Failed to verify metadata storage after all retries")
-                
-                # If data is verified, initiate the call
-                command = f'lk dispatch create --new-room --agent-name "teliphonic-rag-agent-test" --metadata "{data_id}"'
-                process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = process.communicate()
-                
-                if process.returncode == 0:
-                    return True, stdout.decode(), None
-                else:
-                    if attempt < max_retries - 1:
-                        st.warning(f"Attempt {attempt + 1}: Call initiation failed, retrying...")
-                        time.sleep(1)  # Reduced wait time
-                        continue
-                    else:
-                        return False, None, stderr.decode()
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    st.warning(f"Attempt {attempt + 1}: Error occurred, retrying...")
-                    time.sleep(1)  # Reduced wait time
-                    continue
-                else:
-                    return False, None, str(e)
-        
-        return False, None, "All retry attempts failed"
-
-    # Handle Call Initiation
-    if initiate_call:
-        if not phone_number or not st.session_state.get('first_message'):
-            st.error("❌ Please fill in the phone number and first message")
-        elif not validate_phone_number(phone_number):
-            st.error("❌ Invalid phone number format. Please enter a valid Indian phone number starting with +91 followed by 10 digits.")
+    with tab4:
+        settings_tab()
+
+    # Call History: paged lookups served from the call indexes, never a keyspace scan
+    @panel("call_history")
+    def call_history():
+        lookup = st.radio(
+            "Find calls", ["🕒 Recent", "📱 By phone number", "📁 By campaign"], horizontal=True, key="history_lookup"
+        )
+        if lookup == "🕒 Recent":
+            hours = st.selectbox("Window", [1, 6, 24], format_func=lambda h: f"Last {h}h", key="history_hours")
+            start = time.time() - hours * 3600
+            query = ("recent", hours)
+            st.caption(f"{count_between(redis_client, start=start)} calls")
+            fetch = lambda cursor: calls_between(redis_client, start=start, cursor=cursor)
+        elif lookup == "📱 By phone number":
+            number = st.text_input("Phone number", placeholder="+91XXXXXXXXXX", key="history_phone")
+            if not validate_phone_number(number):
+                st.info("Enter a phone number starting with +91 followed by 10 digits.")
+                return
+            query = ("phone", number)
+            fetch = lambda cursor: calls_to(redis_client, number, cursor=cursor)
         else:
-            try:
-                # Calculate costs
-                stt_cost = costs_per_min["STT"].get(st.session_state.stt_model_select, None)
-                llm_cost = costs_per_min["LLM"].get(st.session_state.llm_model_select, None)
-                tts_cost = costs_per_min["TTS"].get(st.session_state.tts_provider, None)
-                costs = [stt_cost, llm_cost, tts_cost]
-                cost_display = f"${sum(costs):.4f}/min" if all(c is not None for c in costs) else "N/A"
-                st.session_state.cost_display = cost_display
-
-                metadata = {
-                    'phone_number': phone_number,
-                    'first_message': st.session_state.get('first_message'),
-                    'STT_provider': st.session_state.stt_provider,
-                    'STT_model': stt_model.split("sarvam:")[-1] if stt_model.startswith("sarvam") else stt_model.split(":")[-1],
-                    'STT_language': stt_language,
-                    'STT_cost_per_min': stt_cost,
-                    'LLM_provider': st.session_state.llm_provider,
-                    'LLM_model': llm_model.split(":")[-1],
-                    'LLM_system_prompt': st.session_state.get('llm_system_prompt', ''),
-                    'LLM_temperature': llm_temperature,
-                    'LLM_cost_per_min': llm_cost,
-                    'TTS_provider': st.session_state.tts_provider,
-                    'TTS_voice': tts_voice.split(":")[-1],
-                    'TTS_language': tts_language,
-                    'TTS_cost_per_min': tts_cost,
-                    'total_cost_per_min': sum(costs) if all(c is not None for c in costs) else None,
-                    'use_retrieval': st.session_state.get('use_retrieval', False),
-                    'auto_end_call': st.session_state.get('auto_end_call', False),
-                    'background_sound': st.session_state.get('background_sound', False),
-                    'vad_min_silence': st.session_state.get('vad_min_silence', 0.65),
-                    'is_allow_interruptions': st.session_state.get('is_allow_interruptions', False),
-                }
-                
-                st.success("✅ Call configured successfully.")
-                
-                with st.expander("📊 Review Configuration"):
-                    st.json(metadata)
-                
-                with st.spinner("📤 Initiating call with automatic retries..."):
-                    success, stdout, error = initiate_call_with_retry(phone_number, metadata)
-                    
-                    if success:
-                        st.success("🎉 Call initiated successfully!")
-                        if stdout:
-                            with st.expander("📋 Command output"):
-                                st.code(stdout)
-                    else:
-                        st.error(f"❌ Failed to initiate call after all retries: {error}")
-                        
-            except Exception as e:
-                st.error(f"❌ An error occurred: {str(e)}")
+            campaigns = recent_campaigns(redis_client)
+            if not campaigns:
+                st.info("No campaigns in the last 24 hours.")
+                return
+            name = st.selectbox("Campaign", [name for name, _ in campaigns], key="history_campaign")
+            query = ("campaign", name)
+            fetch = lambda cursor: campaign_calls(redis_client, name, cursor=cursor)
+
+        # Cursor of every page up to the current one; back to the first page when the query changes
+        pages = st.session_state.get("history_pages")
+        if pages is None or pages["query"] != query:
+            pages = st.session_state.history_pages = {"query": query, "cursors": [None]}
+        page = fetch(pages["cursors"][-1])
+        if not page.records:
+            st.info("No calls found.")
+        else:
+            st.dataframe(
+                [
+                    {
+                        "Time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created_at)),
+                        "Phone": record.phone_number,
+                        "Status": record.status or "—",
+                        "Detail": record.detail,
+                        "Call ID": record.data_id,
+                    }
+                    for record in page.records
+                ],
+                hide_index=True,
+                use_container_width=True
+            )
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if len(pages["cursors"]) > 1:
+                st.button("◀ Previous", on_click=pages["cursors"].pop, use_container_width=True)
+        col2.caption(f"Page {len(pages['cursors'])}")
+        with col3:
+            if page.cursor:
+                st.button("Next ▶", on_click=pages["cursors"].append, args=(page.cursor,), use_container_width=True)
+
+    with st.expander("🔎 Call History"):
+        try:
+            call_history()
+        except Exception as e:
+            st.error(f"❌ Could not load call history: {str(e)}")
 
     # Footer
     st.markdown("---")
@@ -0,0 +1,107 @@
+"""Micro-benchmark of the catalog work done on every Streamlit rerun, before and after ``catalog``.
+
+    python bench_catalog.py --reruns 2000
+
+"Before" replays what ``app.py`` computed on each rerun: the provider/model mapping, the
+language sets, and the per-widget provider, model and label lookups.
+"""
+import argparse
+import re
+import time
+
+import catalog
+from config import CONFIG, costs_per_min
+
+
+def _legacy_mapping():
+    return {
+        component: {
+            provider: [m for m in CONFIG[component]["voice" if component == "TTS" else "model"]["enum"]
+                       if m.startswith(f"{provider}:")]
+            for provider in CONFIG[component]["provider"]["enum"]
+        }
+        for component in ("STT", "LLM", "TTS")
+    }
+
+
+def _legacy_models(mapping, component, language, provider):
+    if component == "STT":
+        return mapping[component][provider]
+    all_voices = mapping[component][provider]
+    if provider in ("azure", "elevenlabs", "cartesia"):
+        short = language.split("-")[0]
+        pattern = re.compile(rf"^{provider}:{short}(-|_)")
+        return [v for v in all_voices if pattern.search(v)]
+    return all_voices
+
+
+def _legacy_providers(component, language):
+    return [p for p in CONFIG[component]["provider"]["enum"] if language in CONFIG[component]["language"][p]]
+
+
+def _legacy_label(component, name, provider=None):
+    cost = costs_per_min[component].get(provider if component == "TTS" else name, None)
+    return f"{catalog.beautify_name(name)} - [{'$'+str(cost)+'/min' if cost is not None else 'Cost N/A'}]"
+
+
+def legacy_rerun(language="hi-IN", stt_provider="sarvam", tts_provider="azure"):
+    mapping = _legacy_mapping()
+    languages = {}
+    for component in ("STT", "TTS"):
+        found = set()
+        for provider in CONFIG[component]["provider"]["enum"]:
+            found.update(CONFIG[component]["language"][provider])
+        languages[component] = sorted(found)
+    stt_providers = _legacy_providers("STT", language)
+    tts_providers = _legacy_providers("TTS", language)
+    stt_models = _legacy_models(mapping, "STT", language, stt_provider)
+    voices = _legacy_models(mapping, "TTS", language, tts_provider)
+    labels = ([_legacy_label("STT", m) for m in stt_models]
+              + [_legacy_label("LLM", m) for m in mapping["LLM"]["openai"]]
+              + [_legacy_label("TTS", v, tts_provider) for v in voices])
+    return languages, stt_providers, tts_providers, stt_models, voices, labels
+
+
+def catalog_rerun(language="hi-IN", stt_provider="sarvam", tts_provider="azure"):
+    languages = {"STT": catalog.LANGUAGES["STT"], "TTS": catalog.LANGUAGES["TTS"]}
+    stt_providers = catalog.get_providers_for_language("STT", language)
+    tts_providers = catalog.get_providers_for_language("TTS", language)
+    stt_models = catalog.get_models_for_language_provider("STT", language, stt_provider)
+    voices = catalog.get_models_for_language_provider("TTS", language, tts_provider)
+    labels = ([catalog.format_option("STT", m) for m in stt_models]
+              + [catalog.format_option("LLM", m) for m in catalog.PROVIDER_MODEL_MAPPING["LLM"]["openai"]]
+              + [catalog.format_option("TTS", v) for v in voices])
+    return languages, stt_providers, tts_providers, stt_models, voices, labels
+
+
+def _normalise(value):
+    if isinstance(value, dict):
+        return {k: _normalise(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalise(v) for v in value]
+    return value
+
+
+def _time(func, reruns):
+    started = time.perf_counter()
+    for _ in range(reruns):
+        func()
+    return (time.perf_counter() - started) / reruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Both paths must produce the same widget options and labels
+    assert _normalise(catalog_rerun()) == _normalise(legacy_rerun())
+
+    legacy = _time(legacy_rerun, args.reruns)
+    compiled = _time(catalog_rerun, args.reruns)
+    print(f"before  {legacy * 1e6:8.1f} us per rerun")
+    print(f"after   {compiled * 1e6:8.1f} us per rerun   ({legacy / compiled:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
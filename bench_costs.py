@@ -0,0 +1,61 @@
+"""Benchmark of the cheapest-configuration search, nested Python loops vs ``costs.CostEngine``.
+
+    python bench_costs.py --queries 200
+
+Each query prices every STT x LLM x TTS combination for one language pair and keeps the
+10 cheapest under a price ceiling.
+"""
+import argparse
+import heapq
+import itertools
+import time
+
+from catalog import LANGUAGES, cost_per_min, get_models_for_language_provider, get_providers_for_language
+from config import CONFIG
+from costs import CostEngine
+
+
+def _loop_cheapest(stt_language, tts_language, n, max_cost):
+    combos = []
+    for stt_provider in get_providers_for_language("STT", stt_language):
+        for stt_model in get_models_for_language_provider("STT", stt_language, stt_provider):
+            for llm_model in CONFIG["LLM"]["model"]["enum"]:
+                for tts_provider in get_providers_for_language("TTS", tts_language):
+                    if not get_models_for_language_provider("TTS", tts_language, tts_provider):
+                        continue
+                    costs = [cost_per_min("STT", stt_model), cost_per_min("LLM", llm_model),
+                             cost_per_min("TTS", f"{tts_provider}:")]
+                    if None not in costs and sum(costs) <= max_cost:
+                        combos.append((sum(costs), stt_model, llm_model, tts_provider))
+    return heapq.nsmallest(n, combos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-cost", type=float, default=0.1)
+    args = parser.parse_args()
+
+    pairs = list(itertools.islice(itertools.cycle(itertools.product(LANGUAGES["STT"], LANGUAGES["TTS"])),
+                                  args.queries))
+    engine = CostEngine()
+
+    start = time.perf_counter()
+    for stt_language, tts_language in pairs:
+        _loop_cheapest(stt_language, tts_language, args.top, args.max_cost)
+    loops = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for stt_language, tts_language in pairs:
+        engine.cheapest(stt_language, tts_language, n=args.top, max_cost=args.max_cost)
+    vectorized = time.perf_counter() - start
+
+    combos = len(engine.stt.names) * len(engine.llm.names) * len(engine.tts.names)
+    print(f"{args.queries} queries over {combos} combinations each")
+    print(f"python loops: {loops / args.queries * 1e3:8.3f} ms/query")
+    print(f"numpy:        {vectorized / args.queries * 1e3:8.3f} ms/query  ({loops / vectorized:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
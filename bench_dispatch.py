@@ -0,0 +1,181 @@
+"""End-to-end benchmark of call setup: metadata write to Redis plus agent dispatch.
+
+    python bench_dispatch.py --calls 200 --concurrency 1 8 32 --latency-ms 50 --failure-rate 0.02
+    python bench_dispatch.py --backend http --output results/dispatch.json
+
+Runs ``initiate_call_with_retry`` against a local redis-server (``--redis-url``) and a
+local dispatch stand-in: the fake ``lk`` executable from ``fake_lk.py`` (``--backend cli``)
+or the HTTP stub from ``dispatch_stub.py`` (``--backend http``). Both inject latency and
+failures. Setup latency is measured per call, from the first metadata write until the
+dispatch succeeds or retries run out, so it includes retries. Every level tags its calls
+with its own ``bench_run`` so no call matches one already set up (``idempotency``) and each
+level measures real dispatches, not dedup hits.
+
+Results are printed and written as JSON (``--output``) for tracking regressions. Point
+``--redis-url`` at a disposable instance; every call leaves its metadata key behind.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import redis
+
+from calls import initiate_call_with_retry
+from metadata_store import get_metadata_store
+from rate_limit import get_call_limiter
+from dispatch_client import CliDispatchBackend, DispatchClient, HttpDispatchBackend
+from dispatch_stub import DispatchStubServer
+from fake_lk import install_fake_lk
+
+METADATA = {
+    "phone_number": "+911234567890",
+    "first_message": "Hello! This is your assistant.",
+    "STT_provider": "sarvam",
+    "STT_model": "saarika:v2",
+    "STT_language": "hi-IN",
+    "LLM_provider": "openai",
+    "LLM_model": "gpt-4o-mini",
+    "LLM_system_prompt": "You are a helpful assistant.",
+    "TTS_provider": "sarvam",
+    "TTS_voice": "Meera",
+    "TTS_language": "hi-IN",
+}
+
+
+def latency_summary(latencies):
+    """Mean and p50/p95/p99/max of ``latencies`` (seconds), in milliseconds."""
+    if len(latencies) < 2:
+        latencies = latencies * 2 or [0.0, 0.0]
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "mean": statistics.mean(latencies) * 1000,
+        "p50": cuts[49] * 1000,
+        "p95": cuts[94] * 1000,
+        "p99": cuts[98] * 1000,
+        "max": max(latencies) * 1000,
+    }
+
+
+def run_concurrency(redis_client, dispatcher, calls, concurrency, max_retries=5, tag=None):
+    """Set up ``calls`` calls with ``concurrency`` workers; returns one result record.
+
+    ``tag`` (default: a new random one) goes into the calls' metadata as ``bench_run``, so
+    their fingerprints differ from those of every other run. The calls' metadata, index
+    entries and call slots are removed afterwards.
+    """
+    metadata = dict(METADATA, bench_run=tag or uuid.uuid4().hex)
+    retries = []
+    dispatched = []
+
+    def one_call(i):
+        phone_number = f"+91{9000000000 + i}"
+        started = time.perf_counter()
+        success, _, _ = initiate_call_with_retry(
+            redis_client, phone_number, metadata, max_retries=max_retries, on_retry=retries.append,
+            dispatcher=dispatcher, on_dispatched=lambda data_id: dispatched.append((data_id, phone_number)),
+        )
+        return success, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_call, range(calls)))
+    elapsed = time.perf_counter() - started
+    store, limiter = get_metadata_store(redis_client), get_call_limiter(redis_client)
+    for data_id, phone_number in dispatched:
+        store.discard(data_id, phone_number)
+        limiter.release(data_id)
+
+    succeeded = sum(1 for success, _ in results if success)
+    return {
+        "concurrency": concurrency,
+        "calls": calls,
+        "succeeded": succeeded,
+        "failed": calls - succeeded,
+        "retries": len(retries),
+        "elapsed_s": elapsed,
+        "calls_per_sec": succeeded / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary([latency for _, latency in results]),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(redis_url, backend="cli", calls=100, concurrency=(1, 8), latency_ms=0.0, failure_rate=0.0,
+                  max_retries=5):
+    """Run every concurrency level against fresh local stand-ins; returns the JSON report."""
+    redis_client = redis.Redis.from_url(redis_url, decode_responses=True,
+                                        max_connections=max(concurrency) + 4)
+    redis_client.ping()
+    run_id = uuid.uuid4().hex[:8]
+    report = {
+        "benchmark": "dispatch",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "params": {"backend": backend, "calls": calls, "latency_ms": latency_ms,
+                   "failure_rate": failure_rate, "max_retries": max_retries},
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="bench-dispatch-") as tmpdir:
+        if backend == "cli":
+            lk = install_fake_lk(tmpdir, latency_ms=latency_ms, failure_rate=failure_rate, redis_url=redis_url)
+            stub, dispatcher = None, DispatchClient(CliDispatchBackend(executable=lk))
+        else:
+            stub = DispatchStubServer(latency=latency_ms / 1000, failure_rate=failure_rate).start()
+            dispatcher = DispatchClient(HttpDispatchBackend(stub.url, "devkey", "secret",
+                                                            pool_size=max(concurrency)))
+        try:
+            for index, level in enumerate(concurrency):
+                report["runs"].append(run_concurrency(redis_client, dispatcher, calls, level, max_retries,
+                                                      tag=f"{run_id}-{index}"))
+        finally:
+            dispatcher.close()
+            if stub is not None:
+                stub.stop()
+    redis_client.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--backend", choices=["cli", "http"], default="cli")
+    parser.add_argument("--calls", type=int, default=100, help="Calls per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latency injected into every dispatch")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of dispatches that fail")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout only)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.redis_url, args.backend, args.calls, args.concurrency, args.latency_ms,
+                           args.failure_rate, args.max_retries)
+    for run in report["runs"]:
+        latency = run["latency_ms"]
+        print(f"concurrency {run['concurrency']:>3}: {run['calls_per_sec']:8.1f} calls/s   "
+              f"p50 {latency['p50']:8.1f} ms   p95 {latency['p95']:8.1f} ms   p99 {latency['p99']:8.1f} ms   "
+              f"{run['failed']} failed, {run['retries']} retries", file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark dispatch latency of the pooled HTTP client against the local dispatch stub.
+
+    python bench_dispatch_client.py --calls 500 --latency-ms 5
+
+Compares the pooled ``HttpDispatchBackend`` with a new HTTP session per call (what a
+per-call CLI process costs in connection setup), and the ``lk`` CLI when it is installed.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import time
+
+from dispatch_client import CliDispatchBackend, HttpDispatchBackend
+from dispatch_stub import DispatchStubServer
+
+
+def _measure(create_dispatch, calls):
+    latencies = []
+    for i in range(calls):
+        started = time.perf_counter()
+        success, _, error = create_dispatch(f"bench-{i}")
+        latencies.append(time.perf_counter() - started)
+        if not success:
+            raise RuntimeError(error)
+    return latencies
+
+
+def _report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<22} mean {statistics.mean(latencies) * 1000:8.2f} ms   "
+          f"p50 {statistics.median(latencies) * 1000:8.2f} ms   p95 {p95 * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Server-side latency injected by the stub")
+    args = parser.parse_args()
+
+    with DispatchStubServer(latency=args.latency_ms / 1000) as server:
+        pooled = HttpDispatchBackend(server.url, "devkey", "secret")
+        _report("pooled http", _measure(pooled.create_dispatch, args.calls))
+        print(f"{'':<22} {len(server.connections)} TCP connection(s) for {args.calls} calls")
+        pooled.close()
+
+        def unpooled(data_id):
+            backend = HttpDispatchBackend(server.url, "devkey", "secret")
+            try:
+                return backend.create_dispatch(data_id)
+            finally:
+                backend.close()
+
+        _report("new session per call", _measure(unpooled, args.calls))
+
+        if shutil.which("lk"):
+            os.environ.update(LIVEKIT_URL=server.url, LIVEKIT_API_KEY="devkey", LIVEKIT_API_SECRET="secret")
+            cli = CliDispatchBackend()
+            _report("lk cli", _measure(cli.create_dispatch, min(args.calls, 50)))
+        else:
+            print("lk cli                 skipped (lk not on PATH)")
+
+
+if __name__ == "__main__":
+    main()
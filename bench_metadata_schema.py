@@ -0,0 +1,105 @@
+"""Metadata validation benchmark: microseconds per payload, one at a time and in campaign-sized batches.
+
+    python bench_metadata_schema.py --records 100000 --invalid 0.05
+    python bench_metadata_schema.py --output results/metadata_schema.json
+
+Builds ``--records`` payloads the way the page does (every provider, model, voice and
+language ``CONFIG`` offers, cycled), breaks a ``--invalid`` fraction of them (a model of
+another provider, an unsupported language, a temperature out of range) and times
+``validate_metadata`` per payload and ``validate_batch`` over all of them. Needs no Redis.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from bench_dispatch import _git_commit
+from catalog import LANGUAGES, PROVIDER_MODEL_MAPPING, get_models_for_language_provider, get_providers_for_language
+from metadata_schema import metadata_name, validate_batch, validate_metadata
+
+BREAKAGES = (
+    {"STT_model": "nova-2-general", "STT_provider": "sarvam"},
+    {"TTS_language": "xx-IN"},
+    {"LLM_temperature": 3.0},
+)
+
+
+def _configurations():
+    """Every valid STT and TTS (language, provider, option) pairing, zipped with every LLM model."""
+    components = {}
+    for component, key in (("STT", "model"), ("TTS", "voice")):
+        components[component] = [
+            {f"{component}_language": language, f"{component}_provider": provider,
+             f"{component}_{key}": metadata_name(option)}
+            for language in LANGUAGES[component]
+            for provider in get_providers_for_language(component, language)
+            for option in get_models_for_language_provider(component, language, provider)
+        ]
+    llm = [{"LLM_provider": provider, "LLM_model": metadata_name(model)}
+           for provider, models in PROVIDER_MODEL_MAPPING["LLM"].items() for model in models]
+    return zip(itertools.cycle(components["STT"]), itertools.cycle(components["TTS"]), itertools.cycle(llm))
+
+
+def build_payloads(records, invalid, seed=0):
+    rng = random.Random(seed)
+    payloads = []
+    for i, (stt, tts, llm) in zip(range(records), _configurations()):
+        metadata = {"phone_number": f"+91{9000000000 + i}", "first_message": "Hello", "LLM_temperature": 0.5,
+                    "use_retrieval": False, "vad_min_silence": 0.65, **stt, **tts, **llm}
+        if rng.random() < invalid:
+            metadata.update(rng.choice(BREAKAGES))
+        payloads.append(metadata)
+    return payloads
+
+
+def run_benchmark(records=100000, invalid=0.05, repeats=5):
+    payloads = build_payloads(records, invalid)
+    single, batch, found = [], [], 0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for metadata in payloads:
+            validate_metadata(metadata)
+        single.append((time.perf_counter() - started) / records * 1e6)
+        started = time.perf_counter()
+        found = len(validate_batch(payloads))
+        batch.append((time.perf_counter() - started) / records * 1e6)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "params": {"records": records, "invalid": invalid, "repeats": repeats},
+        "invalid_found": found,
+        "single_us_per_record": {"median": statistics.median(single), "min": min(single)},
+        "batch_us_per_record": {"median": statistics.median(batch), "min": min(batch)},
+        "batch_records_per_second": records / (statistics.median(batch) * records / 1e6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--invalid", type=float, default=0.05, help="Fraction of payloads to break")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout only)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.records, args.invalid, args.repeats)
+    print(f"{args.records} payloads, {report['invalid_found']} invalid: "
+          f"{report['single_us_per_record']['median']:.2f} us each, "
+          f"{report['batch_us_per_record']['median']:.2f} us per record in a batch", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark call-setup metadata writes against a local redis-server.
+
+    redis-server --port 6379 --save "" &
+    python bench_metadata_store.py --writes 2000
+
+Compares the previous SETEX + GET/compare verification with the single round-trip
+``MetadataStore.write``, then the Redis memory and write bytes of a campaign stored as
+full records versus content-addressed presets.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import redis
+
+from metadata_store import MetadataStore, serialize_metadata, split_metadata
+
+
+def legacy_write(redis_client, data_id, metadata):
+    redis_client.set(data_id, json.dumps(metadata), ex=86400)
+    for _ in range(3):
+        stored_data = redis_client.get(data_id)
+        if stored_data and json.loads(stored_data) == metadata:
+            return
+    raise RuntimeError("verification failed")
+
+
+def _sample_metadata():
+    return {
+        "phone_number": "+911234567890",
+        "first_message": "Hello! This is your assistant. How can I help you today?",
+        "LLM_system_prompt": "You are a helpful assistant. " * 100,
+        "STT_provider": "sarvam",
+        "STT_model": "saarika:v2",
+        "LLM_provider": "openai",
+        "LLM_model": "gpt-4o-mini",
+        "LLM_temperature": 0.5,
+        "TTS_provider": "azure",
+        "TTS_voice": "hi-IN-AaravNeural",
+        "vad_min_silence": 0.65,
+    }
+
+
+def _measure(name, write, writes):
+    latencies = []
+    for i in range(writes):
+        started = time.perf_counter()
+        write(f"bench-meta-{name}-{i}")
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<10} mean {statistics.mean(latencies) * 1e6:8.1f} us   "
+          f"p50 {statistics.median(latencies) * 1e6:8.1f} us   p95 {p95 * 1e6:8.1f} us")
+    return statistics.mean(latencies)
+
+
+def _used_memory(redis_client):
+    return redis_client.info("memory")["used_memory"]
+
+
+def _measure_campaign(name, redis_client, store, metadata, calls):
+    before = _used_memory(redis_client)
+    sent = 0
+    for i in range(calls):
+        call = dict(metadata, phone_number=f"+91{9000000000 + i}")
+        store.write(f"bench-campaign-{name}-{i}", call)
+        if store.use_presets:
+            _, preset_payload, record = split_metadata(call)
+            sent += len(serialize_metadata(record)) + (len(preset_payload) if i == 0 else 0)
+        else:
+            sent += len(serialize_metadata(call))
+    used = _used_memory(redis_client) - before
+    print(f"{name:<10} {calls} calls   redis memory {used / 1024:10.1f} KiB   payload bytes sent {sent / 1024:10.1f} KiB")
+    return used, sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--writes", type=int, default=1000)
+    parser.add_argument("--campaign", type=int, default=5000, help="Calls written in the campaign memory comparison")
+    args = parser.parse_args()
+
+    redis_client = redis.Redis(host=args.host, port=args.port, decode_responses=True)
+    redis_client.ping()
+    metadata = _sample_metadata()
+    store = MetadataStore(redis_client, ttl=60, use_presets=False)
+
+    legacy = _measure("legacy", lambda data_id: legacy_write(redis_client, data_id, metadata), args.writes)
+    atomic = _measure("atomic", lambda data_id: store.write(data_id, metadata), args.writes)
+    print(f"setup latency reduction: {(1 - atomic / legacy) * 100:.1f}%")
+    print()
+
+    full_memory, full_sent = _measure_campaign("full", redis_client, store, metadata, args.campaign)
+    preset_store = MetadataStore(redis_client, ttl=60, use_presets=True)
+    preset_memory, preset_sent = _measure_campaign("presets", redis_client, preset_store, metadata, args.campaign)
+    print(f"memory reduction {full_memory / max(preset_memory, 1):.1f}x   write bytes reduction {full_sent / max(preset_sent, 1):.1f}x")
+
+    for pattern in ("bench-meta-*", "bench-campaign-*"):
+        for key in redis_client.scan_iter(pattern):
+            redis_client.delete(key)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark of local text extraction over a document corpus: upload bytes and extraction time.
+
+    python bench_preprocess.py                     # generated sample corpus
+    python bench_preprocess.py --corpus ./docs --workers 8
+
+The generated corpus mimics what gets uploaded in practice: DOCX files carrying embedded
+images, and text exported page by page with running headers, footers and page numbers.
+Upload time is estimated from ``--bandwidth-mbps``; indexing time on the assistant side
+scales with the same bytes.
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+import zipfile
+
+from kb_sync import iter_directory
+from preprocess import preprocess_documents
+
+_DOCX_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/></Types>'
+)
+_WORDS = ("policy claim premium coverage refund customer agent renewal account billing "
+          "support escalation number request payment term notice service plan").split()
+
+
+def _paragraph(rng, words=60):
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _write_docx(path, rng, paragraphs, image_kb):
+    body = "".join(f"<w:p><w:r><w:t>{_paragraph(rng)}</w:t></w:r></w:p>" for _ in range(paragraphs))
+    document = ('<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w='
+                '"http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body>{body}</w:body></w:document>')
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _DOCX_TYPES)
+        zf.writestr("word/document.xml", document)
+        # Incompressible stand-in for embedded logos and scans
+        zf.writestr("word/media/image1.png", rng.randbytes(image_kb * 1024), zipfile.ZIP_STORED)
+
+
+def _write_paged_text(path, rng, pages):
+    out = io.StringIO()
+    for page in range(1, pages + 1):
+        out.write("ACME Insurance   -   Internal Policy Handbook\n\n")
+        for _ in range(6):
+            out.write(_paragraph(rng).replace(" ", "  ") + "\n\n")
+        out.write(f"Confidential\nPage {page} of {pages}\n\f")
+    with open(path, "w") as f:
+        f.write(out.getvalue())
+
+
+def build_sample_corpus(root, documents, seed=7):
+    rng = random.Random(seed)
+    for i in range(documents):
+        if i % 2:
+            _write_docx(os.path.join(root, f"handbook-{i}.docx"), rng, paragraphs=rng.randint(40, 120),
+                        image_kb=rng.randint(200, 800))
+        else:
+            _write_paged_text(os.path.join(root, f"export-{i}.txt"), rng, pages=rng.randint(10, 40))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="Directory of documents (default: generate a sample corpus)")
+    parser.add_argument("--documents", type=int, default=60, help="Size of the generated corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--bandwidth-mbps", type=float, default=20.0, help="Uplink used to estimate upload time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench-preprocess-") as tmpdir:
+        root = args.corpus
+        if root is None:
+            root = tmpdir
+            build_sample_corpus(root, args.documents)
+        sources = list(iter_directory(root))
+
+        start = time.perf_counter()
+        preprocess_documents(sources, max_workers=1)
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        results = preprocess_documents(sources, max_workers=args.workers)
+        parallel = time.perf_counter() - start
+
+    original = sum(r.original_bytes for r in results)
+    uploaded = sum(r.text_bytes if r.parts else r.original_bytes for r in results)
+    extracted = sum(1 for r in results if r.parts)
+    seconds_per_byte = 8 / (args.bandwidth_mbps * 1e6)
+
+    print(f"{len(results)} documents, text extracted from {extracted}")
+    print(f"upload bytes:  {original / 1e6:8.2f} MB -> {uploaded / 1e6:8.2f} MB  ({original / max(uploaded, 1):.1f}x smaller)")
+    print(f"upload time:   {original * seconds_per_byte:8.2f} s  -> {uploaded * seconds_per_byte:8.2f} s   "
+          f"at {args.bandwidth_mbps:g} Mbit/s")
+    print(f"extraction:    {serial:8.2f} s serial, {parallel:.2f} s with {args.workers} processes "
+          f"({serial / parallel:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
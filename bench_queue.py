@@ -0,0 +1,128 @@
+"""Dispatch-queue benchmark: calls/sec drained from the queue as dispatcher workers are added.
+
+    python bench_queue.py --calls 400 --workers 1 2 4 --concurrency 8 --latency-ms 50
+    python bench_queue.py --redis-url redis://localhost:6379/0 --output results/queue.json
+
+For each worker count, queues ``--calls`` calls with ``enqueue_calls`` (as a bulk campaign
+does) and starts that many ``Dispatcher`` consumers in this process, each setting up
+``--concurrency`` calls at a time through ``initiate_call_with_retry`` against the local
+HTTP dispatch stub (``dispatch_stub.py``) with ``--latency-ms`` per dispatch. The report
+gives the time to drain the queue, calls/sec and how long calls waited in the queue.
+
+Point ``--redis-url`` at a disposable instance; every call leaves its metadata key behind.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import redis
+
+from bench_dispatch import METADATA, _git_commit, latency_summary
+from call_status import status_key
+from calls import initiate_call_with_retry
+from dispatch_client import DispatchClient, HttpDispatchBackend
+from dispatch_queue import Dispatcher, enqueue_calls
+from dispatch_stub import DispatchStubServer
+
+
+def run_workers(redis_client, dispatcher, calls, workers, concurrency):
+    """Queue ``calls`` calls and drain them with ``workers`` consumers; returns one result record."""
+    run_id = uuid.uuid4().hex[:8]
+    stream, status_stream = f"bench-queue-{run_id}", f"bench-queue-status-{run_id}"
+    # A per-run field keeps the dedup window from answering calls of an earlier run
+    metadata = dict(METADATA, bench_run=run_id)
+    data_ids = enqueue_calls(redis_client, [(f"+91{9000000000 + i}", metadata) for i in range(calls)],
+                             stream=stream, status_stream=status_stream)
+    enqueued = time.time()
+
+    def setup(*args, **kwargs):
+        return initiate_call_with_retry(*args, dispatcher=dispatcher, **kwargs)
+
+    consumers = [Dispatcher(redis_client, f"bench-{i}", concurrency=concurrency, stream=stream, block_ms=100,
+                            dispatch=setup, status_stream=status_stream).ensure_group() for i in range(workers)]
+    threads = [threading.Thread(target=consumer.run) for consumer in consumers]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while redis_client.xlen(stream):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    for consumer, thread in zip(consumers, threads):
+        consumer.stop()
+        thread.join()
+
+    statuses = [json.loads(s) for s in redis_client.mget([status_key(d) for d in data_ids])]
+    succeeded = sum(1 for s in statuses if s["status"] == "dispatched")
+    redis_client.delete(stream, status_stream, *(status_key(d) for d in data_ids))
+    return {
+        "workers": workers,
+        "concurrency": concurrency,
+        "calls": calls,
+        "succeeded": succeeded,
+        "failed": calls - succeeded,
+        "elapsed_s": elapsed,
+        "calls_per_sec": succeeded / elapsed if elapsed else 0.0,
+        # Enqueue until the worker reported the call, so queueing plus setup
+        "completion_ms": latency_summary([float(s["ts"]) - enqueued for s in statuses]),
+    }
+
+
+def run_benchmark(redis_url, calls=200, workers=(1, 2, 4), concurrency=8, latency_ms=20.0, failure_rate=0.0):
+    redis_client = redis.Redis.from_url(redis_url, decode_responses=True,
+                                        max_connections=max(workers) * (concurrency + 1) + 4)
+    redis_client.ping()
+    report = {
+        "benchmark": "dispatch_queue",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "params": {"calls": calls, "concurrency": concurrency, "latency_ms": latency_ms,
+                   "failure_rate": failure_rate},
+        "runs": [],
+    }
+    stub = DispatchStubServer(latency=latency_ms / 1000, failure_rate=failure_rate).start()
+    dispatcher = DispatchClient(HttpDispatchBackend(stub.url, "devkey", "secret",
+                                                    pool_size=max(workers) * concurrency))
+    try:
+        for count in workers:
+            report["runs"].append(run_workers(redis_client, dispatcher, calls, count, concurrency))
+    finally:
+        dispatcher.close()
+        stub.stop()
+    redis_client.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--calls", type=int, default=200, help="Calls queued per worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=8, help="Calls each worker sets up at a time")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latency injected into every dispatch")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of dispatches that fail")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout only)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.redis_url, args.calls, args.workers, args.concurrency, args.latency_ms,
+                           args.failure_rate)
+    for run in report["runs"]:
+        completion = run["completion_ms"]
+        print(f"workers {run['workers']:>3}: {run['calls_per_sec']:8.1f} calls/s   "
+              f"completion p50 {completion['p50']:8.1f} ms   p95 {completion['p95']:8.1f} ms   "
+              f"{run['failed']} failed", file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Rerun benchmark: what one widget change costs, as a full page run versus its own panel.
+
+    python bench_rerun.py --runs 20 --files 50
+    python bench_rerun.py --redis-url redis://localhost:6379/0 --output results/rerun.json
+
+Renders ``app.py`` logged in through Streamlit's ``AppTest`` against a local Redis, with
+the knowledge base replaced by an in-memory assistant holding ``--files`` documents. Each
+run changes one configuration widget and reruns the page, and reports:
+
+* ``full_rerun_ms``: wall time of the whole page run, which is what every widget change
+  cost before the panels were fragments (``AppTest`` always runs the whole script).
+* ``panels``: render time of each panel from ``ui_render_seconds``; a widget change in a
+  panel now reruns only that panel.
+
+Run it against an older ``--app`` to compare; panels are empty for a page without them.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Widget key -> (panel it belongs to, values to cycle through)
+WIDGETS = {
+    "llm_temperature": ("llm_tab", (0.3, 0.7)),
+    "vad_min_silence": ("settings_tab", (0.5, 0.8)),
+    "use_retrieval": ("settings_tab", (True, False)),
+}
+
+
+class _Assistant:
+    """Knowledge-base stand-in holding ``files`` available documents."""
+
+    def __init__(self, files):
+        self.files = [SimpleNamespace(id=f"file-{i}", name=f"document-{i}.pdf", status="Available")
+                      for i in range(files)]
+
+    def list_files(self):
+        return list(self.files)
+
+    def upload_file(self, file_path, **kwargs):
+        return SimpleNamespace(id=os.path.basename(file_path), name=os.path.basename(file_path), status="Available")
+
+    def delete_file(self, file_id, **kwargs):
+        pass
+
+
+def _use_redis(redis_url):
+    url = urlparse(redis_url)
+    os.environ.update({
+        "REDIS_HOST": url.hostname or "localhost",
+        "REDIS_PORT": str(url.port or 6379),
+        "REDIS_SSL": str(url.scheme == "rediss"),
+    })
+    if url.password:
+        os.environ["REDIS_PASSWORD"] = url.password
+
+
+def _panel_seconds():
+    from metrics import UI_RENDER_SECONDS
+
+    return {dict(labels)["panel"]: value for (suffix, labels), value in UI_RENDER_SECONDS.samples().items()
+            if suffix == "_sum"}
+
+
+def _summary(values):
+    values = sorted(values)
+    return {"median": statistics.median(values), "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max": values[-1]}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(app=APP, runs=20, files=20, redis_url="redis://localhost:6379/0"):
+    _use_redis(redis_url)
+    os.environ.setdefault("SEED_DEFAULT_USERS", "false")
+    import resources
+    from streamlit.testing.v1 import AppTest
+
+    assistant = _Assistant(files)
+    get_assistant = resources.get_assistant
+    resources.get_assistant = lambda assistant_name=resources.ASSISTANT_NAME: assistant
+    resources._file_list_cache.cache_clear()
+    try:
+        at = AppTest.from_file(app, default_timeout=60)
+        at.session_state["authenticated"] = True
+        at.session_state["user"] = {"email": "bench@example.com", "name": "Bench", "role": "admin"}
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"Rendering {app} failed: {[e.message for e in at.exception]}")
+
+        full, panels, changed = [], {}, {}
+        keys = list(WIDGETS)
+        for run in range(runs):
+            key = keys[run % len(keys)]
+            panel, values = WIDGETS[key]
+            at.session_state[key] = values[(run // len(keys)) % len(values)]
+            before = _panel_seconds()
+            started = time.perf_counter()
+            at.run()
+            full_ms = (time.perf_counter() - started) * 1000
+            after = _panel_seconds()
+            full.append(full_ms)
+            for name, seconds in after.items():
+                panels.setdefault(name, []).append((seconds - before.get(name, 0)) * 1000)
+            if panel in after:
+                changed.setdefault(key, []).append(((after[panel] - before.get(panel, 0)) * 1000, full_ms))
+    finally:
+        resources.get_assistant = get_assistant
+        resources._file_list_cache.cache_clear()
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "params": {"runs": runs, "files": files, "widgets": {key: panel for key, (panel, _) in WIDGETS.items()}},
+        "exceptions": [e.message for e in at.exception],
+        "full_rerun_ms": _summary(full),
+        "panels": {name: _summary(times) for name, times in sorted(panels.items())},
+        # Median cost of a change to each widget: its panel alone versus the whole page
+        "widgets": {
+            key: {"panel": WIDGETS[key][0], "panel_ms": statistics.median(p for p, _ in samples),
+                  "full_rerun_ms": statistics.median(f for _, f in samples)}
+            for key, samples in changed.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=APP)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--files", type=int, default=20, help="Documents in the stand-in knowledge base")
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout only)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.app, args.runs, args.files, args.redis_url)
+    full = report["full_rerun_ms"]
+    print(f"full page rerun {full['median']:.1f} ms median (p95 {full['p95']:.1f} ms)", file=sys.stderr)
+    for name, times in report["panels"].items():
+        print(f"  {times['median']:8.1f} ms  {name}", file=sys.stderr)
+    for key, widget in report["widgets"].items():
+        print(f"{key}: {widget['panel']} rerun {widget['panel_ms']:.1f} ms instead of "
+              f"{widget['full_rerun_ms']:.1f} ms", file=sys.stderr)
+    if report["exceptions"]:
+        print(f"page raised: {report['exceptions']}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Scheduler benchmark: how late scheduled calls reach the dispatch queue under a large schedule.
+
+    python bench_scheduler.py --pending 20000 --due 2000 --spread 5
+    python bench_scheduler.py --pollers 4 --redis-url redis://localhost:6379/0 --output results/scheduler.json
+
+Schedules ``--pending`` calls for tomorrow, which stay in the sorted set the whole run, and
+``--due`` calls spread evenly over the next ``--spread`` seconds, then runs ``--pollers``
+``SchedulePoller``s on those keys until every due call is in the dispatch stream. Lateness
+is the time from a call's due time to its stream entry (both on the Redis server clock's
+host). Reports lateness percentiles, whether any call was queued twice or not at all, and
+how long scheduling took. All keys are under a unique prefix, and they and the calls'
+``call-status:`` keys are deleted afterwards.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+import redis
+
+from bench_dispatch import METADATA
+from call_status import status_key
+from scheduler import SchedulePoller, schedule_calls
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(redis_url="redis://localhost:6379/0", pending=10000, due=1000, spread=5.0, pollers=2,
+                  batch_size=500, max_sleep=1.0):
+    client = redis.Redis.from_url(redis_url, decode_responses=True)
+    prefix = f"bench-schedule-{uuid.uuid4().hex[:8]}"
+    keys = {"schedule_key": f"{prefix}:schedule", "jobs_key": f"{prefix}:jobs"}
+    stream, status_stream = f"{prefix}:queue", f"{prefix}:status"
+    data_ids = []
+    try:
+        started = time.perf_counter()
+        for offset in range(0, pending, 1000):
+            data_ids += [data_id for data_id, _ in schedule_calls(
+                client, [(f"+91{9000000000 + i}", METADATA) for i in range(offset, min(pending, offset + 1000))],
+                time.time() + 86400, status_stream=status_stream, **keys)]
+        schedule_seconds = time.perf_counter() - started
+
+        start = time.time() + 1.0
+        due_at = {}
+        for i in range(due):
+            data_id, at = schedule_calls(client, [(f"+91{8000000000 + i}", METADATA)], start + spread * i / due,
+                                         status_stream=status_stream, **keys)[0]
+            due_at[data_id] = at
+            data_ids.append(data_id)
+        running = [SchedulePoller(client, batch_size, max_sleep, stream=stream, status_stream=status_stream, **keys).start() for _ in range(pollers)]
+        deadline = start + spread + 30
+        while client.xlen(stream) < due and time.time() < deadline:
+            time.sleep(0.05)
+        for poller in running:
+            poller.stop()
+
+        entries = client.xrange(stream)
+        queued = [fields["data_id"] for _, fields in entries]
+        lateness = sorted(max(0.0, int(entry_id.split("-")[0]) / 1000 - due_at[fields["data_id"]]) * 1000
+                          for entry_id, fields in entries)
+        remaining = client.zcard(keys["schedule_key"])
+    finally:
+        for key in client.scan_iter(f"{prefix}*"):
+            client.delete(key)
+        for offset in range(0, len(data_ids), 1000):
+            client.delete(*(status_key(data_id) for data_id in data_ids[offset:offset + 1000]))
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "params": {"pending": pending, "due": due, "spread": spread, "pollers": pollers, "batch_size": batch_size,
+                   "max_sleep": max_sleep},
+        "schedule_calls_per_second": pending / schedule_seconds if schedule_seconds else None,
+        "queued": len(queued),
+        "duplicates": len(queued) - len(set(queued)),
+        "missing": len(set(due_at) - set(queued)),
+        "still_scheduled": remaining,
+        "lateness_ms": {
+            "p50": statistics.median(lateness), "p95": _percentile(lateness, 0.95),
+            "p99": _percentile(lateness, 0.99), "max": lateness[-1],
+        } if lateness else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pending", type=int, default=10000, help="Calls scheduled for tomorrow")
+    parser.add_argument("--due", type=int, default=1000, help="Calls due during the run")
+    parser.add_argument("--spread", type=float, default=5.0, help="Seconds the due calls are spread over")
+    parser.add_argument("--pollers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--max-sleep", type=float, default=1.0)
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL", "redis://localhost:6379/0"))
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout only)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.redis_url, args.pending, args.due, args.spread, args.pollers, args.batch_size,
+                           args.max_sleep)
+    lateness = report["lateness_ms"] or {}
+    print(f"{report['queued']}/{args.due} due calls queued with {args.pending} pending, "
+          f"{report['duplicates']} twice, {report['missing']} missing; lateness p50 {lateness.get('p50', 0):.1f} ms, "
+          f"p99 {lateness.get('p99', 0):.1f} ms, max {lateness.get('max', 0):.1f} ms", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
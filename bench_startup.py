@@ -0,0 +1,143 @@
+"""Cold-start benchmark: time until the login page first renders, with an import-time profile.
+
+    python bench_startup.py --runs 5 --budget-ms 1500
+    python bench_startup.py --output results/startup.json
+
+Each run starts a fresh interpreter that renders ``app.py`` once, logged out, through
+Streamlit's ``AppTest``, the way a new container or worker process serves its first page.
+The median wall time of ``--runs`` runs is checked against ``--budget-ms``. One more run
+under ``python -X importtime`` gives the profile: the modules the page script itself
+imports, slowest first, separately from the Streamlit runtime. The login page must not
+load any of the ``--forbid`` modules; they belong to features behind the login.
+
+Exits non-zero when the budget is exceeded or a forbidden module is loaded, so it can gate
+a CI job. The JSON report (``--output``) is for tracking regressions over time.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+MARKER = "bench-startup: rendering"
+
+# Run by each fresh interpreter; prints one JSON line
+_DRIVER = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+runtime_loaded = time.perf_counter()
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+at = AppTest.from_file({app!r}, default_timeout=60).run()
+rendered = time.perf_counter()
+print(json.dumps({{
+    "runtime_ms": (runtime_loaded - started) * 1000,
+    "script_ms": (rendered - runtime_loaded) * 1000,
+    "exceptions": [e.message for e in at.exception],
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+
+def _render(app, importtime=False):
+    """Render ``app`` once in a new interpreter; returns (wall ms, driver result, stderr)."""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        "-c", _DRIVER.format(marker=MARKER, app=app)]
+    started = time.perf_counter()
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(app),
+                               env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"Rendering {app} failed:\n{completed.stderr[-2000:]}")
+    return wall_ms, json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def parse_importtime(stderr, after=None):
+    """Top-level imports from ``-X importtime`` output as ``[(module, cumulative ms)]``, slowest first.
+
+    Only imports logged after the line ``after`` are included when it is given.
+    """
+    lines = stderr.splitlines()
+    if after is not None and after in lines:
+        lines = lines[lines.index(after) + 1:]
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # One leading space marks an import made directly by the code being profiled
+        if name.startswith(" ") and not name.startswith("  "):
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(app=APP, runs=5, budget_ms=1500.0, forbid=("redis", "requests", "numpy", "pinecone"), top=15):
+    timings = [_render(app) for _ in range(runs)]
+    wall = [wall_ms for wall_ms, _, _ in timings]
+    _, profiled, stderr = _render(app, importtime=True)
+    loaded = sorted(set(forbid) & set(profiled["modules"]))
+    median = statistics.median(wall)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "params": {"runs": runs, "budget_ms": budget_ms, "forbid": list(forbid)},
+        "wall_ms": {"median": median, "min": min(wall), "max": max(wall)},
+        "runtime_ms": statistics.median(result["runtime_ms"] for _, result, _ in timings),
+        "script_ms": statistics.median(result["script_ms"] for _, result, _ in timings),
+        "exceptions": profiled["exceptions"],
+        "script_imports": [{"module": m, "ms": round(ms, 1)} for m, ms in parse_importtime(stderr, MARKER)[:top]],
+        "all_imports": [{"module": m, "ms": round(ms, 1)} for m, ms in parse_importtime(stderr)[:top]],
+        "forbidden_loaded": loaded,
+        "within_budget": median <= budget_ms and not loaded and not profiled["exceptions"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=APP)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", 1500)),
+                        help="Maximum median time until the login page has rendered")
+    parser.add_argument("--forbid", nargs="*", default=["redis", "requests", "numpy", "pinecone"],
+                        help="Modules the login page must not import")
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to report")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout only)")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.app, args.runs, args.budget_ms, tuple(args.forbid), args.top)
+    wall = report["wall_ms"]
+    print(f"login page rendered in {wall['median']:.0f} ms median (min {wall['min']:.0f}, max {wall['max']:.0f}; "
+          f"budget {args.budget_ms:.0f} ms): Streamlit runtime {report['runtime_ms']:.0f} ms, "
+          f"page script {report['script_ms']:.0f} ms", file=sys.stderr)
+    for entry in report["script_imports"]:
+        print(f"  {entry['ms']:8.1f} ms  {entry['module']}", file=sys.stderr)
+    if report["forbidden_loaded"]:
+        print(f"login page loaded {', '.join(report['forbidden_loaded'])}", file=sys.stderr)
+    if report["exceptions"]:
+        print(f"login page raised: {report['exceptions']}", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    sys.exit(0 if report["within_budget"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Look up call records by time, phone number or campaign without scanning the keyspace.
+
+    python call_index.py recent --minutes 60
+    python call_index.py phone +911234567890
+    python call_index.py campaign spring-renewals
+
+``MetadataStore`` keeps the indexes in ``metadata_store.INDEX_PREFIX`` up to date on every
+write. A page of results costs one sorted-set range (``O(log N)`` plus the page size), or one
+``HSCAN`` step for a campaign, plus a single ``MGET`` of the calls' latest status. Time and
+phone lookups come newest first; every page carries a ``cursor`` for the next one, ``None``
+on the last page.
+"""
+import argparse
+import json
+import time
+from dataclasses import dataclass, field
+
+from call_status import status_key
+from metadata_store import INDEX_PREFIX, campaign_key, campaigns_key, phone_index_key, time_index_key
+
+PAGE_SIZE = 50
+
+
+@dataclass
+class CallRecord:
+    data_id: str
+    phone_number: str
+    created_at: float
+    # Latest lifecycle status reported by the agent (``call_status``), '' before the first event
+    status: str = ""
+    detail: str = ""
+
+
+@dataclass
+class CallPage:
+    records: list = field(default_factory=list)
+    cursor: str = None
+
+
+def phone_of(data_id):
+    """Phone number embedded in a ``call-<phone>-<ts>-<rand>`` data_id, '' for other ids."""
+    if not data_id.startswith("call-"):
+        return ""
+    return data_id[len("call-"):].rsplit("-", 2)[0]
+
+
+def _with_status(redis_client, records):
+    if records:
+        for record, stored in zip(records, redis_client.mget([status_key(r.data_id) for r in records])):
+            if stored:
+                event = json.loads(stored)
+                record.status, record.detail = event["status"], event.get("detail", "")
+    return records
+
+
+def _newest_first(redis_client, key, start, end, cursor, count):
+    """One page of a sorted set, newest first, with a ``<score>:<skip>`` keyset cursor.
+
+    The cursor holds the last score returned and how many members with exactly that score
+    were already returned, so ties are neither repeated nor skipped and no page pays for
+    an offset from the top.
+    """
+    if cursor:
+        newest, skip = cursor.rsplit(":", 1)
+        skip = int(skip)
+    else:
+        newest, skip = ("+inf" if end is None else end), 0
+    oldest = "-inf" if start is None else start
+    rows = redis_client.zrevrangebyscore(key, newest, oldest, start=skip, num=count + 1, withscores=True)
+    if len(rows) <= count:
+        return rows, None
+    rows = rows[:count]
+    last = rows[-1][1]
+    ties = sum(1 for _, score in rows if score == last)
+    if cursor and last == float(newest):
+        ties += skip
+    return rows, f"{last!r}:{ties}"
+
+
+def calls_between(redis_client, start=None, end=None, cursor=None, count=PAGE_SIZE, prefix=INDEX_PREFIX):
+    """Calls written between the ``start`` and ``end`` timestamps (inclusive, open when ``None``)."""
+    rows, cursor = _newest_first(redis_client, time_index_key(prefix), start, end, cursor, count)
+    records = [CallRecord(data_id, phone_of(data_id), created_at) for data_id, created_at in rows]
+    return CallPage(_with_status(redis_client, records), cursor)
+
+
+def count_between(redis_client, start=None, end=None, prefix=INDEX_PREFIX):
+    """Number of calls written between ``start`` and ``end``, in ``O(log N)``."""
+    return redis_client.zcount(time_index_key(prefix), "-inf" if start is None else start,
+                               "+inf" if end is None else end)
+
+
+def calls_to(redis_client, phone_number, start=None, end=None, cursor=None, count=PAGE_SIZE, prefix=INDEX_PREFIX):
+    """Calls to ``phone_number``, optionally limited to a time range like ``calls_between``."""
+    rows, cursor = _newest_first(redis_client, phone_index_key(phone_number, prefix), start, end, cursor, count)
+    records = [CallRecord(data_id, phone_number, created_at) for data_id, created_at in rows]
+    return CallPage(_with_status(redis_client, records), cursor)
+
+
+def campaign_calls(redis_client, campaign, cursor=None, count=PAGE_SIZE, prefix=INDEX_PREFIX):
+    """Calls of ``campaign``, one ``HSCAN`` step per page; each page is sorted newest first."""
+    next_cursor, entries = redis_client.hscan(campaign_key(campaign, prefix), cursor=int(cursor or 0), count=count)
+    records = []
+    for data_id, entry in entries.items():
+        entry = json.loads(entry)
+        records.append(CallRecord(data_id, entry["phone_number"], float(entry["created_at"])))
+    records.sort(key=lambda r: r.created_at, reverse=True)
+    return CallPage(_with_status(redis_client, records), str(next_cursor) if int(next_cursor) else None)
+
+
+def recent_campaigns(redis_client, count=20, prefix=INDEX_PREFIX):
+    """``(campaign, time of its latest call)`` for the most recently active campaigns."""
+    return redis_client.zrevrange(campaigns_key(prefix), 0, count - 1, withscores=True)
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from resources import get_redis_client
+
+    parser = argparse.ArgumentParser(description="Look up call records by time, phone number or campaign")
+    commands = parser.add_subparsers(dest="command", required=True)
+    recent = commands.add_parser("recent")
+    recent.add_argument("--minutes", type=float, default=60)
+    phone = commands.add_parser("phone")
+    phone.add_argument("phone_number")
+    campaign = commands.add_parser("campaign")
+    campaign.add_argument("name")
+    parser.add_argument("--limit", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+    load_dotenv()
+
+    redis_client = get_redis_client()
+    if args.command == "recent":
+        page = calls_between(redis_client, start=time.time() - args.minutes * 60, count=args.limit)
+    elif args.command == "phone":
+        page = calls_to(redis_client, args.phone_number, count=args.limit)
+    else:
+        page = campaign_calls(redis_client, args.name, count=args.limit)
+    for record in page.records:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created_at))
+        print(f"{created}  {record.phone_number:<14}  {record.status or '-':<10}  {record.data_id}")
+    if page.cursor:
+        print(f"... more (cursor {page.cursor})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Call lifecycle events over a Redis Stream, keyed by the call's ``data_id``.
+
+The agent reports each call's progress with ``publish_status`` (or ``python call_status.py
+publish <data_id> <status>``):
+
+    [queued ->] dispatched -> ringing -> answered -> ended
+                                                -> failed   (from any state)
+
+Calls sent through the dispatch queue (``dispatch_queue``) start out ``queued``; the
+dispatcher worker reports ``dispatched`` or ``failed`` once it has handled them.
+
+Every event is appended to the ``call-status`` stream and the latest one is also stored under
+``call-status:<data_id>`` so a page opened later still knows where a call stands. Each app
+process runs one ``CallStatusTracker``: a background thread blocked in ``XREAD`` on the
+stream, which keeps the state of watched calls in memory. Rendering the status panel only
+reads that memory, so hundreds of in-flight calls cost no Redis round trips per refresh.
+
+A call that has not finished but has had no event for ``STALE_AFTER`` seconds (e.g. because
+the agent does not publish statuses) is marked stale. It is then treated like a finished
+call: the panel stops refreshing for it, and it is forgotten after the retention period. A
+later event makes it live again.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import redis
+
+from metadata_store import METADATA_TTL
+from rate_limit import release_call
+
+logger = logging.getLogger(__name__)
+
+STATUS_STREAM = "call-status"
+STATUS_KEY_PREFIX = "call-status:"
+STATUSES = ("scheduled", "queued", "dispatched", "ringing", "answered", "ended", "failed")
+TERMINAL_STATUSES = ("ended", "failed")
+
+# Seconds without an event after which an unfinished call is considered stale
+STALE_AFTER = int(os.getenv("CALL_STATUS_STALE_AFTER", 1800))
+
+# Approximate cap on the stream; the per-call keys keep the latest state beyond it
+STREAM_MAXLEN = 10000
+
+
+def status_key(data_id):
+    return f"{STATUS_KEY_PREFIX}{data_id}"
+
+
+def add_status(pipe, data_id, status, detail=None, stream=STATUS_STREAM):
+    """Queue the commands recording a lifecycle event for ``data_id`` on ``pipe``."""
+    if status not in STATUSES:
+        raise ValueError(f"Unknown call status: {status}")
+    event = {"data_id": data_id, "status": status, "ts": f"{time.time():.3f}", "detail": detail or ""}
+    pipe.xadd(stream, event, maxlen=STREAM_MAXLEN, approximate=True)
+    pipe.set(status_key(data_id), json.dumps(event), ex=METADATA_TTL)
+
+
+def publish_status(redis_client, data_id, status, detail=None, stream=STATUS_STREAM):
+    """Record a lifecycle event for ``data_id``; used by the agent.
+
+    A final status also frees the call's concurrency slots (``rate_limit``).
+    """
+    pipe = redis_client.pipeline(transaction=True)
+    add_status(pipe, data_id, status, detail, stream)
+    entry_id = pipe.execute()[0]
+    if status in TERMINAL_STATUSES:
+        release_call(redis_client, data_id)
+    return entry_id
+
+
+@dataclass
+class CallState:
+    data_id: str
+    label: str = ""
+    status: str = "dispatched"
+    detail: str = ""
+    started_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    stale: bool = False
+
+    @property
+    def finished(self):
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def settled(self):
+        """Finished, or stale: no further updates are expected."""
+        return self.finished or self.stale
+
+
+class CallStatusTracker:
+    """Process-wide view of watched calls, fed by one blocking ``XREAD`` listener thread."""
+
+    def __init__(self, redis_client, stream=STATUS_STREAM, block_ms=5000, retention=6 * 3600,
+                 stale_after=STALE_AFTER, clock=time.time):
+        self.redis = redis_client
+        self.stream = stream
+        self.block_ms = block_ms
+        # Finished and stale calls are forgotten this many seconds after their last event
+        self.retention = retention
+        self.stale_after = stale_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_id = "$"
+
+    def start(self):
+        # Pin the starting point now so events published after start() are never missed
+        try:
+            last = self.redis.xrevrange(self.stream, count=1)
+            self._last_id = last[0][0] if last else "0-0"
+        except redis.RedisError:
+            logger.warning("Could not read the call-status stream position", exc_info=True)
+        self._thread = threading.Thread(target=self._listen, daemon=True, name="call-status")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop listening; returns once the current blocking read has finished."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def watch(self, data_id, label=""):
+        """Start tracking ``data_id``, picking up any status it already has in Redis."""
+        state = CallState(data_id, label, started_at=self._clock(), updated_at=self._clock())
+        with self._lock:
+            self._calls.setdefault(data_id, state)
+        try:
+            stored = self.redis.get(status_key(data_id))
+        except redis.RedisError:
+            stored = None
+        if stored:
+            self._apply(json.loads(stored))
+
+    def get(self, data_ids):
+        """Current state of each of ``data_ids`` that is still tracked, in the same order."""
+        with self._lock:
+            return [self._calls[data_id] for data_id in data_ids if data_id in self._calls]
+
+    def _apply(self, event):
+        with self._lock:
+            state = self._calls.get(event["data_id"])
+            if state is None:
+                return
+            ts = float(event.get("ts") or self._clock())
+            # Events can arrive twice (stream and stored key); keep the newest one
+            if ts < state.updated_at and state.status != "dispatched":
+                return
+            state.status = event["status"]
+            state.detail = event.get("detail", "")
+            state.updated_at = ts
+            state.stale = False
+
+    def _evict(self):
+        now = self._clock()
+        with self._lock:
+            for state in self._calls.values():
+                if not state.finished and state.updated_at < now - self.stale_after:
+                    state.stale = True
+            cutoff = now - self.retention
+            for data_id in [d for d, s in self._calls.items() if s.settled and s.updated_at < cutoff]:
+                del self._calls[data_id]
+
+    def _listen(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                response = self.redis.xread({self.stream: self._last_id}, block=self.block_ms, count=500)
+                failures = 0
+            except redis.RedisError:
+                failures += 1
+                logger.warning("Call-status listener lost Redis; retrying", exc_info=failures == 1)
+                self._stop.wait(min(30.0, 2.0 ** failures))
+                continue
+            for _, entries in response or ():
+                for entry_id, fields in entries:
+                    self._last_id = entry_id
+                    self._apply(fields)
+            self._evict()
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from resources import get_redis_client
+
+    parser = argparse.ArgumentParser(description="Publish a call lifecycle event, as the agent does")
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish")
+    publish.add_argument("data_id")
+    publish.add_argument("status", choices=STATUSES)
+    publish.add_argument("--detail", default="")
+    args = parser.parse_args()
+    load_dotenv()
+
+    print(publish_status(get_redis_client(), args.data_id, args.status, args.detail))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import logging
+import random
+import re
+import time
+
+import redis
+
+from dispatch_client import get_dispatch_client
+from idempotency import DISPATCHED, call_fingerprint, get_dispatch_claims
+from metadata_schema import InvalidMetadataError, validate_metadata
+from metadata_store import MetadataWriteError, get_metadata_store
+from metrics import (
+    CALL_SETUP_DUPLICATES,
+    CALL_SETUP_FAILURES,
+    CALL_SETUP_RETRIES,
+    CALL_SETUP_SECONDS,
+    CALL_SETUP_STAGE_SECONDS,
+)
+from rate_limit import get_call_limiter
+from resilience import CircuitOpenError, ClaimLostError, DispatchError, RateLimitedError, RetryPolicy, get_breaker
+
+logger = logging.getLogger(__name__)
+
+# Start of the error returned for a call refused by the call limits
+RATE_LIMITED = "Rate limited"
+
+
+def validate_phone_number(phone):
+    return bool(re.match(r'^\+91\d{10}$', phone or ""))
+
+
+def new_data_id(phone_number):
+    """Key the call's metadata is stored under, and the id its status is reported by."""
+    return f"call-{phone_number}-{int(time.time())}-{random.randint(100000, 999999)}"
+
+
+def _failure_reason(error):
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, MetadataWriteError):
+        return "metadata_mismatch"
+    if isinstance(error, DispatchError):
+        return "dispatch_rejected"
+    if isinstance(error, RateLimitedError):
+        return "rate_limited"
+    if isinstance(error, InvalidMetadataError):
+        return "invalid_metadata"
+    if isinstance(error, ClaimLostError):
+        return "duplicate"
+    return "error"
+
+
+_RETRY_MESSAGES = {
+    "metadata_mismatch": "Data verification failed",
+    "dispatch_rejected": "Call initiation failed",
+}
+
+
+def initiate_call_with_retry(redis_client, phone_number, metadata, max_retries=5, on_retry=None, dispatcher=None,
+                             on_dispatched=None, policy=None, campaign=None, data_id=None, operator=None,
+                             limiter=None, limit_wait=None):
+    """Handle call initiation with automatic retries for both data verification and call initiation.
+
+    Transient failures are retried with jittered exponential backoff (``resilience``); the
+    Redis write and the dispatch each go through a process-wide circuit breaker, so during
+    an outage calls fail fast instead of waiting out every retry. ``on_retry`` is called
+    with a short message before every retry; the Streamlit page passes ``st.warning`` here,
+    background workers leave it unset. ``dispatcher`` defaults to the process-wide
+    ``DispatchClient``. ``on_dispatched`` receives the ``data_id`` of the dispatched call,
+    e.g. to follow its status. Stage timings, retries and failures are recorded in ``metrics``.
+    The call is indexed by time and phone number, and under ``campaign`` if given (``call_index``).
+
+    Dispatch is idempotent (``idempotency``): the same phone number and metadata submitted
+    again within the dedup window returns the existing dispatch instead of dialing twice,
+    and all retries of one request reuse a single ``data_id``. A ``data_id`` chosen in
+    advance (e.g. when the call was queued) is used instead of a new one. The claim is
+    extended before every attempt; a call whose claim was taken over meanwhile fails
+    without dialing.
+
+    Before the first dispatch attempt the call takes a token and a concurrency slot for its
+    SIP trunk and for ``operator`` from ``limiter`` (default: the process-wide
+    ``CallLimiter``), waiting up to ``limit_wait`` seconds (default: the limiter's
+    ``max_wait``) when either is out of budget (``rate_limit``). Interactive callers pass 0 to
+    be refused at once with a ``RATE_LIMITED`` error; queue workers wait.
+
+    Metadata that does not match ``CONFIG`` (``metadata_schema``) fails at once, before
+    anything is claimed, written or dialed.
+    """
+    if dispatcher is None:
+        dispatcher = get_dispatch_client()
+    backend = getattr(dispatcher, "backend_name", "custom")
+    if policy is None:
+        policy = RetryPolicy(max_attempts=max_retries, sleep=_timed_sleep(backend))
+    redis_breaker, dispatch_breaker = get_breaker("redis"), get_breaker("dispatch")
+    claims = get_dispatch_claims(redis_client)
+    if limiter is None:
+        limiter = get_call_limiter(redis_client)
+    fingerprint = call_fingerprint(phone_number, metadata)
+    data_id = data_id or new_data_id(phone_number)
+    started = time.perf_counter()
+
+    def _attempt():
+        if not redis_breaker.call(claims.extend, fingerprint, data_id):
+            raise ClaimLostError("An identical call is already being set up")
+
+        # Store metadata in Redis (24 hour expiry); the reply itself confirms the write
+        with CALL_SETUP_STAGE_SECONDS.time(stage="metadata_write", backend=backend):
+            redis_breaker.call(get_metadata_store(redis_client).write, data_id, metadata, campaign=campaign)
+
+        # If data is verified, initiate the call
+        with CALL_SETUP_STAGE_SECONDS.time(stage="dispatch", backend=backend):
+            return dispatch_breaker.call(_dispatch, dispatcher, data_id)
+
+    def _retrying(attempt, error, delay):
+        reason = _failure_reason(error)
+        CALL_SETUP_RETRIES.inc(reason=reason)
+        if on_retry is not None:
+            on_retry(f"Attempt {attempt}: {_RETRY_MESSAGES.get(reason, 'Error occurred')}, retrying...")
+
+    def _failed(error):
+        reason = _failure_reason(error)
+        CALL_SETUP_SECONDS.observe(time.perf_counter() - started, outcome="failure")
+        CALL_SETUP_FAILURES.inc(reason=reason)
+        if reason == "metadata_mismatch":
+            return False, None, "Failed to verify metadata storage after all retries"
+        if reason == "rate_limited":
+            return False, None, f"{RATE_LIMITED}: {error}"
+        return False, None, str(error)
+
+    errors = validate_metadata(metadata)
+    if errors:
+        return _failed(InvalidMetadataError(errors))
+
+    try:
+        existing = policy.call(lambda: redis_breaker.call(claims.claim, fingerprint, data_id), on_retry=_retrying)
+    except Exception as e:
+        return _failed(e)
+    if existing is not None:
+        CALL_SETUP_DUPLICATES.inc(status=existing["status"])
+        if existing["status"] != DISPATCHED:
+            return False, None, "An identical call is already being set up"
+        if on_dispatched is not None:
+            on_dispatched(existing["data_id"])
+        return True, existing.get("output"), None
+
+    try:
+        with CALL_SETUP_STAGE_SECONDS.time(stage="rate_limit", backend=backend):
+            # Only the Redis round trips count towards the breaker, not the wait for a slot
+            limiter.acquire(data_id, operator, limit_wait, breaker=redis_breaker)
+        output = policy.call(_attempt, on_retry=_retrying)
+    except Exception as e:
+        _discard(redis_client, claims, limiter, fingerprint, data_id, metadata.get("phone_number"), campaign)
+        return _failed(e)
+
+    try:
+        claims.mark_dispatched(fingerprint, data_id, output)
+    except redis.RedisError:
+        # The call is out; a lost marker only means a duplicate within the window is refused
+        logger.warning("Could not mark call %s as dispatched", data_id, exc_info=True)
+    CALL_SETUP_SECONDS.observe(time.perf_counter() - started, outcome="success")
+    if on_dispatched is not None:
+        on_dispatched(data_id)
+    return True, output, None
+
+
+def _discard(redis_client, claims, limiter, fingerprint, data_id, phone_number, campaign):
+    """Release the claim and call slots of a call that was never dispatched and drop its metadata.
+
+    Each is cleaned up even if another fails; all of them expire on their own, the claim
+    within the dedup window.
+    """
+    cleanups = (
+        ("dispatch claim", claims.release, (fingerprint, data_id)),
+        ("call slots", limiter.release, (data_id,)),
+        ("metadata", get_metadata_store(redis_client).discard, (data_id, phone_number, campaign)),
+    )
+    for what, cleanup, args in cleanups:
+        try:
+            cleanup(*args)
+        except redis.RedisError:
+            logger.warning("Could not release the %s of undispatched call %s", what, data_id, exc_info=True)
+
+
+def _dispatch(dispatcher, data_id):
+    success, output, error = dispatcher.create_dispatch(data_id)
+    if not success:
+        raise DispatchError(error)
+    return output
+
+
+def _timed_sleep(backend):
+    def sleep(seconds):
+        with CALL_SETUP_STAGE_SECONDS.time(stage="retry_sleep", backend=backend):
+            time.sleep(seconds)
+    return sleep
@@ -0,0 +1,126 @@
+import csv
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from calls import initiate_call_with_retry, validate_phone_number
+from metadata_schema import InvalidMetadataError, validate_batch
+from metadata_store import TEMPLATED_FIELDS
+
+# Column that holds the number to dial; every other column becomes a per-row variable
+PHONE_COLUMN = "phone_number"
+PHONE_COLUMN_ALIASES = ("phone_number", "phone", "number", "mobile")
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+@dataclass
+class CampaignRow:
+    row_number: int
+    phone_number: str
+    variables: dict = field(default_factory=dict)
+
+
+@dataclass
+class CampaignResult:
+    row_number: int
+    phone_number: str
+    success: bool
+    output: str = None
+    error: str = None
+
+
+def render_template(text, variables):
+    """Substitute {name} placeholders with row variables, leaving unknown braces untouched."""
+    if not text or not variables:
+        return text
+    return _PLACEHOLDER.sub(lambda m: str(variables.get(m.group(1), m.group(0))), text)
+
+
+def parse_campaign_csv(data):
+    """Parse an uploaded campaign CSV into rows to dial and per-row errors.
+
+    Returns ``(rows, errors)`` where ``errors`` holds a ``CampaignResult`` for every
+    row that cannot be dialed (missing or malformed phone number).
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(data))
+    fieldnames = [name.strip() for name in (reader.fieldnames or [])]
+    phone_column = next((alias for alias in PHONE_COLUMN_ALIASES if alias in fieldnames), None)
+    if phone_column is None:
+        raise ValueError(f"CSV must have a '{PHONE_COLUMN}' column")
+
+    rows, errors = [], []
+    # Row numbers are 1-based and account for the header line, matching what a spreadsheet shows
+    for row_number, record in enumerate(reader, start=2):
+        record = {(k or "").strip(): (v or "").strip() for k, v in record.items()}
+        phone_number = record.pop(phone_column, "").replace(" ", "").replace("-", "")
+        if not validate_phone_number(phone_number):
+            errors.append(CampaignResult(row_number, phone_number, False, error="Invalid phone number"))
+            continue
+        rows.append(CampaignRow(row_number, phone_number, record))
+    return rows, errors
+
+
+def build_campaign_metadata(base_metadata, rows):
+    """Build the per-call metadata dicts for a whole campaign in one pass."""
+    jobs = []
+    for row in rows:
+        metadata = dict(base_metadata)
+        metadata[PHONE_COLUMN] = row.phone_number
+        for key in TEMPLATED_FIELDS:
+            if key in metadata:
+                metadata[key] = render_template(metadata[key], row.variables)
+        metadata["variables"] = row.variables
+        jobs.append((row, metadata))
+    return jobs
+
+
+def validate_campaign(jobs):
+    """Split campaign jobs into the valid ones and a ``CampaignResult`` per row with invalid metadata."""
+    invalid = validate_batch([metadata for _, metadata in jobs])
+    if not invalid:
+        return jobs, []
+    errors = [
+        CampaignResult(row.row_number, row.phone_number, False, error=str(InvalidMetadataError(invalid[index])))
+        for index, (row, _) in enumerate(jobs) if index in invalid
+    ]
+    return [job for index, job in enumerate(jobs) if index not in invalid], errors
+
+
+def run_campaign(redis_client, jobs, max_workers=8, on_progress=None, dispatch=initiate_call_with_retry):
+    """Dispatch campaign calls through a bounded worker pool.
+
+    ``on_progress(done, total, result)`` runs in the calling thread after every finished
+    row, so it is safe to update Streamlit widgets from it. Results come back in row order.
+    """
+    results = []
+    total = len(jobs)
+    if not total:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as pool:
+        futures = {
+            pool.submit(dispatch, redis_client, row.phone_number, metadata): row
+            for row, metadata in jobs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = futures[future]
+            try:
+                success, stdout, error = future.result()
+                result = CampaignResult(row.row_number, row.phone_number, success, stdout, error)
+            except Exception as e:
+                result = CampaignResult(row.row_number, row.phone_number, False, error=str(e))
+            results.append(result)
+            if on_progress is not None:
+                on_progress(done, total, result)
+
+    results.sort(key=lambda r: r.row_number)
+    return results
+
+
+def campaign_throughput(calls, elapsed):
+    """Calls per second achieved by a finished campaign."""
+    return len(calls) / elapsed if elapsed > 0 else 0.0
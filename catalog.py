@@ -0,0 +1,170 @@
+"""Lookup tables compiled once per process from ``config.CONFIG`` and ``costs_per_min``.
+
+Streamlit re-executes ``app.py`` on every widget interaction, but imported modules are
+cached in ``sys.modules``, so everything here is built a single time and shared by all
+sessions. The tables are read-only (tuples and ``MappingProxyType``).
+"""
+import re
+from types import MappingProxyType
+
+from config import CONFIG, costs_per_min
+
+COMPONENTS = ("STT", "LLM", "TTS")
+
+# Language mapping
+LANGUAGE_MAPPING = MappingProxyType({
+    'hi-IN': 'Hindi', 'en-IN': 'English', 'gu-IN': 'Gujarati',
+    'bn-IN': 'Bengali', 'kn-IN': 'Kannada', 'ml-IN': 'Malayalam', 'mr-IN': 'Marathi',
+    'od-IN': 'Odia', 'pa-IN': 'Punjabi', 'ta-IN': 'Tamil', 'te-IN': 'Telugu'
+})
+
+# TTS providers whose voice names carry the language, e.g. "azure:hi-IN-AaravNeural"
+LANGUAGE_TAGGED_VOICE_PROVIDERS = ("azure", "elevenlabs", "cartesia")
+
+
+def _options_key(component):
+    return "voice" if component == "TTS" else "model"
+
+
+def _freeze(mapping):
+    return MappingProxyType({k: _freeze(v) if isinstance(v, dict) else v for k, v in mapping.items()})
+
+
+def _build_provider_model_mapping():
+    mapping = {}
+    for component in COMPONENTS:
+        options = CONFIG[component][_options_key(component)]["enum"]
+        mapping[component] = {
+            provider: tuple(option for option in options if option.startswith(f"{provider}:"))
+            for provider in CONFIG[component]["provider"]["enum"]
+        }
+    return _freeze(mapping)
+
+
+# Provider-dependent model mappings
+PROVIDER_MODEL_MAPPING = _build_provider_model_mapping()
+
+
+def _languages(component):
+    languages = set()
+    for provider in CONFIG[component]["provider"]["enum"]:
+        languages.update(CONFIG[component]["language"][provider])
+    return tuple(sorted(languages))
+
+
+# Languages offered in the STT/TTS language selectboxes
+LANGUAGES = MappingProxyType({component: _languages(component) for component in ("STT", "TTS")})
+
+
+def _models_for(component, language, provider):
+    all_options = PROVIDER_MODEL_MAPPING[component].get(provider, ())
+    if component == "TTS" and provider in LANGUAGE_TAGGED_VOICE_PROVIDERS:
+        short = language.split("-")[0]
+        pattern = re.compile(rf"^{provider}:{short}(-|_)")
+        return tuple(v for v in all_options if pattern.search(v))
+    return all_options
+
+
+def _build_models_index():
+    index = {}
+    for component, languages in LANGUAGES.items():
+        for language in set(languages) | set(LANGUAGE_MAPPING):
+            for provider in CONFIG[component]["provider"]["enum"]:
+                index[(component, language, provider)] = _models_for(component, language, provider)
+    return MappingProxyType(index)
+
+
+def _build_providers_index():
+    index = {}
+    for component, languages in LANGUAGES.items():
+        for language in languages:
+            index[(component, language)] = tuple(
+                provider for provider in CONFIG[component]["provider"]["enum"]
+                if language in CONFIG[component]["language"][provider]
+            )
+    return MappingProxyType(index)
+
+
+_MODELS_INDEX = _build_models_index()
+_PROVIDERS_INDEX = _build_providers_index()
+
+
+def get_models_for_language_provider(component: str, language: str, provider: str) -> tuple:
+    """Get models/voices that support a given language and provider."""
+    models = _MODELS_INDEX.get((component, language, provider))
+    if models is None:
+        return _models_for(component, language, provider)
+    return models
+
+
+def get_providers_for_language(component: str, language: str) -> tuple:
+    """Get providers that support a given language for a component."""
+    return _PROVIDERS_INDEX.get((component, language), ())
+
+
+# Helper function to beautify names
+def beautify_name(name):
+    if not name or ":" not in name:
+        return name
+    provider, model = name.split(":", 1)
+    return f"{model} ({provider.upper() + '(Experimental)' if provider == 'iitm' else provider.capitalize()})"
+
+
+def cost_per_min(component, name):
+    """Per-minute cost of an STT/LLM model or TTS voice, or ``None`` when unknown."""
+    if component == "TTS":
+        # TTS is priced per provider, which is the voice prefix
+        name = name.split(":", 1)[0] if name else name
+    return costs_per_min[component].get(name, None)
+
+
+def _label(component, name):
+    cost = cost_per_min(component, name)
+    return f"{beautify_name(name)} - [{'$'+str(cost)+'/min' if cost is not None else 'Cost N/A'}]"
+
+
+# Badge-like labels with cost, as shown in the model/voice selectboxes
+_LABELS = MappingProxyType({
+    (component, name): _label(component, name)
+    for component in COMPONENTS
+    for name in CONFIG[component][_options_key(component)]["enum"]
+})
+
+
+def format_option(component, name):
+    label = _LABELS.get((component, name))
+    return label if label is not None else _label(component, name)
+
+
+def _build_defaults():
+    # STT defaults
+    default_stt_lang = LANGUAGES["STT"][0] if LANGUAGES["STT"] else ""
+    # Get first provider that supports the default language
+    stt_providers = get_providers_for_language("STT", default_stt_lang)
+    default_stt_provider = stt_providers[0] if stt_providers else CONFIG["STT"]["provider"]["enum"][0]
+    # Get first model for the default provider
+    stt_models = PROVIDER_MODEL_MAPPING["STT"][default_stt_provider]
+    default_stt_model = stt_models[0] if stt_models else ""
+
+    # TTS defaults
+    default_tts_lang = LANGUAGES["TTS"][0] if LANGUAGES["TTS"] else ""
+    tts_providers = get_providers_for_language("TTS", default_tts_lang)
+    default_tts_provider = tts_providers[0] if tts_providers else CONFIG["TTS"]["provider"]["enum"][0]
+    # Get first voice for the default provider and language
+    tts_voices = get_models_for_language_provider("TTS", default_tts_lang, default_tts_provider)
+    default_tts_voice = tts_voices[0] if tts_voices else ""
+
+    return MappingProxyType({
+        "stt_language_select": default_stt_lang,
+        "stt_provider": default_stt_provider,
+        "stt_provider_select": default_stt_provider,
+        "stt_model_select": default_stt_model,
+        "tts_language_select": default_tts_lang,
+        "tts_provider": default_tts_provider,
+        "tts_provider_select": default_tts_provider,
+        "tts_voice_select": default_tts_voice,
+    })
+
+
+# Initial STT/TTS selections for a new session
+DEFAULT_VALUES = _build_defaults()
@@ -137,7 +137,7 @@ CONFIG = {
                 "azure:or-IN-SukantNeural",
                 
                 "azure:pa-IN-OjasNeural",
-                "azure:pa-IN-VaaniNeural"
+                "azure:pa-IN-VaaniNeural",
 
                 "sarvam:Diya",
                 "sarvam:Maya",
@@ -0,0 +1,72 @@
+import os
+import uuid
+
+import pytest
+import redis
+
+import idempotency
+import metadata_store
+import rate_limit
+import resilience
+
+# Keys shared by every call (dedup claims, call indexes, call limits) go under this prefix
+# during the run, so cleaning them up never touches those of anyone else using the server
+RUN_PREFIX = f"test-run-{uuid.uuid4().hex[:8]}:"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def run_key_prefixes():
+    with pytest.MonkeyPatch.context() as patch:
+        for module, name in ((idempotency, "CLAIM_PREFIX"), (metadata_store, "INDEX_PREFIX"),
+                             (rate_limit, "LIMIT_PREFIX")):
+            patch.setattr(module, name, f"{RUN_PREFIX}{getattr(module, name)}")
+        yield RUN_PREFIX
+
+
+@pytest.fixture
+def redis_client():
+    """Client for a disposable local redis-server; tests using it are skipped when none is running."""
+    client = redis.Redis(
+        host=os.getenv("REDIS_TEST_HOST", "localhost"),
+        port=int(os.getenv("REDIS_TEST_PORT", 6379)),
+        decode_responses=True,
+    )
+    try:
+        client.ping()
+    except redis.ConnectionError:
+        pytest.skip("no local redis-server available")
+    yield client
+    # Claims left behind would turn the same call in a later test into a duplicate, index
+    # entries would outlive the test keys they point to, and call slots would add up
+    for key in client.scan_iter(f"{RUN_PREFIX}*"):
+        client.delete(key)
+    client.close()
+
+
+@pytest.fixture
+def key_prefix(redis_client):
+    """Unique key prefix for one test; every key under it is deleted afterwards."""
+    prefix = f"test-{uuid.uuid4().hex[:8]}"
+    yield prefix
+    for key in redis_client.scan_iter(f"{prefix}*"):
+        redis_client.delete(key)
+
+
+@pytest.fixture
+def call_metadata():
+    """Call metadata that passes ``metadata_schema`` validation."""
+    return {
+        "phone_number": "+911234567890",
+        "first_message": "Hello",
+        "STT_provider": "sarvam", "STT_model": "saarika:v2", "STT_language": "hi-IN",
+        "LLM_provider": "openai", "LLM_model": "gpt-4o-mini", "LLM_temperature": 0.5,
+        "TTS_provider": "azure", "TTS_voice": "hi-IN-AaravNeural", "TTS_language": "hi-IN",
+    }
+
+
+@pytest.fixture(autouse=True)
+def fresh_circuit_breakers():
+    """Circuit breakers are process-wide; start every test with all of them closed."""
+    resilience._breakers.clear()
+    yield
+    resilience._breakers.clear()
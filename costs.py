@@ -0,0 +1,133 @@
+"""Vectorized cost engine over every STT x LLM x TTS combination in ``config``.
+
+Per-minute prices and language support are loaded once into NumPy arrays, so pricing the
+whole configuration space for a language is a single broadcast sum. TTS is priced per
+provider, so the TTS axis is the provider (with the voices it offers for the language)
+rather than each individual voice.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from catalog import cost_per_min, get_models_for_language_provider
+from config import CONFIG
+
+
+@dataclass(frozen=True)
+class Configuration:
+    stt_model: str
+    llm_model: str
+    tts_provider: str
+    tts_voices: tuple
+    cost_per_min: float
+
+
+def _provider(name):
+    return name.split(":", 1)[0]
+
+
+class _Axis:
+    """Option names, their providers and per-minute costs (NaN when unpriced) for one component."""
+
+    def __init__(self, component, names, providers):
+        self.names = tuple(names)
+        self.providers = np.array(providers, dtype=object)
+        costs = [cost_per_min(component, name) for name in self.names]
+        self.costs = np.array([np.nan if c is None else c for c in costs], dtype=float)
+
+
+def _model_axis(component):
+    names = CONFIG[component]["model"]["enum"]
+    return _Axis(component, names, [_provider(name) for name in names])
+
+
+class CostEngine:
+    def __init__(self):
+        self.stt = _model_axis("STT")
+        self.llm = _model_axis("LLM")
+        tts_providers = CONFIG["TTS"]["provider"]["enum"]
+        self.tts = _Axis("TTS", [f"{p}:" for p in tts_providers], tts_providers)
+        # Language support as boolean masks, built once per language
+        self._stt_masks = {}
+        self._tts_voices = {}
+
+    def _stt_mask(self, language):
+        mask = self._stt_masks.get(language)
+        if mask is None:
+            supported = {p for p in CONFIG["STT"]["provider"]["enum"] if language in CONFIG["STT"]["language"][p]}
+            mask = np.array([p in supported for p in self.stt.providers], dtype=bool)
+            self._stt_masks[language] = mask
+        return mask
+
+    def _voices(self, language):
+        voices = self._tts_voices.get(language)
+        if voices is None:
+            voices = tuple(
+                get_models_for_language_provider("TTS", language, p)
+                if language in CONFIG["TTS"]["language"][p] else ()
+                for p in self.tts.providers
+            )
+            self._tts_voices[language] = voices
+        return voices
+
+    def price_matrix(self, stt_language, tts_language=None, stt_provider=None, llm_provider=None,
+                     tts_provider=None):
+        """Total per-minute cost of every combination, shaped (STT, LLM, TTS); NaN where invalid."""
+        tts_language = tts_language or stt_language
+        stt = np.where(self._stt_mask(stt_language), self.stt.costs, np.nan)
+        llm = self.llm.costs.copy()
+        tts = np.where([bool(v) for v in self._voices(tts_language)], self.tts.costs, np.nan)
+        for axis, costs, provider in ((self.stt, stt, stt_provider), (self.llm, llm, llm_provider),
+                                      (self.tts, tts, tts_provider)):
+            if provider is not None:
+                costs[axis.providers != provider] = np.nan
+        return stt[:, None, None] + llm[None, :, None] + tts[None, None, :]
+
+    def cheapest(self, stt_language, tts_language=None, n=10, max_cost=None, **providers):
+        """The ``n`` cheapest valid configurations, optionally restricted by provider and price ceiling."""
+        if n <= 0:
+            return []
+        totals = self.price_matrix(stt_language, tts_language, **providers).ravel()
+        valid = np.flatnonzero(~np.isnan(totals) if max_cost is None else totals <= max_cost)
+        if valid.size > n:
+            valid = valid[np.argpartition(totals[valid], n - 1)[:n]]
+        valid = valid[np.argsort(totals[valid], kind="stable")]
+        voices = self._voices(tts_language or stt_language)
+        shape = (len(self.stt.names), len(self.llm.names), len(self.tts.providers))
+        return [
+            Configuration(self.stt.names[i], self.llm.names[j], self.tts.providers[k], voices[k], float(totals[flat]))
+            for flat, (i, j, k) in zip(valid, zip(*np.unravel_index(valid, shape)))
+        ]
+
+
+def project_campaign_cost(cost_per_min, calls, median_minutes=2.0, sigma=0.6, durations=None,
+                          round_up=False, simulations=2000, percentiles=(50, 90, 99), seed=None,
+                          chunk_calls=1000):
+    """Monte Carlo projection of a campaign's total cost for one or more per-minute prices.
+
+    Call durations are lognormal around ``median_minutes``, or resampled from observed
+    ``durations`` (minutes) when given. ``round_up`` bills every started minute. Returns a
+    dict with the mean and requested percentiles, each an array aligned with ``cost_per_min``.
+    """
+    rng = np.random.default_rng(seed)
+    prices = np.atleast_1d(np.asarray(cost_per_min, dtype=float))
+    minutes = np.zeros(simulations)
+    # Sum durations in blocks of calls so memory stays bounded for large campaigns
+    for start in range(0, calls, chunk_calls):
+        size = (simulations, min(chunk_calls, calls - start))
+        if durations is not None:
+            block = rng.choice(np.asarray(durations, dtype=float), size=size)
+        else:
+            block = rng.lognormal(np.log(median_minutes), sigma, size=size)
+        if round_up:
+            block = np.ceil(block)
+        minutes += block.sum(axis=1)
+    totals = prices[:, None] * minutes[None, :]
+    projection = {"mean": totals.mean(axis=1)}
+    for p, values in zip(percentiles, np.percentile(totals, percentiles, axis=1)):
+        projection[f"p{p}"] = values
+    return projection
+
+
+# Shared by every session; everything in it is derived from the static config
+ENGINE = CostEngine()
@@ -0,0 +1,203 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import shutil
+import subprocess
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+AGENT_NAME = os.getenv("LIVEKIT_AGENT_NAME", "teliphonic-rag-agent-test")
+# Seconds an ``lk dispatch create`` may run before it is killed and the attempt counted as failed
+CLI_TIMEOUT = float(os.getenv("DISPATCH_CLI_TIMEOUT", 30))
+CREATE_DISPATCH_PATH = "/twirp/livekit.AgentDispatchService/CreateDispatch"
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def create_access_token(api_key, api_secret, room, ttl=600):
+    """Mint a LiveKit access token (HS256 JWT) with room admin rights for one room."""
+    now = int(time.time())
+    header = {"alg": "HS256", "typ": "JWT"}
+    claims = {
+        "iss": api_key,
+        "nbf": now - 10,
+        "exp": now + ttl,
+        "video": {"roomAdmin": True, "room": room},
+    }
+    signing_input = ".".join(
+        _b64url(json.dumps(part, separators=(",", ":")).encode()) for part in (header, claims)
+    )
+    signature = hmac.new(api_secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"{signing_input}.{_b64url(signature)}"
+
+
+def new_room_name():
+    """Room name for a fresh call, the equivalent of ``lk dispatch create --new-room``."""
+    return f"call-room-{secrets.token_hex(6)}"
+
+
+class HttpDispatchBackend:
+    """Creates agent dispatches through the LiveKit Twirp API over a pooled HTTP session."""
+
+    name = "http"
+
+    def __init__(self, url, api_key, api_secret, agent_name=AGENT_NAME, pool_size=16, timeout=10.0):
+        # The CLI accepts ws(s):// URLs; the API is served on the same host over http(s)
+        if url.startswith("wss://"):
+            url = "https://" + url[len("wss://"):]
+        elif url.startswith("ws://"):
+            url = "http://" + url[len("ws://"):]
+        self.url = url.rstrip("/")
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.agent_name = agent_name
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def create_dispatch(self, data_id):
+        room = new_room_name()
+        token = create_access_token(self.api_key, self.api_secret, room)
+        response = self.session.post(
+            self.url + CREATE_DISPATCH_PATH,
+            json={"agent_name": self.agent_name, "room": room, "metadata": data_id},
+            headers={"Authorization": f"Bearer {token}"},
+            timeout=self.timeout,
+        )
+        if response.status_code == 200:
+            return True, response.text, None
+        return False, None, f"HTTP {response.status_code}: {response.text}"
+
+    def close(self):
+        self.session.close()
+
+
+class CliDispatchBackend:
+    """Creates agent dispatches by running the ``lk`` CLI, one process per call."""
+
+    name = "cli"
+
+    def __init__(self, agent_name=AGENT_NAME, executable="lk", timeout=CLI_TIMEOUT):
+        self.agent_name = agent_name
+        self.executable = executable
+        self.timeout = timeout
+
+    def create_dispatch(self, data_id):
+        # Arguments are passed as a list, so metadata never goes through a shell
+        try:
+            process = subprocess.run(
+                [self.executable, "dispatch", "create", "--new-room",
+                 "--agent-name", self.agent_name, "--metadata", data_id],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=self.timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return False, None, f"lk dispatch create timed out after {self.timeout:g}s"
+        if process.returncode == 0:
+            return True, process.stdout.decode(), None
+        return False, None, process.stderr.decode()
+
+    def close(self):
+        pass
+
+
+def _never_sent(error):
+    """Whether ``error`` happened before the request reached the API, so it cannot have dispatched."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError):
+        reason = getattr(error.args[0], "reason", error.args[0]) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    # The CLI could not be started at all (not installed, not executable)
+    return isinstance(error, OSError) and not isinstance(error, requests.RequestException)
+
+
+class DispatchClient:
+    """Dispatch through the primary backend, falling back to the next one if it cannot be reached.
+
+    An HTTP error response from LiveKit is returned as-is. Only errors raised before the
+    request was sent (connection refused, connect timeouts) move on to the fallback
+    backend; after a read timeout or a reset connection LiveKit may already have created
+    the dispatch, so the attempt is reported failed and left to the retry policy and the
+    dispatch claim rather than dialed again through another backend.
+    """
+
+    def __init__(self, *backends):
+        if not backends:
+            raise ValueError("DispatchClient needs at least one backend")
+        self.backends = backends
+
+    @property
+    def backend_name(self):
+        return self.backends[0].name
+
+    def create_dispatch(self, data_id):
+        last_error = None
+        for backend in self.backends:
+            try:
+                return backend.create_dispatch(data_id)
+            except (requests.ConnectionError, requests.Timeout, OSError) as e:
+                last_error = f"{backend.name} dispatch failed: {e}"
+                if not _never_sent(e):
+                    break
+        return False, None, last_error
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def build_dispatch_client(backend=None):
+    """Build a dispatch client from the environment.
+
+    ``DISPATCH_BACKEND`` selects ``http``, ``cli`` or ``auto`` (default): HTTP when
+    LiveKit credentials are configured, with the ``lk`` CLI as fallback when installed.
+    """
+    backend = (backend or os.getenv("DISPATCH_BACKEND", "auto")).lower()
+    url = os.getenv("LIVEKIT_URL")
+    api_key = os.getenv("LIVEKIT_API_KEY")
+    api_secret = os.getenv("LIVEKIT_API_SECRET")
+    pool_size = int(os.getenv("DISPATCH_POOL_SIZE", 16))
+
+    cli = CliDispatchBackend()
+    if backend == "cli":
+        return DispatchClient(cli)
+
+    have_credentials = bool(url and api_key and api_secret)
+    if backend == "http":
+        if not have_credentials:
+            raise ValueError("LIVEKIT_URL, LIVEKIT_API_KEY and LIVEKIT_API_SECRET are required for HTTP dispatch")
+        return DispatchClient(HttpDispatchBackend(url, api_key, api_secret, pool_size=pool_size))
+
+    backends = []
+    if have_credentials:
+        backends.append(HttpDispatchBackend(url, api_key, api_secret, pool_size=pool_size))
+    if not backends or shutil.which(cli.executable):
+        backends.append(cli)
+    return DispatchClient(*backends)
+
+
+def get_dispatch_client():
+    """Process-wide dispatch client, so every call reuses the same HTTP connection pool."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = build_dispatch_client()
+    return _client
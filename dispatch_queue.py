@@ -0,0 +1,290 @@
+"""Durable dispatch queue on a Redis Stream, drained by a pool of dispatcher workers.
+
+    python dispatch_queue.py worker --concurrency 16
+    python dispatch_queue.py status
+
+With ``DISPATCH_QUEUE=true`` the app does not dispatch calls itself: "Initiate Call" and
+bulk campaigns append each call (phone number, metadata, campaign) to the
+``dispatch-queue`` stream and report it as ``queued``. Any number of worker processes read
+the stream as one consumer group, so each call goes to exactly one of them. A worker runs
+the usual setup (``initiate_call_with_retry``: metadata write, dispatch, retries), reports
+``dispatched`` or ``failed`` on the call-status stream, and only then acknowledges the
+entry. Throughput grows with the number of workers, and closing the browser tab no longer
+loses a call half-way through its retries.
+
+A call whose worker died stays pending in the group; after ``CLAIM_IDLE_MS`` another
+worker takes it over with ``XAUTOCLAIM``. As soon as a call is dispatched, and before its
+entry is acknowledged, the worker sets ``dispatched:<data_id>`` (kept for ``METADATA_TTL``);
+a worker finding that marker reports the call dispatched instead of setting it up, so a
+call the dead worker already dispatched is not dialed again. The dedup claim of
+``idempotency`` cannot do this on its own: a claim is only held while its owner keeps
+extending it, so the claim of a dead worker lapses after ``CLAIM_HOLD`` seconds, and a
+dispatched one after the dedup window, both shorter than ``CLAIM_IDLE_MS``.
+Entries delivered more than ``MAX_DELIVERIES`` times are reported failed and dropped.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+
+from call_status import STATUS_STREAM, add_status
+from calls import initiate_call_with_retry, new_data_id
+from metadata_store import METADATA_TTL
+from metrics import DISPATCH_QUEUE_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_STREAM = "dispatch-queue"
+DISPATCH_GROUP = "dispatchers"
+DISPATCH_QUEUE = os.getenv("DISPATCH_QUEUE", "false").lower() == "true"
+DISPATCHED_PREFIX = "dispatched:"
+# Longer than the slowest call setup including retries, so a call still being set up is not taken over
+CLAIM_IDLE_MS = int(os.getenv("DISPATCH_CLAIM_IDLE_MS", 120000))
+MAX_DELIVERIES = int(os.getenv("DISPATCH_MAX_DELIVERIES", 5))
+
+
+def dispatched_key(data_id):
+    return f"{DISPATCHED_PREFIX}{data_id}"
+
+
+def enqueue_calls(redis_client, calls, campaign=None, stream=DISPATCH_STREAM, status_stream=STATUS_STREAM,
+                  operator=None):
+    """Queue ``(phone_number, metadata)`` pairs in one round trip; returns their ``data_id``s.
+
+    ``operator`` is who placed the calls; their call limits apply when a worker dispatches them.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    data_ids = []
+    for phone_number, metadata in calls:
+        data_id = new_data_id(phone_number)
+        pipe.xadd(stream, {
+            "data_id": data_id,
+            "phone_number": phone_number,
+            "metadata": json.dumps(metadata),
+            "campaign": campaign or "",
+            "operator": operator or "",
+            "enqueued_at": f"{time.time():.6f}",
+        })
+        add_status(pipe, data_id, "queued", stream=status_stream)
+        data_ids.append(data_id)
+    pipe.execute()
+    return data_ids
+
+
+def enqueue_call(redis_client, phone_number, metadata, campaign=None, stream=DISPATCH_STREAM,
+                 status_stream=STATUS_STREAM, operator=None):
+    return enqueue_calls(redis_client, [(phone_number, metadata)], campaign, stream, status_stream, operator)[0]
+
+
+class Dispatcher:
+    """One consumer of the dispatch queue, setting up at most ``concurrency`` calls at a time."""
+
+    def __init__(self, redis_client, consumer=None, concurrency=8, stream=DISPATCH_STREAM, group=DISPATCH_GROUP,
+                 block_ms=5000, claim_idle_ms=CLAIM_IDLE_MS, max_deliveries=MAX_DELIVERIES,
+                 dispatch=initiate_call_with_retry, status_stream=STATUS_STREAM):
+        self.redis = redis_client
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.concurrency = concurrency
+        self.stream = stream
+        self.group = group
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max_deliveries
+        self.dispatch = dispatch
+        self.status_stream = status_stream
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dispatcher")
+        self._stop = threading.Event()
+        self._last_reclaim = 0.0
+
+    def ensure_group(self):
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        return self
+
+    def run(self):
+        """Handle queued calls until ``stop()``; Redis outages are waited out."""
+        self.ensure_group()
+        failures = 0
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.poll()
+                    failures = 0
+                except redis.RedisError:
+                    failures += 1
+                    logger.warning("Dispatcher lost Redis; retrying", exc_info=failures == 1)
+                    self._stop.wait(min(30.0, 2.0 ** failures))
+        finally:
+            # Calls already read are set up and acknowledged before the worker exits
+            self._pool.shutdown(wait=True)
+
+    def stop(self):
+        """Stop reading; ``run()`` returns once the calls in progress are handled."""
+        self._stop.set()
+
+    def poll(self):
+        """Hand new (and abandoned) entries to the pool, as many as there are free slots."""
+        slots = self._acquire_slots()
+        try:
+            entries = []
+            if time.monotonic() - self._last_reclaim >= self.claim_idle_ms / 2000:
+                self._last_reclaim = time.monotonic()
+                entries = self._reclaim(slots)
+            if not entries:
+                response = self.redis.xreadgroup(self.group, self.consumer, {self.stream: ">"}, count=slots,
+                                                 block=self.block_ms)
+                entries = [entry for _, stream_entries in response or () for entry in stream_entries]
+        except BaseException:
+            self._release_slots(slots)
+            raise
+        self._release_slots(slots - len(entries))
+        for entry_id, fields in entries:
+            self._pool.submit(self._handle, entry_id, fields)
+        return len(entries)
+
+    def _acquire_slots(self):
+        # Wait for one free slot, then take whatever else is free right now
+        self._slots.acquire()
+        slots = 1
+        while slots < self.concurrency and self._slots.acquire(blocking=False):
+            slots += 1
+        return slots
+
+    def _release_slots(self, count):
+        for _ in range(count):
+            self._slots.release()
+
+    def _reclaim(self, count):
+        """Take over entries another consumer left pending for longer than ``claim_idle_ms``."""
+        _, claimed, *_ = self.redis.xautoclaim(self.stream, self.group, self.consumer, self.claim_idle_ms,
+                                               start_id="0-0", count=count)
+        entries = []
+        for entry_id, fields in claimed:
+            if not fields:
+                # Deleted from the stream while pending (Redis 7 drops these from the group itself)
+                if entry_id is not None:
+                    self.redis.xack(self.stream, self.group, entry_id)
+                continue
+            pending = self.redis.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+            deliveries = pending[0]["times_delivered"] if pending else 1
+            if deliveries > self.max_deliveries:
+                logger.error("Dropping queued call %s after %d deliveries", fields.get("data_id"), deliveries)
+                self._finish(entry_id, fields["data_id"], "failed", f"Gave up after {deliveries} deliveries")
+                continue
+            entries.append((entry_id, fields))
+        return entries
+
+    def _handle(self, entry_id, fields):
+        try:
+            DISPATCH_QUEUE_WAIT_SECONDS.observe(max(0.0, time.time() - float(fields["enqueued_at"])))
+            data_id = fields["data_id"]
+            dispatched_as = self.redis.get(dispatched_key(data_id))
+            if dispatched_as is not None:
+                # Dispatched by a worker that died before acknowledging the entry
+                self._finish(entry_id, data_id, "dispatched", self._detail(data_id, dispatched_as))
+                return
+            dispatched = []
+
+            def on_dispatched(as_data_id):
+                dispatched.append(as_data_id)
+                self._mark_dispatched(data_id, as_data_id)
+
+            success, _, error = self.dispatch(
+                self.redis, fields["phone_number"], json.loads(fields["metadata"]),
+                on_dispatched=on_dispatched, campaign=fields.get("campaign") or None, data_id=data_id,
+                operator=fields.get("operator") or None,
+            )
+            if success:
+                self._finish(entry_id, data_id, "dispatched", self._detail(data_id, (dispatched or [data_id])[0]))
+            else:
+                self._finish(entry_id, data_id, "failed", error)
+        except Exception:
+            # Left pending: another worker (or this one) reclaims it after claim_idle_ms
+            logger.exception("Could not handle queued call %s", fields.get("data_id"))
+        finally:
+            self._slots.release()
+
+    def _mark_dispatched(self, data_id, as_data_id):
+        try:
+            self.redis.set(dispatched_key(data_id), as_data_id, ex=METADATA_TTL)
+        except redis.RedisError:
+            # The entry is acknowledged right after this unless the worker dies in between
+            logger.warning("Could not mark queued call %s as dispatched", data_id, exc_info=True)
+
+    @staticmethod
+    def _detail(data_id, dispatched_as):
+        return "" if dispatched_as == data_id else f"Already dispatched as {dispatched_as}"
+
+    def _finish(self, entry_id, data_id, status, detail):
+        pipe = self.redis.pipeline(transaction=True)
+        add_status(pipe, data_id, status, detail, self.status_stream)
+        pipe.xack(self.stream, self.group, entry_id)
+        pipe.xdel(self.stream, entry_id)
+        pipe.execute()
+
+
+def queue_status(redis_client, stream=DISPATCH_STREAM, group=DISPATCH_GROUP):
+    """Backlog of the queue: entries not yet read, pending per consumer and consumers."""
+    try:
+        groups = {g["name"]: g for g in redis_client.xinfo_groups(stream)}
+    except redis.ResponseError:
+        return {"length": 0, "pending": 0, "consumers": {}}
+    info = groups.get(group)
+    consumers = redis_client.xinfo_consumers(stream, group) if info else []
+    return {
+        "length": redis_client.xlen(stream),
+        "pending": info["pending"] if info else 0,
+        "consumers": {c["name"]: {"pending": c["pending"], "idle_ms": c["idle"]} for c in consumers},
+    }
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from resources import get_redis_client, start_metrics
+
+    parser = argparse.ArgumentParser(description="Run a dispatcher worker or inspect the dispatch queue")
+    commands = parser.add_subparsers(dest="command", required=True)
+    worker = commands.add_parser("worker", help="Dispatch queued calls until interrupted")
+    worker.add_argument("--concurrency", type=int, default=int(os.getenv("DISPATCH_CONCURRENCY", 8)),
+                        help="Calls this worker sets up at the same time")
+    worker.add_argument("--consumer", help="Consumer name (default: host-pid)")
+    worker.add_argument("--no-scheduler", action="store_true",
+                        help="Do not also move due scheduled calls to the queue (``scheduler``)")
+    commands.add_parser("status", help="Print the queue backlog as JSON")
+    args = parser.parse_args()
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.command == "status":
+        print(json.dumps(queue_status(get_redis_client()), indent=2))
+        return
+    start_metrics()
+    dispatcher = Dispatcher(get_redis_client(), args.consumer, args.concurrency)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: dispatcher.stop())
+    poller = None
+    if not args.no_scheduler:
+        from scheduler import SchedulePoller
+
+        poller = SchedulePoller(get_redis_client()).start()
+    logger.info("Dispatcher %s handling up to %d calls at a time", dispatcher.consumer, args.concurrency)
+    dispatcher.run()
+    if poller is not None:
+        poller.stop()
+    logger.info("Dispatcher %s stopped", dispatcher.consumer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Local stand-in for the LiveKit agent-dispatch API, for offline tests and benchmarks.
+
+Run it standalone and point the app at it:
+
+    python dispatch_stub.py --port 7880 --latency-ms 20
+    LIVEKIT_URL=http://127.0.0.1:7880 LIVEKIT_API_KEY=devkey LIVEKIT_API_SECRET=secret streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dispatch_client import CREATE_DISPATCH_PATH
+
+
+class _DispatchHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a pooled client really does reuse its connections
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this Nagle adds ~40 ms per reply
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        if self.path != CREATE_DISPATCH_PATH:
+            self._reply(404, {"code": "bad_route", "msg": f"no handler for {self.path}"})
+            return
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._reply(401, {"code": "unauthenticated", "msg": "missing bearer token"})
+            return
+
+        if server.latency:
+            time.sleep(server.latency)
+        if server.failure_rate and random.random() < server.failure_rate:
+            self._reply(503, {"code": "unavailable", "msg": "injected failure"})
+            return
+
+        request = json.loads(body or b"{}")
+        dispatch = {
+            "id": f"AD_{uuid.uuid4().hex[:12]}",
+            "agent_name": request.get("agent_name", ""),
+            "room": request.get("room", ""),
+            "metadata": request.get("metadata", ""),
+        }
+        with server.lock:
+            server.dispatches.append(dispatch)
+            server.connections.add(self.client_address)
+        self._reply(200, dispatch)
+
+
+class DispatchStubServer(ThreadingHTTPServer):
+    """Threaded HTTP server recording every dispatch it accepts."""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0):
+        super().__init__((host, port), _DispatchHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.lock = threading.Lock()
+        self.dispatches = []
+        # Distinct client (host, port) pairs seen, i.e. how many TCP connections were opened
+        self.connections = set()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7880)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every dispatch")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of dispatches answered with 503")
+    args = parser.parse_args()
+
+    server = DispatchStubServer(args.host, args.port, args.latency_ms / 1000, args.failure_rate)
+    print(f"Dispatch stub listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
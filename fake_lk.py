@@ -0,0 +1,103 @@
+"""Stand-in for the LiveKit ``lk`` CLI, for offline tests and benchmarks of CLI dispatch.
+
+Only ``lk dispatch create`` is implemented. Like the agent would, it can check that the
+call metadata is in Redis, so a dispatch only succeeds when the metadata was stored first:
+
+    FAKE_LK_LATENCY_MS=50 FAKE_LK_FAILURE_RATE=0.02 FAKE_LK_REDIS_URL=redis://localhost:6379 \\
+        python fake_lk.py dispatch create --new-room --agent-name agent --metadata call-1
+
+``install_fake_lk`` writes an executable ``lk`` that runs this module, to pass to
+``CliDispatchBackend(executable=...)`` or put on ``PATH``.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import stat
+import sys
+import time
+import uuid
+from urllib.parse import urlparse
+
+
+def install_fake_lk(directory, latency_ms=0.0, failure_rate=0.0, redis_url=None):
+    """Write an ``lk`` executable into ``directory`` with the given behaviour baked in."""
+    env = {"FAKE_LK_LATENCY_MS": str(latency_ms), "FAKE_LK_FAILURE_RATE": str(failure_rate)}
+    if redis_url:
+        env["FAKE_LK_REDIS_URL"] = redis_url
+    path = os.path.join(directory, "lk")
+    with open(path, "w") as f:
+        f.write(f"#!{sys.executable}\n"
+                "import os, sys\n"
+                f"sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})\n"
+                f"for key, value in {env!r}.items():\n"
+                "    os.environ.setdefault(key, value)\n"
+                "from fake_lk import main\n"
+                "sys.exit(main())\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+def _command(*args):
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def _key_exists(redis_url, key):
+    """EXISTS over a raw socket: redis-py alone takes longer to import than a real ``lk`` run."""
+    url = urlparse(redis_url)
+    commands = []
+    if url.password:
+        commands.append(_command("AUTH", *([url.username] if url.username else []), url.password))
+    if url.path.strip("/"):
+        commands.append(_command("SELECT", url.path.strip("/")))
+    commands.append(_command("EXISTS", key))
+    with socket.create_connection((url.hostname or "localhost", url.port or 6379), timeout=5) as sock:
+        sock.sendall(b"".join(commands))
+        replies = sock.makefile("rb")
+        for _ in commands:
+            reply = replies.readline()
+            if reply.startswith(b"-"):
+                raise RuntimeError(reply[1:].decode().strip())
+    return reply.strip() == b":1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="lk")
+    commands = parser.add_subparsers(dest="command", required=True)
+    dispatch = commands.add_parser("dispatch").add_subparsers(dest="action", required=True)
+    create = dispatch.add_parser("create")
+    create.add_argument("--new-room", action="store_true")
+    create.add_argument("--room")
+    create.add_argument("--agent-name", required=True)
+    create.add_argument("--metadata", default="")
+    args = parser.parse_args(argv)
+
+    latency = float(os.getenv("FAKE_LK_LATENCY_MS", 0)) / 1000
+    if latency:
+        time.sleep(latency)
+    if random.random() < float(os.getenv("FAKE_LK_FAILURE_RATE", 0)):
+        print("twirp error unavailable: injected failure", file=sys.stderr)
+        return 1
+
+    redis_url = os.getenv("FAKE_LK_REDIS_URL")
+    if redis_url and not _key_exists(redis_url, args.metadata):
+        print(f"no metadata stored for {args.metadata}", file=sys.stderr)
+        return 1
+
+    dispatch = {
+        "id": f"AD_{uuid.uuid4().hex[:12]}",
+        "agent_name": args.agent_name,
+        "room": args.room or f"call-room-{uuid.uuid4().hex[:12]}",
+        "metadata": args.metadata,
+    }
+    print(f"Dispatch created: {json.dumps(dispatch)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Idempotent call dispatch: one dispatch per phone number and configuration within a window.
+
+A call's fingerprint is the SHA-1 of its phone number and metadata. Before dispatching,
+the caller claims ``dispatch-claim:<fingerprint>`` with ``SET NX EX <window>``, storing
+the ``data_id`` it will use for every retry. A double click, a browser resubmit or a second
+session with the same request finds the claim and gets the existing dispatch back instead
+of dialing again. A claim whose dispatch failed is released, so the call can be retried
+straight away.
+
+While the call is being set up its claim is pending and lasts ``CLAIM_HOLD`` seconds; the
+owner extends it before every dispatch attempt, so waiting for a call slot or retrying
+cannot let it expire under a call that is still being dialed. If it did expire and another
+request took it over, the extension fails and the owner gives up instead of dialing too.
+Once dispatched, the claim lasts the dedup window.
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+# Seconds during which an identical request is treated as a duplicate
+DEDUP_WINDOW = int(os.getenv("DISPATCH_DEDUP_WINDOW", 30))
+# Seconds a pending claim lasts from each extension; longer than one attempt (metadata write, dispatch, CLI fallback)
+CLAIM_HOLD = int(os.getenv("DISPATCH_CLAIM_HOLD", 60))
+
+CLAIM_PREFIX = "dispatch-claim:"
+PENDING = "pending"
+DISPATCHED = "dispatched"
+
+# Only the owner of a claim (the request holding its data_id) may update or release it
+_MARK_DISPATCHED_SCRIPT = """
+local claim = redis.call('GET', KEYS[1])
+if not claim or cjson.decode(claim)['data_id'] ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# A claim that expired unclaimed is taken back; one taken over by another request is lost
+_EXTEND_SCRIPT = """
+local claim = redis.call('GET', KEYS[1])
+if not claim then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+if cjson.decode(claim)['data_id'] ~= ARGV[1] then
+    return 0
+end
+return redis.call('EXPIRE', KEYS[1], ARGV[3])
+"""
+
+_RELEASE_SCRIPT = """
+local claim = redis.call('GET', KEYS[1])
+if not claim or cjson.decode(claim)['data_id'] ~= ARGV[1] then
+    return 0
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+
+def call_fingerprint(phone_number, metadata):
+    """Stable digest of who is called with which configuration, independent of key order."""
+    payload = json.dumps({"phone_number": phone_number, "metadata": metadata}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def claim_key(fingerprint):
+    return f"{CLAIM_PREFIX}{fingerprint}"
+
+
+class DispatchClaims:
+    """Claims on call fingerprints, held in Redis for ``hold`` seconds while pending and ``window`` once dispatched."""
+
+    def __init__(self, redis_client, window=DEDUP_WINDOW, hold=CLAIM_HOLD):
+        self.redis = redis_client
+        self.window = window
+        self.hold = hold
+        self._mark_dispatched = redis_client.register_script(_MARK_DISPATCHED_SCRIPT)
+        self._extend = redis_client.register_script(_EXTEND_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+
+    def claim(self, fingerprint, data_id):
+        """Claim ``fingerprint`` for ``data_id``; returns ``None`` if claimed, else the existing claim."""
+        value = json.dumps({"data_id": data_id, "status": PENDING})
+        key = claim_key(fingerprint)
+        while True:
+            if self.redis.set(key, value, nx=True, ex=self.hold):
+                return None
+            existing = self.redis.get(key)
+            # The other claim may expire between SET and GET; then try to take it again
+            if existing is not None:
+                return json.loads(existing)
+
+    def mark_dispatched(self, fingerprint, data_id, output):
+        claim = json.dumps({"data_id": data_id, "status": DISPATCHED, "output": output})
+        return bool(self._mark_dispatched(keys=[claim_key(fingerprint)], args=[data_id, claim, self.window]))
+
+    def extend(self, fingerprint, data_id):
+        """Hold the pending claim of ``data_id`` for another ``hold`` seconds; ``False`` if it was taken over."""
+        value = json.dumps({"data_id": data_id, "status": PENDING})
+        return bool(self._extend(keys=[claim_key(fingerprint)], args=[data_id, value, self.hold]))
+
+    def release(self, fingerprint, data_id):
+        return bool(self._release(keys=[claim_key(fingerprint)], args=[data_id]))
+
+
+@lru_cache(maxsize=None)
+def get_dispatch_claims(redis_client):
+    """One ``DispatchClaims`` per Redis client, so the scripts are registered only once."""
+    return DispatchClaims(redis_client)
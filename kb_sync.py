@@ -0,0 +1,278 @@
+"""Incremental knowledge-base sync: upload only new or changed documents, delete removed ones.
+
+    python kb_sync.py ./policies            # directory
+    python kb_sync.py policies.zip --dry-run
+
+Each source root (the folder or archive name) has its own manifest of what it put in the
+assistant, kept in Redis as a hash ``kb-manifest:<assistant>:<root>`` mapping each
+document's path relative to the root to its SHA-256 and the assistant file id. Syncing one
+folder therefore never deletes the documents of another. Files whose hash matches the
+manifest, and whose file id still exists in ``assistant.list_files()``, are skipped;
+entries whose file is already gone from the assistant are dropped from the manifest.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+from dataclasses import dataclass, field
+
+from knowledge_base import CHUNK_SIZE, UploadJob, UploadPipeline
+
+SUPPORTED_EXTENSIONS = (".txt", ".pdf", ".docx", ".md")
+
+
+def manifest_key(assistant_name, root=""):
+    return f"kb-manifest:{assistant_name}:{root}" if root else f"kb-manifest:{assistant_name}"
+
+
+def source_root(source):
+    """Name of a directory or archive as a manifest root, e.g. ``policies`` for ``policies.zip``."""
+    name = os.path.basename(os.path.normpath(source))
+    for extension in (".tar.gz", ".tgz", ".tar", ".zip"):
+        if name.lower().endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+
+def upload_entries(uploaded_files):
+    """``(root, [(relative_path, file), ...])`` for a folder picked in the page's uploader.
+
+    Uploaded names are paths inside the picked folder, starting with the folder's name.
+    """
+    paths = [f.name.replace("\\", "/").lstrip("/") for f in uploaded_files]
+    roots = {path.split("/", 1)[0] for path in paths if "/" in path}
+    if len(roots) == 1 and all("/" in path for path in paths):
+        root = roots.pop()
+        return root, [(path.split("/", 1)[1], f) for path, f in zip(paths, uploaded_files)]
+    return "", list(zip(paths, uploaded_files))
+
+
+def file_sha256(source, chunk_size=CHUNK_SIZE):
+    """SHA-256 of a path or binary stream, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def iter_directory(root):
+    """Yield ``(relative_path, path)`` for every supported document under ``root``."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(SUPPORTED_EXTENSIONS):
+                path = os.path.join(dirpath, filename)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), path
+
+
+def extract_archive(archive, destination):
+    """Extract a .zip or .tar(.gz) archive, refusing members that would escape ``destination``."""
+    destination = os.path.realpath(destination)
+
+    def _check(name):
+        target = os.path.realpath(os.path.join(destination, name))
+        if os.path.commonpath([destination, target]) != destination:
+            raise ValueError(f"Unsafe path in archive: {name}")
+
+    if zipfile.is_zipfile(archive):
+        with zipfile.ZipFile(archive) as zf:
+            for name in zf.namelist():
+                _check(name)
+            zf.extractall(destination)
+    elif tarfile.is_tarfile(archive):
+        with tarfile.open(archive) as tf:
+            members = [m for m in tf.getmembers() if m.isfile() or m.isdir()]
+            for member in members:
+                _check(member.name)
+            tf.extractall(destination, members=members)
+    else:
+        raise ValueError(f"Unsupported archive: {archive}")
+    return destination
+
+
+def load_manifest(redis_client, assistant_name, root=""):
+    return {path: json.loads(entry)
+            for path, entry in redis_client.hgetall(manifest_key(assistant_name, root)).items()}
+
+
+@dataclass
+class SyncPlan:
+    # (relative_path, source, sha256) for new or changed documents
+    upload: list = field(default_factory=list)
+    unchanged: list = field(default_factory=list)
+    # (relative_path, file_id) for documents no longer in the source
+    delete: list = field(default_factory=list)
+    # relative paths of manifest entries whose file is no longer in the assistant
+    forget: list = field(default_factory=list)
+    # relative_path -> file id of the previous version, removed once the new one is available
+    replaces: dict = field(default_factory=dict)
+
+
+def plan_sync(entries, manifest, live_file_ids, delete_missing=True):
+    """Compare source documents against the manifest and the assistant's current files.
+
+    ``entries`` yields ``(relative_path, source)`` where source is a path or stream.
+    """
+    plan = SyncPlan()
+    seen = set()
+    for rel_path, source in entries:
+        seen.add(rel_path)
+        sha = file_sha256(source)
+        entry = manifest.get(rel_path)
+        if entry and entry["sha256"] == sha and entry["file_id"] in live_file_ids:
+            plan.unchanged.append(rel_path)
+            continue
+        plan.upload.append((rel_path, source, sha))
+        if entry and entry["file_id"] in live_file_ids:
+            plan.replaces[rel_path] = entry["file_id"]
+
+    for rel_path, entry in manifest.items():
+        if rel_path in seen:
+            continue
+        if entry["file_id"] not in live_file_ids:
+            plan.forget.append(rel_path)
+        elif delete_missing:
+            plan.delete.append((rel_path, entry["file_id"]))
+    return plan
+
+
+class KnowledgeBaseSync:
+    """Runs a ``SyncPlan``: uploads through ``UploadPipeline`` and keeps the manifest current.
+
+    The manifest entry for a document is only written once its upload is "Available", so
+    an interrupted sync simply picks up the remaining files next time.
+    """
+
+    def __init__(self, assistant, redis_client, plan, assistant_name, on_file=None, on_delete=None, root="",
+                 **pipeline_kwargs):
+        self.assistant = assistant
+        self.redis = redis_client
+        self.plan = plan
+        self.key = manifest_key(assistant_name, root)
+        self.on_delete = on_delete
+        self.deleted = []
+        self.errors = []
+        jobs = [
+            UploadJob(
+                name=os.path.basename(rel_path),
+                path=source if isinstance(source, (str, os.PathLike)) else None,
+                stream=None if isinstance(source, (str, os.PathLike)) else source,
+                metadata={"source_path": rel_path, "sha256": sha},
+            )
+            for rel_path, source, sha in plan.upload
+        ]
+        self.pipeline = UploadPipeline(assistant, jobs, on_file=on_file, on_done=self._record, **pipeline_kwargs)
+        self._deleter = None
+
+    @property
+    def done(self):
+        return self.pipeline.done and (self._deleter is None or not self._deleter.is_alive())
+
+    def start(self):
+        self.pipeline.start()
+        self._deleter = threading.Thread(target=self._delete_missing, daemon=True)
+        self._deleter.start()
+        return self
+
+    def wait(self, poll_interval=0.2):
+        while not self.done:
+            threading.Event().wait(poll_interval)
+        return self
+
+    def _delete(self, rel_path, file_id):
+        try:
+            self.assistant.delete_file(file_id)
+            self.deleted.append(rel_path)
+        except Exception as e:
+            if getattr(e, "status", None) != 404:
+                self.errors.append(f"{rel_path}: {e}")
+                return False
+            # Already deleted elsewhere: nothing left to remove but the manifest entry
+        if self.on_delete is not None:
+            self.on_delete(file_id)
+        return True
+
+    def _delete_missing(self):
+        if self.plan.forget:
+            self.redis.hdel(self.key, *self.plan.forget)
+        for rel_path, file_id in self.plan.delete:
+            if self._delete(rel_path, file_id):
+                self.redis.hdel(self.key, rel_path)
+
+    def _record(self, job):
+        if job.status != "available":
+            self.errors.append(f"{job.metadata['source_path']}: {job.error}")
+            return
+        rel_path = job.metadata["source_path"]
+        self.redis.hset(self.key, rel_path, json.dumps({"sha256": job.metadata["sha256"], "file_id": job.file_id}))
+        previous = self.plan.replaces.get(rel_path)
+        if previous and previous != job.file_id:
+            self._delete(rel_path, previous)
+
+
+def start_sync(assistant, redis_client, entries, assistant_name, root="", delete_missing=True, **kwargs):
+    """Plan a sync of ``entries`` against the manifest of ``root`` and start it in the background."""
+    live_file_ids = {f.id for f in assistant.list_files()}
+    manifest = load_manifest(redis_client, assistant_name, root)
+    plan = plan_sync(entries, manifest, live_file_ids, delete_missing=delete_missing)
+    return KnowledgeBaseSync(assistant, redis_client, plan, assistant_name, root=root, **kwargs).start()
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from resources import ASSISTANT_NAME, get_assistant, get_redis_client
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="Directory or .zip/.tar.gz archive of documents")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    parser.add_argument("--keep-missing", action="store_true", help="Do not delete files missing from the source")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    load_dotenv()
+
+    assistant, redis_client = get_assistant(), get_redis_client()
+    workdir = None
+    name = source_root(args.source)
+    root = args.source
+    if not os.path.isdir(root):
+        workdir = tempfile.mkdtemp(prefix="kb-sync-")
+        root = extract_archive(args.source, workdir)
+    try:
+        entries = list(iter_directory(root))
+        if args.dry_run:
+            plan = plan_sync(entries, load_manifest(redis_client, ASSISTANT_NAME, name),
+                             {f.id for f in assistant.list_files()}, delete_missing=not args.keep_missing)
+            print(f"{len(plan.upload)} to upload, {len(plan.unchanged)} unchanged, {len(plan.delete)} to delete")
+            for rel_path, _, _ in plan.upload:
+                print(f"  upload  {rel_path}")
+            for rel_path, _ in plan.delete:
+                print(f"  delete  {rel_path}")
+            return
+
+        sync = start_sync(assistant, redis_client, entries, ASSISTANT_NAME, root=name,
+                          delete_missing=not args.keep_missing, max_workers=args.workers).wait()
+        uploaded = sum(1 for job in sync.pipeline.jobs if job.status == "available")
+        print(f"{uploaded} uploaded, {len(sync.plan.unchanged)} unchanged, {len(sync.deleted)} deleted, "
+              f"{len(sync.errors)} failed")
+        for error in sync.errors:
+            print(f"  failed  {error}")
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+# File statuses reported by the Pinecone assistant that will not change on their own
+SETTLED_STATUSES = ("Available", "ProcessingFailed")
+
+# Copy granularity when an upload has to be spooled to disk; bounds the extra memory per file
+CHUNK_SIZE = 1024 * 1024
+
+# Version of the assistant data-plane API the uploads are sent to (same as the SDK plugin's)
+ASSISTANT_API_VERSION = os.getenv("PINECONE_ASSISTANT_API_VERSION", "2025-10")
+
+
+def is_pending(file):
+    return getattr(file, "status", None) not in SETTLED_STATUSES
+
+
+class FileListCache:
+    """Shared, TTL-bounded cache of ``assistant.list_files()``.
+
+    One instance serves every session. Uploads and deletes patch the cached list in
+    place, and while any file is still being processed a background thread re-lists
+    until everything has settled, so reruns never wait on the Pinecone API for that.
+    """
+
+    def __init__(self, assistant, ttl=60.0, pending_refresh_interval=5.0, clock=time.monotonic):
+        self.assistant = assistant
+        self.ttl = ttl
+        self.pending_refresh_interval = pending_refresh_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._files = None
+        self._fetched_at = 0.0
+        self._refresher = None
+
+    def get(self):
+        """Cached file list, re-listing only when it is missing or older than ``ttl``."""
+        with self._lock:
+            if self._files is not None and self._clock() - self._fetched_at < self.ttl:
+                return list(self._files)
+        # Only one session fetches at a time; the others pick up its result
+        with self._fetch_lock:
+            with self._lock:
+                if self._files is not None and self._clock() - self._fetched_at < self.ttl:
+                    return list(self._files)
+            return self.refresh()
+
+    def refresh(self):
+        files = list(self.assistant.list_files())
+        with self._lock:
+            self._files = files
+            self._fetched_at = self._clock()
+        self._watch_pending(files)
+        return list(files)
+
+    def invalidate(self):
+        with self._lock:
+            self._files = None
+
+    def add(self, file):
+        """Record a successful upload without re-listing."""
+        with self._lock:
+            if self._files is None:
+                return
+            self._files = [f for f in self._files if f.id != file.id] + [file]
+            files = list(self._files)
+        self._watch_pending(files)
+
+    def remove(self, file_id):
+        """Record a successful delete without re-listing."""
+        with self._lock:
+            if self._files is not None:
+                self._files = [f for f in self._files if f.id != file_id]
+
+    def _watch_pending(self, files):
+        if not any(is_pending(f) for f in files):
+            return
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_pending, daemon=True)
+            self._refresher.start()
+
+    def _refresh_pending(self):
+        while True:
+            time.sleep(self.pending_refresh_interval)
+            try:
+                files = list(self.assistant.list_files())
+            except Exception:
+                continue
+            with self._lock:
+                self._files = files
+                self._fetched_at = self._clock()
+                if not any(is_pending(f) for f in files):
+                    self._refresher = None
+                    return
+
+
+class MultipartBody:
+    """A ``multipart/form-data`` body with one file part, read from ``stream`` block by block.
+
+    Has a known length, so it is sent with a ``Content-Length`` and never held in memory.
+    """
+
+    def __init__(self, stream, file_name, field="file"):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        head = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                f'filename="{file_name.replace(chr(34), "%22")}"\r\n'
+                f"Content-Type: application/octet-stream\r\n\r\n").encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+        stream.seek(0, io.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        self.len = len(head) + size + len(tail)
+        self._parts = [io.BytesIO(head), stream, io.BytesIO(tail)]
+
+    def read(self, size=CHUNK_SIZE):
+        if size is None or size < 0:
+            size = CHUNK_SIZE
+        while self._parts:
+            chunk = self._parts[0].read(size)
+            if chunk:
+                return chunk
+            self._parts.pop(0)
+        return b""
+
+    def __iter__(self):
+        return iter(lambda: self.read(CHUNK_SIZE), b"")
+
+
+class StreamingAssistant:
+    """The SDK's assistant, with uploads streamed to the files endpoint.
+
+    The SDK builds its multipart request with ``file.read()``, so every upload used to sit
+    in memory whole. Here the body is read from the file or buffer in blocks while it is
+    sent. Everything else is passed through to ``assistant``.
+    """
+
+    def __init__(self, assistant, api_key, api_version=ASSISTANT_API_VERSION, timeout=300.0):
+        import requests
+
+        self.assistant = assistant
+        self.api_key = api_key
+        self.api_version = api_version
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __getattr__(self, attr):
+        return getattr(self.assistant, attr)
+
+    def upload_file(self, file_path, metadata=None, timeout=None, **kwargs):
+        with open(file_path, "rb") as f:
+            return self.upload_bytes_stream(f, os.path.basename(file_path), metadata=metadata, timeout=timeout,
+                                            **kwargs)
+
+    def upload_bytes_stream(self, stream, file_name, metadata=None, timeout=None, multimodal=None):
+        """Upload ``stream`` as ``file_name``; returns the file as the API reports it, still processing.
+
+        Processing is not waited for (the SDK's ``timeout=-1``); ``UploadPipeline`` polls it.
+        """
+        body = MultipartBody(stream, file_name)
+        params = {}
+        if metadata:
+            params["metadata"] = json.dumps(metadata)
+        if multimodal is not None:
+            params["multimodal"] = str(multimodal).lower()
+        response = self.session.post(
+            f"{self.assistant.host.rstrip('/')}/files/{self.assistant.name}",
+            params=params,
+            data=body,
+            headers={"Api-Key": self.api_key, "X-Pinecone-Api-Version": self.api_version,
+                     "Content-Type": body.content_type, "Content-Length": str(body.len)},
+            timeout=self.timeout,
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+        return SimpleNamespace(**response.json())
+
+
+@dataclass
+class UploadJob:
+    name: str
+    # Either a path on disk or an open binary stream (e.g. a Streamlit UploadedFile)
+    path: str = None
+    stream: object = None
+    # Optional metadata stored with the file in the assistant
+    metadata: dict = None
+    # queued -> uploading -> processing -> available | failed
+    status: str = "queued"
+    attempts: int = 0
+    file_id: str = None
+    error: str = None
+
+    @property
+    def finished(self):
+        return self.status in ("available", "failed")
+
+
+def jobs_from_uploads(uploaded_files):
+    """One job per Streamlit ``UploadedFile``, uploaded straight from the uploader's buffer."""
+    return [UploadJob(name=os.path.basename(f.name), stream=f) for f in uploaded_files]
+
+
+def spool_to_file(stream, path, chunk_size=CHUNK_SIZE):
+    """Copy ``stream`` to ``path`` in fixed-size chunks, never holding the whole file."""
+    stream.seek(0)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(stream, f, chunk_size)
+
+
+class UploadPipeline:
+    """Uploads many files to the assistant with bounded concurrency, off the script thread.
+
+    Every file is uploaded with up to ``max_retries`` attempts, then its processing status
+    is polled until it is "Available" or has failed. Jobs are plain objects updated in
+    place, so the UI can render progress from them on each rerun. ``on_file`` receives
+    every file model returned by the API, e.g. to patch ``FileListCache``, and ``on_done``
+    every job once it reached its final state.
+    """
+
+    def __init__(self, assistant, jobs, max_workers=4, max_retries=3, retry_backoff=2.0,
+                 poll_interval=2.0, poll_timeout=900.0, on_file=None, on_done=None):
+        self.assistant = assistant
+        self.jobs = jobs
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+        self.on_file = on_file
+        self.on_done = on_done
+        self._remaining = len(jobs)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @property
+    def done(self):
+        """True once every worker has finished and released its upload buffer."""
+        with self._lock:
+            return self._remaining == 0
+
+    @property
+    def progress(self):
+        """Fraction of files that reached a final state."""
+        if not self.jobs:
+            return 1.0
+        return sum(1 for job in self.jobs if job.finished) / len(self.jobs)
+
+    def start(self):
+        if not self.jobs:
+            return self
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="kb-upload")
+        for job in self.jobs:
+            self._executor.submit(self._run, job)
+        # Workers finish on their own; the executor just stops accepting new work
+        self._executor.shutdown(wait=False)
+        return self
+
+    def _notify(self, file):
+        if self.on_file is not None:
+            self.on_file(file)
+
+    def _run(self, job):
+        try:
+            file = self._upload(job)
+            if file is not None:
+                self._wait_until_processed(job, file)
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+        finally:
+            # Let go of the uploader's buffer as soon as this file is done
+            job.stream = None
+            if self.on_done is not None:
+                try:
+                    self.on_done(job)
+                except Exception as e:
+                    job.status, job.error = "failed", str(e)
+            with self._lock:
+                self._remaining -= 1
+
+    def _upload(self, job):
+        while True:
+            job.attempts += 1
+            job.status = "uploading"
+            try:
+                # timeout=-1 returns right after the upload; processing is polled below
+                if job.stream is not None:
+                    file = self._upload_stream(job)
+                else:
+                    file = self.assistant.upload_file(file_path=job.path, timeout=-1, **self._extra(job))
+                job.file_id = file.id
+                self._notify(file)
+                return file
+            except Exception as e:
+                if job.attempts >= self.max_retries:
+                    job.status, job.error = "failed", str(e)
+                    return None
+                time.sleep(self.retry_backoff * 2 ** (job.attempts - 1))
+
+    @staticmethod
+    def _extra(job):
+        return {"metadata": job.metadata} if job.metadata is not None else {}
+
+    def _upload_stream(self, job):
+        job.stream.seek(0)
+        upload_bytes_stream = getattr(self.assistant, "upload_bytes_stream", None)
+        if upload_bytes_stream is not None:
+            return upload_bytes_stream(job.stream, file_name=job.name, timeout=-1, **self._extra(job))
+        # SDKs without stream uploads only take a path: spool to disk in fixed-size chunks
+        with tempfile.TemporaryDirectory(prefix="kb-upload-") as tmpdir:
+            path = os.path.join(tmpdir, job.name)
+            spool_to_file(job.stream, path)
+            return self.assistant.upload_file(file_path=path, timeout=-1, **self._extra(job))
+
+    def _wait_until_processed(self, job, file):
+        job.status = "processing"
+        deadline = time.monotonic() + self.poll_timeout
+        while is_pending(file):
+            if time.monotonic() > deadline:
+                job.status, job.error = "failed", "Timed out waiting for processing"
+                return
+            time.sleep(self.poll_interval)
+            try:
+                file = self.assistant.describe_file(file_id=job.file_id)
+            except Exception:
+                continue
+        self._notify(file)
+        if file.status == "Available":
+            job.status = "available"
+        else:
+            job.status, job.error = "failed", f"Processing ended with status {file.status}"
+
+
+def start_upload_pipeline(assistant, uploaded_files, **kwargs):
+    """Start uploading Streamlit ``UploadedFile`` objects in the background."""
+    return UploadPipeline(assistant, jobs_from_uploads(uploaded_files), **kwargs).start()
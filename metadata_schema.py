@@ -0,0 +1,218 @@
+"""Validation of call metadata against ``config.CONFIG``, compiled once per process.
+
+``CONFIG`` describes each component's fields like a JSON schema (``type``, ``enum``,
+``minimum``, ``maximum``; ``language`` lists the languages of each provider). Call metadata
+carries them flattened as ``<component>_<field>`` (``STT_model``), with the ``provider:``
+prefix dropped from model and voice names, next to the call fields in ``CALL_SCHEMA``.
+
+At import every field is turned into a closure over frozensets and bounds, so checking a
+payload is a handful of set lookups: a bad provider/model/language combination is refused
+before the call is dispatched, not found by the agent after the dial. Checks are:
+
+* ``required``: a ``required`` field (and every provider) is missing or empty; other
+  fields are only checked when they have a value.
+* ``type``: wrong JSON type (``bool`` is not a number).
+* ``enum``: not one of the allowed values, e.g. a model of another provider.
+* ``range``: a number outside ``minimum``/``maximum``.
+* ``pattern``: a string not matching ``pattern``.
+
+Fields not in the schema (``variables``, ``preset``) are not checked.
+
+``metadata_from_settings`` builds the metadata from the page's selections with the same
+``metadata_name`` the checks are compiled with, so both sides agree on every option.
+"""
+import re
+from dataclasses import dataclass
+
+from catalog import COMPONENTS, LANGUAGE_TAGGED_VOICE_PROVIDERS, cost_per_min
+from config import CONFIG
+
+# Metadata fields that are not agent components; same keywords as ``CONFIG``
+CALL_SCHEMA = {
+    "phone_number": {"type": "string", "pattern": r"^\+91\d{10}$"},
+    "first_message": {"type": "string", "required": True},
+    "STT_cost_per_min": {"type": "number", "minimum": 0},
+    "LLM_cost_per_min": {"type": "number", "minimum": 0},
+    "TTS_cost_per_min": {"type": "number", "minimum": 0},
+    "total_cost_per_min": {"type": "number", "minimum": 0},
+    "use_retrieval": {"type": "boolean"},
+    "auto_end_call": {"type": "boolean"},
+    "background_sound": {"type": "boolean"},
+    "vad_min_silence": {"type": "number", "minimum": 0},
+    "is_allow_interruptions": {"type": "boolean"},
+}
+
+_TYPES = {"string": str, "number": (int, float), "integer": int, "boolean": bool}
+
+
+@dataclass(frozen=True)
+class FieldError:
+    field: str
+    code: str
+    message: str
+
+
+class InvalidMetadataError(ValueError):
+    """Call metadata that does not match the schema; ``errors`` holds a ``FieldError`` per problem."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("Invalid call metadata: " + "; ".join(f"{e.field} {e.message}" for e in errors))
+
+
+def metadata_name(option):
+    """Model or voice name as sent in the metadata: the ``CONFIG`` option without its provider."""
+    return option.split(":", 1)[-1]
+
+
+def metadata_from_settings(settings, phone_number):
+    """Call metadata for the page's selections (``st.session_state`` or any mapping of its keys)."""
+    stt_model, llm_model = settings["stt_model_select"], settings["llm_model_select"]
+    tts_voice = settings["tts_voice_select"]
+    costs = [cost_per_min("STT", stt_model), cost_per_min("LLM", llm_model), cost_per_min("TTS", tts_voice)]
+    total = sum(costs) if all(c is not None for c in costs) else None
+    return {
+        'phone_number': phone_number,
+        'first_message': settings.get('first_message'),
+        'STT_provider': settings["stt_provider"],
+        'STT_model': metadata_name(stt_model),
+        'STT_language': settings["stt_language_select"],
+        'STT_cost_per_min': costs[0],
+        'LLM_provider': settings["llm_provider"],
+        'LLM_model': metadata_name(llm_model),
+        'LLM_system_prompt': settings.get('llm_system_prompt', ''),
+        'LLM_temperature': settings.get('llm_temperature', 0.5),
+        'LLM_cost_per_min': costs[1],
+        'TTS_provider': settings["tts_provider"],
+        'TTS_voice': metadata_name(tts_voice),
+        'TTS_language': settings["tts_language_select"],
+        'TTS_cost_per_min': costs[2],
+        'total_cost_per_min': total,
+        'use_retrieval': settings.get('use_retrieval', False),
+        'auto_end_call': settings.get('auto_end_call', False),
+        'background_sound': settings.get('background_sound', False),
+        'vad_min_silence': settings.get('vad_min_silence', 0.65),
+        'is_allow_interruptions': settings.get('is_allow_interruptions', False),
+    }
+
+
+def _field_check(name, spec):
+    """Closure appending the errors of one plain field to ``errors``."""
+    expected = _TYPES.get(spec.get("type"))
+    required = spec.get("required", False)
+    allowed = frozenset(spec["enum"]) if "enum" in spec else None
+    minimum, maximum = spec.get("minimum"), spec.get("maximum")
+    pattern = re.compile(spec["pattern"]) if "pattern" in spec else None
+    is_number = spec.get("type") in ("number", "integer")
+
+    def check(metadata, errors):
+        value = metadata.get(name)
+        if value is None or value == "":
+            if required:
+                errors.append(FieldError(name, "required", "is required"))
+            return
+        if expected is not None and (not isinstance(value, expected) or (is_number and isinstance(value, bool))):
+            errors.append(FieldError(name, "type", f"must be a {spec['type']}, not {type(value).__name__}"))
+            return
+        if allowed is not None and value not in allowed:
+            errors.append(FieldError(name, "enum", f"{value!r} is not allowed"))
+        elif minimum is not None and value < minimum:
+            errors.append(FieldError(name, "range", f"{value} is below the minimum {minimum}"))
+        elif maximum is not None and value > maximum:
+            errors.append(FieldError(name, "range", f"{value} is above the maximum {maximum}"))
+        elif pattern is not None and not pattern.match(value):
+            errors.append(FieldError(name, "pattern", f"{value!r} is not valid"))
+
+    return check
+
+
+def _component_check(component, spec):
+    """Closure checking a component's provider, then its model/voice and language for that provider."""
+    options_key = "voice" if component == "TTS" else "model"
+    provider_field, options_field = f"{component}_provider", f"{component}_{options_key}"
+    language_field = f"{component}_language" if "language" in spec else None
+    providers = frozenset(spec["provider"]["enum"])
+    options = {
+        provider: frozenset(metadata_name(option) for option in spec[options_key]["enum"]
+                            if option.startswith(f"{provider}:"))
+        for provider in providers
+    }
+    languages = {provider: frozenset(spec["language"][provider]) for provider in providers} if language_field else {}
+    # Voices of language-tagged providers must also speak the call's language, e.g. "hi-IN-AaravNeural"
+    tagged = {}
+    if component == "TTS":
+        for provider in providers.intersection(LANGUAGE_TAGGED_VOICE_PROVIDERS):
+            for language in languages[provider]:
+                short = language.split("-")[0]
+                tagged[(provider, language)] = frozenset(
+                    name for name in options[provider] if name.startswith((f"{short}-", f"{short}_")))
+
+    def check(metadata, errors):
+        provider = metadata.get(provider_field)
+        if not isinstance(provider, str) or provider not in providers:
+            if not provider:
+                errors.append(FieldError(provider_field, "required", "is required"))
+            else:
+                errors.append(FieldError(provider_field, "enum", f"{provider!r} is not a {component} provider"))
+            return
+        language = None
+        if language_field:
+            language = metadata.get(language_field)
+            if not isinstance(language, str) or language not in languages[provider]:
+                errors.append(FieldError(language_field, "enum", f"{language!r} is not supported by {provider}"))
+                language = None
+        allowed = options[provider]
+        if not allowed:
+            # CONFIG lists no models/voices for this provider; any name is passed through
+            return
+        name = metadata.get(options_field)
+        if not isinstance(name, str) or name not in allowed:
+            errors.append(FieldError(options_field, "enum", f"{name!r} is not a {options_key} of {provider}"))
+        elif (provider, language) in tagged and name not in tagged[(provider, language)]:
+            errors.append(FieldError(options_field, "enum", f"{name!r} does not speak {language}"))
+
+    return check
+
+
+def compile_checks(config=CONFIG, call_schema=CALL_SCHEMA):
+    """Every check of the metadata schema, in field order."""
+    checks = []
+    for component in COMPONENTS:
+        spec = config[component]
+        checks.append(_component_check(component, spec))
+        for name, field_spec in spec.items():
+            if name not in ("provider", "model", "voice", "language"):
+                checks.append(_field_check(f"{component}_{name}", field_spec))
+    checks.extend(_field_check(name, spec) for name, spec in call_schema.items())
+    return tuple(checks)
+
+
+_CHECKS = compile_checks()
+
+
+def validate_metadata(metadata, checks=_CHECKS):
+    """``FieldError``s of one payload; empty when it is valid."""
+    if not isinstance(metadata, dict):
+        return [FieldError("", "type", f"must be an object, not {type(metadata).__name__}")]
+    errors = []
+    for check in checks:
+        check(metadata, errors)
+    return errors
+
+
+def validate_batch(payloads, checks=_CHECKS):
+    """``{index: [FieldError, ...]}`` for every invalid payload of ``payloads``."""
+    invalid = {}
+    for index, metadata in enumerate(payloads):
+        errors = validate_metadata(metadata, checks)
+        if errors:
+            invalid[index] = errors
+    return invalid
+
+
+def ensure_valid(metadata):
+    """Raise ``InvalidMetadataError`` unless ``metadata`` is valid."""
+    errors = validate_metadata(metadata)
+    if errors:
+        raise InvalidMetadataError(errors)
+    return metadata
@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+
+import redis
+
+# Call metadata lives for 24 hours; the agent reads it when the dispatched job starts
+METADATA_TTL = 86400
+
+# Fields that differ from call to call; everything else in the metadata is the agent
+# configuration (prompt, first message, providers, models, costs, flags), which presets share
+CALL_FIELDS = ("phone_number", "variables")
+# Fields campaigns render per row from {placeholders} in the row variables (``campaign``).
+# A call with variables keeps them in its own record, so the rest of a templated campaign
+# still shares one preset.
+TEMPLATED_FIELDS = ("first_message", "LLM_system_prompt")
+PRESET_FIELD = "preset"
+PRESET_PREFIX = "preset:"
+
+# Secondary indexes kept next to the call records, so lookups never SCAN the keyspace:
+#   <prefix>by-time            sorted set of data_ids scored by write time
+#   <prefix>by-phone:<phone>   the same, per phone number
+#   <prefix>campaign:<name>    hash of data_id -> {"phone_number", "created_at"} for one campaign
+#   <prefix>campaigns          sorted set of campaign names scored by their latest call
+INDEX_PREFIX = "call-index:"
+
+# Appended to the write scripts. ``k`` and ``a`` are the number of keys and arguments before
+# the index ones: KEYS[k+1..k+4] are the four index keys above, ARGV[a+1..a+3] the write
+# time, phone number and campaign ('' when absent). Entries older than the TTL are trimmed
+# on every write, so the indexes only ever cover calls whose records may still exist.
+_INDEX_SCRIPT = """
+local ttl, ts = tonumber(ARGV[2]), ARGV[a + 1]
+local cutoff = tonumber(ts) - ttl
+redis.call('ZADD', KEYS[k + 1], ts, KEYS[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[k + 1], '-inf', cutoff)
+if ARGV[a + 2] ~= '' then
+    redis.call('ZADD', KEYS[k + 2], ts, KEYS[1])
+    redis.call('ZREMRANGEBYSCORE', KEYS[k + 2], '-inf', cutoff)
+    redis.call('EXPIRE', KEYS[k + 2], ttl)
+end
+if ARGV[a + 3] ~= '' then
+    redis.call('HSET', KEYS[k + 3], KEYS[1], cjson.encode({phone_number = ARGV[a + 2], created_at = ts}))
+    redis.call('EXPIRE', KEYS[k + 3], ttl)
+    redis.call('ZADD', KEYS[k + 4], ts, ARGV[a + 3])
+    redis.call('ZREMRANGEBYSCORE', KEYS[k + 4], '-inf', cutoff)
+end
+"""
+
+# Writes the payload and its digest in one atomic step and answers with the digest of what
+# Redis actually stored, so the caller can confirm the write without a separate GET.
+_WRITE_SCRIPT = """
+local k, a = 2, 2
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+local digest = redis.sha1hex(redis.call('GET', KEYS[1]))
+redis.call('SET', KEYS[2], digest, 'EX', ARGV[2])
+""" + _INDEX_SCRIPT + """
+return digest
+"""
+
+# Same as above, plus the shared preset under its content address. The preset body is only
+# sent when the client has not written it recently; otherwise its TTL is refreshed so it
+# outlives every call record referencing it, and a missing preset is reported back.
+_WRITE_WITH_PRESET_SCRIPT = """
+local k, a = 3, 3
+if ARGV[3] ~= '' then
+    if not redis.call('SET', KEYS[3], ARGV[3], 'EX', ARGV[2], 'NX') then
+        redis.call('EXPIRE', KEYS[3], ARGV[2])
+    end
+elseif redis.call('EXPIRE', KEYS[3], ARGV[2]) == 0 then
+    return 'NOPRESET'
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+local digest = redis.sha1hex(redis.call('GET', KEYS[1]))
+redis.call('SET', KEYS[2], digest, 'EX', ARGV[2])
+""" + _INDEX_SCRIPT + """
+return digest
+"""
+
+
+class MetadataWriteError(Exception):
+    """Raised when Redis does not confirm that the metadata was stored intact."""
+
+
+def serialize_metadata(metadata):
+    return json.dumps(metadata)
+
+
+def metadata_digest(payload):
+    """SHA-1 of the serialized payload, the same digest Redis computes with ``redis.sha1hex``."""
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def digest_key(data_id):
+    return f"{data_id}:sha1"
+
+
+def time_index_key(prefix=INDEX_PREFIX):
+    return f"{prefix}by-time"
+
+
+def phone_index_key(phone_number, prefix=INDEX_PREFIX):
+    return f"{prefix}by-phone:{phone_number}"
+
+
+def campaign_key(campaign, prefix=INDEX_PREFIX):
+    return f"{prefix}campaign:{campaign}"
+
+
+def campaigns_key(prefix=INDEX_PREFIX):
+    return f"{prefix}campaigns"
+
+
+def split_metadata(metadata):
+    """Split call metadata into the shared preset and the per-call fields.
+
+    Returns ``(preset_key, preset_payload, call_record)``; the call record carries the
+    preset key under ``"preset"`` in place of the shared fields.
+    """
+    call_fields = CALL_FIELDS + TEMPLATED_FIELDS if metadata.get("variables") else CALL_FIELDS
+    preset = {k: v for k, v in metadata.items() if k not in call_fields}
+    # Sorted keys, so the same configuration always hashes to the same address
+    preset_payload = json.dumps(preset, sort_keys=True)
+    preset_key = PRESET_PREFIX + metadata_digest(preset_payload)
+    call_record = {k: metadata[k] for k in call_fields if k in metadata}
+    call_record[PRESET_FIELD] = preset_key
+    return preset_key, preset_payload, call_record
+
+
+def resolve_metadata(redis_client, data_id):
+    """Load the full metadata for ``data_id``, expanding a preset reference if present.
+
+    This is what the agent should use to read its call configuration; records written
+    without presets are returned unchanged.
+    """
+    payload = redis_client.get(data_id)
+    if payload is None:
+        return None
+    record = json.loads(payload)
+    preset_key = record.pop(PRESET_FIELD, None)
+    if preset_key is None:
+        return record
+    preset = redis_client.get(preset_key)
+    if preset is None:
+        return None
+    return {**json.loads(preset), **record}
+
+
+class MetadataStore:
+    """Stores call metadata under its ``data_id`` in a single round trip.
+
+    The write goes through a Lua script (sent as EVALSHA once cached on the server); on
+    servers where scripting is disabled it falls back to a MULTI/EXEC pipeline that reads
+    the value back inside the same transaction.
+
+    With ``use_presets`` the agent configuration is stored once under a content-addressed
+    ``preset:<sha1>`` key and each call record only references it. Readers must then go
+    through ``resolve_metadata``; it defaults to the ``METADATA_PRESETS`` environment
+    variable so it can be enabled once the agent resolves presets.
+
+    Every write also updates the secondary indexes under ``index_prefix`` in the same
+    script, which ``call_index`` queries.
+    """
+
+    def __init__(self, redis_client, ttl=METADATA_TTL, use_presets=None, index_prefix=INDEX_PREFIX):
+        if use_presets is None:
+            use_presets = os.getenv("METADATA_PRESETS", "False").lower() == "true"
+        self.redis = redis_client
+        self.ttl = ttl
+        self.use_presets = use_presets
+        self.index_prefix = index_prefix
+        self._write_script = redis_client.register_script(_WRITE_SCRIPT)
+        self._write_with_preset_script = redis_client.register_script(_WRITE_WITH_PRESET_SCRIPT)
+        self._use_script = True
+        # Presets this process wrote recently: key -> time it was last sent in full
+        self._known_presets = {}
+        self._known_presets_lock = threading.Lock()
+
+    def write(self, data_id, metadata, campaign=None):
+        """Store ``metadata`` under ``data_id`` and return the confirmed digest.
+
+        The call is indexed by write time, by its ``phone_number`` and, if given, under ``campaign``.
+        """
+        if self.use_presets:
+            preset_key, preset_payload, record = split_metadata(metadata)
+            payload = serialize_metadata(record)
+        else:
+            preset_key = preset_payload = None
+            payload = serialize_metadata(metadata)
+
+        expected = metadata_digest(payload)
+        # (write time, phone number, campaign), the index arguments of the write scripts
+        index = (f"{time.time():.6f}", metadata.get("phone_number") or "", campaign or "")
+        stored = self._write(data_id, payload, expected, index, preset_key, preset_payload)
+        if isinstance(stored, bytes):
+            stored = stored.decode()
+        if stored != expected:
+            raise MetadataWriteError(f"Metadata digest mismatch for {data_id}")
+        return expected
+
+    def _preset_is_known(self, preset_key):
+        with self._known_presets_lock:
+            sent_at = self._known_presets.get(preset_key)
+        # Resend well before the server copy could have expired on its own
+        return sent_at is not None and time.monotonic() - sent_at < self.ttl / 2
+
+    def _remember_preset(self, preset_key):
+        with self._known_presets_lock:
+            self._known_presets[preset_key] = time.monotonic()
+
+    def _index_keys(self, index):
+        _, phone_number, campaign = index
+        return [
+            time_index_key(self.index_prefix),
+            phone_index_key(phone_number, self.index_prefix),
+            campaign_key(campaign, self.index_prefix),
+            campaigns_key(self.index_prefix),
+        ]
+
+    def _write(self, data_id, payload, expected, index, preset_key=None, preset_payload=None):
+        index_keys = self._index_keys(index)
+        if self._use_script:
+            try:
+                if preset_key is None:
+                    return self._write_script(keys=[data_id, digest_key(data_id)] + index_keys,
+                                              args=[payload, self.ttl, *index])
+                keys = [data_id, digest_key(data_id), preset_key] + index_keys
+                if self._preset_is_known(preset_key):
+                    stored = self._write_with_preset_script(keys=keys, args=[payload, self.ttl, "", *index])
+                    if stored not in ("NOPRESET", b"NOPRESET"):
+                        return stored
+                stored = self._write_with_preset_script(keys=keys, args=[payload, self.ttl, preset_payload, *index])
+                self._remember_preset(preset_key)
+                return stored
+            except redis.ResponseError as e:
+                if "unknown command" not in str(e).lower() and "not allowed" not in str(e).lower():
+                    raise
+                self._use_script = False
+
+        pipe = self.redis.pipeline(transaction=True)
+        if preset_key is not None:
+            pipe.set(preset_key, preset_payload, ex=self.ttl, nx=True)
+            pipe.expire(preset_key, self.ttl)
+        pipe.set(data_id, payload, ex=self.ttl)
+        pipe.set(digest_key(data_id), expected, ex=self.ttl)
+        self._index(pipe, data_id, index, index_keys)
+        pipe.get(data_id)
+        stored = pipe.execute()[-1]
+        if isinstance(stored, bytes):
+            stored = stored.decode()
+        return metadata_digest(stored) if stored is not None else None
+
+    def _index(self, pipe, data_id, index, index_keys):
+        """The index updates of ``_INDEX_SCRIPT``, queued on a transaction pipeline."""
+        created_at, phone_number, campaign = index
+        by_time, by_phone, campaign_calls, campaigns = index_keys
+        cutoff = float(created_at) - self.ttl
+        pipe.zadd(by_time, {data_id: created_at})
+        pipe.zremrangebyscore(by_time, "-inf", cutoff)
+        if phone_number:
+            pipe.zadd(by_phone, {data_id: created_at})
+            pipe.zremrangebyscore(by_phone, "-inf", cutoff)
+            pipe.expire(by_phone, self.ttl)
+        if campaign:
+            entry = json.dumps({"phone_number": phone_number, "created_at": created_at})
+            pipe.hset(campaign_calls, data_id, entry)
+            pipe.expire(campaign_calls, self.ttl)
+            pipe.zadd(campaigns, {campaign: created_at})
+            pipe.zremrangebyscore(campaigns, "-inf", cutoff)
+
+    def read(self, data_id):
+        """Load the metadata stored under ``data_id``, or ``None`` if it expired."""
+        return resolve_metadata(self.redis, data_id)
+
+    def discard(self, data_id, phone_number=None, campaign=None):
+        """Delete a call record that was never used, together with its index entries."""
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(data_id, digest_key(data_id))
+        pipe.zrem(time_index_key(self.index_prefix), data_id)
+        if phone_number:
+            pipe.zrem(phone_index_key(phone_number, self.index_prefix), data_id)
+        if campaign:
+            pipe.hdel(campaign_key(campaign, self.index_prefix), data_id)
+        pipe.execute()
+
+
+@lru_cache(maxsize=None)
+def get_metadata_store(redis_client):
+    """One ``MetadataStore`` per Redis client, so the script is registered only once."""
+    # INDEX_PREFIX is read here rather than bound as a default, so the tests can move it
+    return MetadataStore(redis_client, index_prefix=INDEX_PREFIX)
@@ -0,0 +1,263 @@
+"""Lightweight call-setup metrics in the Prometheus text format.
+
+Metrics live in process memory behind one lock per metric; recording a sample is a dict
+update, cheap enough to leave on in production. They are exposed two ways:
+
+* ``start_metrics_server(port)`` serves ``/metrics`` for this process (one scrape target
+  per replica).
+* ``RedisMetricsExporter`` periodically adds this process's increments to Redis hashes,
+  so ``/metrics?scope=cluster`` on any replica returns totals across all replicas, which
+  works even when replicas sit behind a load balancer and cannot be scraped one by one.
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Call setup normally takes tens of milliseconds; retries push it into seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REDIS_PREFIX = "metrics:"
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        # (suffix, labels) -> value; histogram buckets are stored per bucket, not cumulative
+        self._samples = {}
+
+    def _add(self, suffix, labels, amount):
+        key = (suffix, labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._samples)
+
+    def render(self, samples=None):
+        samples = self.samples() if samples is None else samples
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples(samples))
+        return lines
+
+    def _render_samples(self, samples):
+        for (suffix, labels), value in sorted(samples.items()):
+            yield f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        self._add("_total", _labels_key(labels), amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        labels = _labels_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        bound = self.buckets[index] if index < len(self.buckets) else float("inf")
+        with self._lock:
+            for key, amount in ((("_bucket", labels + (("le", bound),)), 1), (("_count", labels), 1),
+                                (("_sum", labels), value)):
+                self._samples[key] = self._samples.get(key, 0) + amount
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_samples(self, samples):
+        series = sorted({labels for (suffix, labels) in samples if suffix != "_bucket"})
+        for labels in series:
+            cumulative = 0
+            for bound in self.buckets + (float("inf"),):
+                cumulative += samples.get(("_bucket", labels + (("le", bound),)), 0)
+                bucket_labels = labels + (("le", _format_value(bound)),)
+                yield f"{self.name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(samples.get(('_sum', labels), 0))}"
+            yield f"{self.name}_count{_format_labels(labels)} {_format_value(samples.get(('_count', labels), 0))}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation):
+        return self.register(Counter(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, buckets))
+
+    def render(self, samples_by_metric=None):
+        lines = []
+        for metric in self.metrics:
+            samples = None if samples_by_metric is None else samples_by_metric.get(metric.name, {})
+            lines.extend(metric.render(samples))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CALL_SETUP_SECONDS = REGISTRY.histogram(
+    "call_setup_seconds", "Time from the first metadata write until the call is dispatched or given up, by outcome")
+CALL_SETUP_STAGE_SECONDS = REGISTRY.histogram(
+    "call_setup_stage_seconds", "Time spent per call-setup stage: metadata_write, dispatch, retry_sleep")
+CALL_SETUP_RETRIES = REGISTRY.counter(
+    "call_setup_retries", "Call-setup attempts that were retried, by reason")
+CALL_SETUP_FAILURES = REGISTRY.counter(
+    "call_setup_failures", "Calls that could not be set up after all retries, by reason")
+CALL_SETUP_DUPLICATES = REGISTRY.counter(
+    "call_setup_duplicates", "Repeated call requests answered from an existing claim, by claim status")
+DISPATCH_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "dispatch_queue_wait_seconds", "Time a queued call waited in the dispatch queue before a worker took it")
+SCHEDULE_LATENESS_SECONDS = REGISTRY.histogram(
+    "schedule_lateness_seconds", "Time from a scheduled call's due time until it was moved to the dispatch queue",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 30.0, 300.0))
+UI_RENDER_SECONDS = REGISTRY.histogram(
+    "ui_render_seconds", "Time to render one page panel, by panel; a widget change reruns only its own panel",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+
+def _encode_field(key):
+    suffix, labels = key
+    return json.dumps([suffix, [[k, "+Inf" if v == float("inf") else v] for k, v in labels]])
+
+
+def _decode_field(field):
+    suffix, labels = json.loads(field)
+    return suffix, tuple((k, float("inf") if v == "+Inf" else v) for k, v in labels)
+
+
+class RedisMetricsExporter:
+    """Adds this process's metric increments to shared Redis hashes every ``interval`` seconds."""
+
+    def __init__(self, redis_client, registry=REGISTRY, interval=10.0, prefix=REDIS_PREFIX):
+        self.redis = redis_client
+        self.registry = registry
+        self.interval = interval
+        self.prefix = prefix
+        self._flushed = {metric.name: {} for metric in registry.metrics}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush(self):
+        """Send everything recorded since the last flush in one pipelined round trip."""
+        pipe = self.redis.pipeline(transaction=False)
+        pending = {}
+        for metric in self.registry.metrics:
+            flushed = self._flushed.setdefault(metric.name, {})
+            current = metric.samples()
+            for key, value in current.items():
+                delta = value - flushed.get(key, 0)
+                if delta:
+                    pipe.hincrbyfloat(self.prefix + metric.name, _encode_field(key), delta)
+            pending[metric.name] = current
+        if len(pipe):
+            pipe.execute()
+        self._flushed.update(pending)
+
+    def collect(self):
+        """Cluster-wide samples per metric, as stored in Redis."""
+        pipe = self.redis.pipeline(transaction=False)
+        for metric in self.registry.metrics:
+            pipe.hgetall(self.prefix + metric.name)
+        return {
+            metric.name: {_decode_field(field): float(value) for field, value in stored.items()}
+            for metric, stored in zip(self.registry.metrics, pipe.execute())
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name="metrics-exporter")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.warning("Could not flush metrics to Redis", exc_info=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/metrics":
+            self.send_error(404)
+            return
+        exporter = self.server.exporter
+        if parse_qs(url.query).get("scope") == ["cluster"]:
+            if exporter is None:
+                self.send_error(404, "Cluster metrics need METRICS_REDIS=true")
+                return
+            body = self.server.registry.render(exporter.collect())
+        else:
+            body = self.server.registry.render()
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_metrics_server(port, host="0.0.0.0", registry=REGISTRY, exporter=None):
+    """Serve ``/metrics`` from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    server.exporter = exporter
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-server").start()
+    return server
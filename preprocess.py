@@ -0,0 +1,201 @@
+"""Local text extraction before knowledge-base upload.
+
+Documents are reduced to normalized plain text in a process pool: PDF pages via ``pypdf``
+(in requirements.txt; without it PDFs are uploaded unchanged, with a warning), DOCX
+paragraphs straight from the package XML, txt/md as-is. Headers, footers and page numbers
+repeated across pages are dropped, and documents longer than ``max_chars`` are split into
+numbered parts. The result is uploaded as .txt files instead of the original, usually far
+smaller, documents. A document whose text cannot be extracted is uploaded unchanged and
+reported by name.
+
+Workers are spawned rather than forked: the Streamlit server is multithreaded, and a
+forked child can inherit a lock some other thread held at the time.
+"""
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from xml.etree import ElementTree
+
+from knowledge_base import UploadJob, spool_to_file
+
+# Split documents above this many characters, on paragraph boundaries where possible
+MAX_CHARS = 200_000
+
+# A line is boilerplate when it appears on at least this share of a document's pages
+BOILERPLATE_PAGE_SHARE = 0.5
+
+logger = logging.getLogger(__name__)
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_PAGE_NUMBER = re.compile(r"^(page\s*)?\d+(\s*(of|/)\s*\d+)?$", re.IGNORECASE)
+_CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0e-\x1f\x7f]")
+_HYPHENATED_BREAK = re.compile(r"(\w)-\n(\w)")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+@dataclass
+class PreprocessResult:
+    name: str
+    original_bytes: int
+    # (file name, text) per part; empty when the document is uploaded unchanged
+    parts: list = field(default_factory=list)
+    error: str = None
+
+    @property
+    def text_bytes(self):
+        return sum(len(text.encode("utf-8")) for _, text in self.parts)
+
+
+def _pdf_pages(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.warning("pypdf is not installed; uploading %s without extracting its text",
+                       os.path.basename(path))
+        return None
+    return [page.extract_text() or "" for page in PdfReader(path).pages]
+
+
+def _docx_pages(path):
+    with zipfile.ZipFile(path) as zf:
+        root = ElementTree.fromstring(zf.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NS}p"):
+        paragraphs.append("".join(node.text or "" for node in paragraph.iter(f"{_WORD_NS}t")))
+    return ["\n".join(paragraphs)]
+
+
+def _text_pages(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        # Form feeds mark page breaks in text exported from PDFs
+        return f.read().split("\f")
+
+
+_EXTRACTORS = {".pdf": _pdf_pages, ".docx": _docx_pages, ".txt": _text_pages, ".md": _text_pages}
+
+
+def normalize_text(text):
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = _CONTROL_CHARS.sub("", text)
+    text = _HYPHENATED_BREAK.sub(r"\1\2", text)
+    text = "\n".join(_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def strip_boilerplate(pages):
+    """Drop page numbers, and lines repeated on most pages (running headers and footers)."""
+    pages = [normalize_text(page).split("\n") for page in pages]
+    repeated = set()
+    if len(pages) >= 3:
+        counts = Counter(line for page in pages for line in set(page) if line)
+        repeated = {line for line, n in counts.items() if n >= BOILERPLATE_PAGE_SHARE * len(pages)}
+    kept = ("\n".join(line for line in page if line not in repeated and not _PAGE_NUMBER.match(line))
+            for page in pages)
+    return normalize_text("\n\n".join(kept))
+
+
+def split_text(text, max_chars=MAX_CHARS):
+    """Split ``text`` into parts of at most ``max_chars``, preferring paragraph breaks."""
+    parts = []
+    while len(text) > max_chars:
+        cut = text.rfind("\n\n", 0, max_chars)
+        if cut <= 0:
+            cut = text.rfind("\n", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        parts.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        parts.append(text)
+    return parts
+
+
+def preprocess_document(name, path, max_chars=MAX_CHARS):
+    """Extract, clean and split one document. Runs in a worker process."""
+    result = PreprocessResult(name=name, original_bytes=os.path.getsize(path))
+    stem, ext = os.path.splitext(os.path.basename(name))
+    extractor = _EXTRACTORS.get(ext.lower())
+    if extractor is None:
+        return result
+    try:
+        pages = extractor(path)
+    except Exception as e:
+        logger.warning("Could not extract text from %s; uploading it unchanged: %s", name, e)
+        result.error = f"{name}: {e}"
+        return result
+    if pages is None:
+        return result
+    parts = split_text(strip_boilerplate(pages), max_chars)
+    if len(parts) == 1:
+        result.parts = [(f"{stem}.txt", parts[0])]
+    else:
+        result.parts = [(f"{stem}.part{i}.txt", part) for i, part in enumerate(parts, 1)]
+    return result
+
+
+def preprocess_documents(sources, max_workers=None, max_chars=MAX_CHARS):
+    """Preprocess ``(name, path)`` pairs in a process pool, keeping their order."""
+    sources = list(sources)
+    if max_workers == 1 or len(sources) <= 1:
+        return [preprocess_document(name, path, max_chars) for name, path in sources]
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(preprocess_document, *zip(*sources), [max_chars] * len(sources)))
+
+
+def preprocessed_jobs(results, sources, workdir):
+    """Upload jobs for ``results``: extracted text parts, or the original file when nothing was extracted."""
+    jobs = []
+    for result, (_, path) in zip(results, sources):
+        if not result.parts:
+            jobs.append(UploadJob(name=os.path.basename(result.name), path=path))
+            continue
+        for part_name, text in result.parts:
+            part_path = os.path.join(tempfile.mkdtemp(dir=workdir), part_name)
+            with open(part_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            jobs.append(UploadJob(name=part_name, path=part_path))
+    return jobs
+
+
+def preprocess_uploads(uploaded_files, workdir, max_workers=None, max_chars=MAX_CHARS):
+    """Spool Streamlit uploads into ``workdir`` and preprocess them; returns ``(results, jobs)``."""
+    sources = []
+    for f in uploaded_files:
+        path = os.path.join(tempfile.mkdtemp(dir=workdir), os.path.basename(f.name))
+        spool_to_file(f, path)
+        sources.append((f.name, path))
+    results = preprocess_documents(sources, max_workers=max_workers, max_chars=max_chars)
+    return results, preprocessed_jobs(results, sources, workdir)
+
+
+def cleanup_when_done(pipeline, workdir):
+    """Remove ``workdir`` once every job of ``pipeline`` has finished."""
+    if not pipeline.jobs:
+        shutil.rmtree(workdir, ignore_errors=True)
+        return pipeline
+    remaining = [len(pipeline.jobs)]
+    lock = threading.Lock()
+    previous = pipeline.on_done
+
+    def on_done(job):
+        try:
+            if previous is not None:
+                previous(job)
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    pipeline.on_done = on_done
+    return pipeline
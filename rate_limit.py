@@ -0,0 +1,271 @@
+"""Cluster-wide limits on outbound calls, per SIP trunk and per operator.
+
+    python rate_limit.py set trunk default --rate 5 --burst 10 --concurrent 50
+    python rate_limit.py set operator operator@example.com --rate 1 --concurrent 5
+    python rate_limit.py show --operator operator@example.com
+
+Every call takes one token from a token bucket (``rate`` calls per second, up to ``burst``
+at once) and one slot of a concurrent-call semaphore (``concurrent``), for the trunk it
+goes out on (``SIP_TRUNK``) and for the operator who placed it, before it is dispatched.
+One Lua script checks and takes both atomically, so replicas, sessions and dispatcher
+workers all share the same budget. A limit of 0 means unlimited.
+
+Limits come from the hash ``call-limits:config:<scope>:<name>`` when it has them (changes
+apply at once, on every replica), else from the environment: ``TRUNK_CALLS_PER_SECOND``,
+``TRUNK_BURST``, ``TRUNK_MAX_CONCURRENT_CALLS`` and the same with ``OPERATOR_``. A slot is
+held until the agent reports the call ``ended`` or ``failed`` (``call_status``), the
+dispatch fails, or ``CALL_LEASE_SECONDS`` pass.
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from resilience import RateLimitedError
+
+LIMIT_PREFIX = "call-limits:"
+TRUNK, OPERATOR = "trunk", "operator"
+SIP_TRUNK = os.getenv("SIP_TRUNK", "default")
+# Longest a call can hold a concurrency slot without reporting that it has ended
+CALL_LEASE_SECONDS = int(os.getenv("CALL_LEASE_SECONDS", 3600))
+# How long a call waits for a token or a slot before it is refused
+CALL_LIMIT_MAX_WAIT = float(os.getenv("CALL_LIMIT_MAX_WAIT", 30))
+
+DEFAULT_LIMITS = {
+    scope: {
+        "rate": float(os.getenv(f"{scope.upper()}_CALLS_PER_SECOND", 0)),
+        "burst": float(os.getenv(f"{scope.upper()}_BURST", 0)),
+        "concurrent": int(os.getenv(f"{scope.upper()}_MAX_CONCURRENT_CALLS", 0)),
+    }
+    for scope in (TRUNK, OPERATOR)
+}
+
+# KEYS: config, bucket and active-calls key per scope, then the call's lease key.
+# ARGV: now (0 = Redis server time), data_id, lease seconds, then rate, burst and
+# concurrent defaults per scope. Returns {1} when the call may go ahead, else
+# {0, scope index, seconds to wait} without taking anything.
+_ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+if now <= 0 then
+    local t = redis.call('TIME')
+    now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+end
+local data_id, lease = ARGV[2], tonumber(ARGV[3])
+local scopes = (#KEYS - 1) / 3
+local granted = {}
+for i = 1, scopes do
+    local config, bucket, active = KEYS[3 * i - 2], KEYS[3 * i - 1], KEYS[3 * i]
+    local limits = redis.call('HMGET', config, 'rate', 'burst', 'concurrent')
+    local rate = tonumber(limits[1] or ARGV[3 * i + 1])
+    local burst = tonumber(limits[2] or ARGV[3 * i + 2])
+    local concurrent = tonumber(limits[3] or ARGV[3 * i + 3])
+    if burst < 1 then
+        burst = math.max(1, rate)
+    end
+    local tokens = burst
+    local state = redis.call('HMGET', bucket, 'tokens', 'ts')
+    if state[1] then
+        tokens = math.min(burst, tonumber(state[1]) + math.max(0, now - tonumber(state[2])) * rate)
+    end
+    if rate > 0 and tokens < 1 then
+        return {0, i, tostring((1 - tokens) / rate)}
+    end
+    redis.call('ZREMRANGEBYSCORE', active, '-inf', now)
+    if concurrent > 0 and redis.call('ZCARD', active) >= concurrent then
+        -- Slots free up when calls end, which cannot be predicted; poll again shortly
+        return {0, i, '1'}
+    end
+    granted[i] = {bucket, active, tokens, rate, burst}
+end
+local actives = {}
+for i = 1, scopes do
+    local bucket, active, tokens, rate, burst = unpack(granted[i])
+    if rate > 0 then
+        redis.call('HSET', bucket, 'tokens', tokens - 1, 'ts', now)
+        redis.call('EXPIRE', bucket, math.ceil(burst / rate) + 60)
+    end
+    redis.call('ZADD', active, now + lease, data_id)
+    redis.call('EXPIRE', active, lease)
+    actives[i] = active
+end
+redis.call('SET', KEYS[#KEYS], table.concat(actives, ' '), 'EX', lease)
+return {1}
+"""
+
+# KEYS: the call's lease key. The active-calls keys are read from the lease, so this
+# relies on all limit keys living on one Redis node.
+_RELEASE_SCRIPT = """
+local actives = redis.call('GET', KEYS[1])
+if not actives then
+    return 0
+end
+for active in string.gmatch(actives, '%S+') do
+    redis.call('ZREM', active, ARGV[1])
+end
+return redis.call('DEL', KEYS[1])
+"""
+
+
+@dataclass
+class Budget:
+    scope: str
+    name: str
+    rate: float
+    burst: float
+    tokens: float
+    active: int
+    concurrent: int
+
+    @property
+    def unlimited(self):
+        return not self.rate and not self.concurrent
+
+
+def config_key(scope, name, prefix=LIMIT_PREFIX):
+    return f"{prefix}config:{scope}:{name}"
+
+
+def bucket_key(scope, name, prefix=LIMIT_PREFIX):
+    return f"{prefix}bucket:{scope}:{name}"
+
+
+def active_key(scope, name, prefix=LIMIT_PREFIX):
+    return f"{prefix}active:{scope}:{name}"
+
+
+def lease_key(data_id, prefix=LIMIT_PREFIX):
+    return f"{prefix}lease:{data_id}"
+
+
+class CallLimiter:
+    """Token buckets and concurrent-call semaphores in Redis, for one trunk and its operators."""
+
+    def __init__(self, redis_client, trunk=SIP_TRUNK, defaults=DEFAULT_LIMITS, lease_seconds=CALL_LEASE_SECONDS,
+                 max_wait=CALL_LIMIT_MAX_WAIT, prefix=LIMIT_PREFIX, clock=None, sleep=time.sleep):
+        self.redis = redis_client
+        self.trunk = trunk
+        self.defaults = defaults
+        self.lease_seconds = lease_seconds
+        self.max_wait = max_wait
+        self.prefix = prefix
+        # None uses the Redis server clock, which every replica agrees on
+        self._clock = clock
+        self._sleep = sleep
+        self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._release = redis_client.register_script(_RELEASE_SCRIPT)
+
+    def _scopes(self, operator):
+        return [(TRUNK, self.trunk)] + ([(OPERATOR, operator)] if operator else [])
+
+    def try_acquire(self, data_id, operator=None):
+        """Take a token and a slot for ``data_id``; returns ``(None, 0)`` or the limiting scope and wait."""
+        scopes = self._scopes(operator)
+        keys, args = [], [self._clock() if self._clock else 0, data_id, self.lease_seconds]
+        for scope, name in scopes:
+            keys += [config_key(scope, name, self.prefix), bucket_key(scope, name, self.prefix),
+                     active_key(scope, name, self.prefix)]
+            args += [self.defaults[scope]["rate"], self.defaults[scope]["burst"], self.defaults[scope]["concurrent"]]
+        result = self._acquire(keys=keys + [lease_key(data_id, self.prefix)], args=args)
+        if result[0]:
+            return None, 0.0
+        return scopes[int(result[1]) - 1], float(result[2])
+
+    def acquire(self, data_id, operator=None, max_wait=None, breaker=None):
+        """Wait for a token and a slot, up to ``max_wait`` seconds, else raise ``RateLimitedError``.
+
+        Each attempt, but not the wait between attempts, goes through ``breaker`` if given.
+        """
+        if max_wait is None:
+            max_wait = self.max_wait
+        waited = 0.0
+        while True:
+            if breaker is not None:
+                limited, retry_after = breaker.call(self.try_acquire, data_id, operator)
+            else:
+                limited, retry_after = self.try_acquire(data_id, operator)
+            if limited is None:
+                return waited
+            if waited + retry_after > max_wait:
+                scope, name = limited
+                raise RateLimitedError(f"Call limit reached for {scope} {name}; try again in {retry_after:.1f}s")
+            self._sleep(retry_after)
+            waited += retry_after
+
+    def release(self, data_id):
+        """Give back the concurrency slots held by ``data_id``; a no-op if it holds none."""
+        return bool(self._release(keys=[lease_key(data_id, self.prefix)], args=[data_id]))
+
+    def set_limits(self, scope, name, rate=None, burst=None, concurrent=None):
+        limits = {"rate": rate, "burst": burst, "concurrent": concurrent}
+        self.redis.hset(config_key(scope, name, self.prefix),
+                        mapping={field: value for field, value in limits.items() if value is not None})
+
+    def budget(self, operator=None):
+        """What is left right now for the trunk and ``operator``, as ``Budget``s."""
+        scopes = self._scopes(operator)
+        now = self._clock() if self._clock else _server_time(self.redis)
+        pipe = self.redis.pipeline(transaction=False)
+        for scope, name in scopes:
+            pipe.hmget(config_key(scope, name, self.prefix), "rate", "burst", "concurrent")
+            pipe.hmget(bucket_key(scope, name, self.prefix), "tokens", "ts")
+            pipe.zcount(active_key(scope, name, self.prefix), now, "+inf")
+        replies = pipe.execute()
+        budgets = []
+        for i, (scope, name) in enumerate(scopes):
+            (rate, burst, concurrent), (tokens, ts), active = replies[3 * i:3 * i + 3]
+            defaults = self.defaults[scope]
+            rate = float(rate if rate is not None else defaults["rate"])
+            burst = float(burst if burst is not None else defaults["burst"])
+            burst = burst if burst >= 1 else max(1.0, rate)
+            tokens = burst if tokens is None else min(burst, float(tokens) + max(0.0, now - float(ts)) * rate)
+            concurrent = int(concurrent if concurrent is not None else defaults["concurrent"])
+            budgets.append(Budget(scope, name, rate, burst, tokens, active, concurrent))
+        return budgets
+
+
+def _server_time(redis_client):
+    """The Redis server clock, which the acquire script also uses."""
+    seconds, microseconds = redis_client.time()
+    return seconds + microseconds / 1_000_000
+
+
+def release_call(redis_client, data_id):
+    """Free the slots of a call that has ended; used when its final status is published."""
+    return get_call_limiter(redis_client).release(data_id)
+
+
+@lru_cache(maxsize=None)
+def get_call_limiter(redis_client):
+    """One ``CallLimiter`` per Redis client, so the scripts are registered only once."""
+    # LIMIT_PREFIX is read here rather than bound as a default, so the tests can move it
+    return CallLimiter(redis_client, prefix=LIMIT_PREFIX)
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from resources import get_redis_client
+
+    parser = argparse.ArgumentParser(description="Set or show outbound call limits")
+    commands = parser.add_subparsers(dest="command", required=True)
+    set_limits = commands.add_parser("set", help="Set the limits of a trunk or operator (0 = unlimited)")
+    set_limits.add_argument("scope", choices=(TRUNK, OPERATOR))
+    set_limits.add_argument("name", help="Trunk name or operator email")
+    set_limits.add_argument("--rate", type=float, help="Calls per second")
+    set_limits.add_argument("--burst", type=float, help="Calls allowed at once after an idle period")
+    set_limits.add_argument("--concurrent", type=int, help="Calls in progress at the same time")
+    show = commands.add_parser("show", help="Print the remaining budget as JSON")
+    show.add_argument("--operator")
+    args = parser.parse_args()
+    load_dotenv()
+
+    limiter = CallLimiter(get_redis_client())
+    if args.command == "set":
+        limiter.set_limits(args.scope, args.name, args.rate, args.burst, args.concurrent)
+    print(json.dumps([vars(budget) for budget in limiter.budget(getattr(args, "operator", None))], indent=2))
+
+
+if __name__ == "__main__":
+    main()
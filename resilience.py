@@ -0,0 +1,198 @@
+"""Retry policy and circuit breakers for the call-setup dependencies (Redis, LiveKit dispatch).
+
+Errors are classified before anything is retried: transient failures (connection errors,
+timeouts, HTTP 429/5xx) are retried with jittered exponential backoff, permanent ones
+(authentication, bad requests) fail at once. Every dependency has a process-wide circuit
+breaker: after ``failure_threshold`` consecutive transient failures it opens and calls fail
+fast with ``CircuitOpenError`` instead of waiting on a dependency that is down, until a
+single trial call after ``reset_timeout`` succeeds. Clocks, sleeps and randomness are
+injectable so all of this can be tested deterministically.
+"""
+import random
+import re
+import threading
+import time
+
+import redis
+import requests
+
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+_HTTP_STATUS = re.compile(r"^HTTP (\d{3})\b")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} unavailable, not retrying for {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class DispatchError(Exception):
+    """A dispatch that reached LiveKit (or the CLI) but was not accepted."""
+
+
+class RateLimitedError(Exception):
+    """A call refused because its trunk or operator is out of budget (``rate_limit``)."""
+
+
+class ClaimLostError(Exception):
+    """A call whose dispatch claim was taken over by an identical request (``idempotency``)."""
+
+
+def classify_error(error):
+    """``TRANSIENT`` when retrying ``error`` may succeed, ``PERMANENT`` otherwise."""
+    if isinstance(error, (CircuitOpenError, RateLimitedError, ClaimLostError)):
+        return PERMANENT
+    if isinstance(error, redis.AuthenticationError):
+        return PERMANENT
+    if isinstance(error, (redis.ConnectionError, redis.TimeoutError, redis.BusyLoadingError,
+                          requests.ConnectionError, requests.Timeout, OSError)):
+        return TRANSIENT
+    if isinstance(error, redis.ResponseError):
+        return PERMANENT
+    if isinstance(error, DispatchError):
+        match = _HTTP_STATUS.match(str(error))
+        if match:
+            status = int(match.group(1))
+            return TRANSIENT if status == 429 or status >= 500 else PERMANENT
+        # CLI failures carry no status; treat them as transient like the old loop did
+        return TRANSIENT
+    # Anything unrecognised (e.g. a digest mismatch) is retried, as before
+    return TRANSIENT
+
+
+class Backoff:
+    """Capped exponential backoff with full jitter: ``uniform(0, min(cap, base * 2**n))``."""
+
+    def __init__(self, base=0.1, cap=2.0, multiplier=2.0, rng=None):
+        self.base = base
+        self.cap = cap
+        self.multiplier = multiplier
+        self._rng = rng or random.Random()
+
+    def delay(self, retry):
+        """Delay before retry number ``retry`` (0 for the first retry)."""
+        return self._rng.uniform(0, min(self.cap, self.base * self.multiplier ** retry))
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive transient failures -> half-open trial -> closed."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=15.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Raise ``CircuitOpenError`` unless a call may go through now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            waited = self._clock() - self._opened_at
+            if self._state == self.OPEN and waited >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_running = False
+            if self._state == self.HALF_OPEN and not self._trial_running:
+                # Exactly one trial call probes whether the dependency is back
+                self._trial_running = True
+                return
+            raise CircuitOpenError(self.name, max(0.0, self.reset_timeout - waited))
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def release_trial(self):
+        """End a trial call that said nothing about the dependency's health; the state is kept."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._trial_running = False
+
+    def call(self, fn, *args, classify=classify_error, **kwargs):
+        """Run ``fn`` through the breaker; only transient failures count against it.
+
+        A permanent error (a bad request) leaves the breaker as it was: it neither counts as a
+        failure nor proves the dependency healthy, so a half-open breaker stays half-open.
+        """
+        self.allow()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if classify(e) == TRANSIENT:
+                self.record_failure()
+            else:
+                self.release_trial()
+            raise
+        self.record_success()
+        return result
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, **kwargs):
+    """Process-wide breaker for the dependency ``name``, shared by every session and worker."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+
+class RetryPolicy:
+    """Retries transient failures with backoff, within ``max_attempts`` and a time ``budget``."""
+
+    def __init__(self, max_attempts=5, backoff=None, budget=10.0, classify=classify_error,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.max_attempts = max_attempts
+        self.backoff = backoff or Backoff()
+        # Seconds after which no further retry is started, so a page never hangs for long
+        self.budget = budget
+        self.classify = classify
+        self.sleep = sleep
+        self.clock = clock
+
+    def call(self, fn, on_retry=None):
+        """Call ``fn()`` until it succeeds; ``on_retry(attempt, error, delay)`` runs before each retry."""
+        started = self.clock()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return fn()
+            except Exception as e:
+                if attempt == self.max_attempts or self.classify(e) != TRANSIENT:
+                    raise
+                delay = self.backoff.delay(attempt - 1)
+                if self.budget is not None and self.clock() - started + delay > self.budget:
+                    raise
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+                self.sleep(delay)
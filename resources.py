@@ -0,0 +1,117 @@
+"""Process-wide client handles, built on first use and shared by every session.
+
+Nothing here connects, or imports a client library, at import time: the login page renders
+without loading or touching Redis or Pinecone, and later reruns reuse the same clients and
+connection pools.
+"""
+import os
+from functools import lru_cache
+
+import metrics
+from users import UserStore
+
+ASSISTANT_NAME = "test-rag"
+
+
+@lru_cache(maxsize=None)
+def get_redis_client():
+    """Redis client for metadata transfer, backed by a bounded, health-checked pool."""
+    import redis
+
+    ssl = os.getenv('REDIS_SSL', 'True').lower() == 'true'  # Enable SSL for Azure Cache
+    pool = redis.BlockingConnectionPool(
+        connection_class=redis.SSLConnection if ssl else redis.Connection,
+        host=os.getenv('REDIS_HOST', 'localhost'),
+        port=int(os.getenv('REDIS_PORT', 6380)),  # Azure Cache for Redis uses 6380
+        password=os.getenv('REDIS_PASSWORD', None),
+        decode_responses=True,
+        # Campaign workers wait for a free connection rather than opening unbounded ones
+        max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 32)),
+        timeout=float(os.getenv('REDIS_POOL_TIMEOUT', 10)),
+        # PING connections idle longer than this before reuse; Azure drops idle links
+        health_check_interval=int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)),
+        socket_connect_timeout=5,
+        socket_timeout=10,
+        socket_keepalive=True,
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+@lru_cache(maxsize=None)
+def get_user_store():
+    """Operator accounts and sessions, with this process's cache of credentials.
+
+    The demo accounts are created on first use only with ``SEED_DEFAULT_USERS=true``.
+    """
+    store = UserStore(get_redis_client())
+    if os.getenv("SEED_DEFAULT_USERS", "false").lower() == "true":
+        store.seed()
+    return store
+
+
+@lru_cache(maxsize=None)
+def get_pinecone():
+    from pinecone import Pinecone
+
+    return Pinecone(
+        api_key=os.getenv("PINECONE_API_KEY"),
+        connection_pool_maxsize=int(os.getenv("PINECONE_POOL_SIZE", 16)),
+    )
+
+
+def get_assistant(assistant_name=ASSISTANT_NAME):
+    """The knowledge-base assistant; uploads are streamed rather than read into memory whole."""
+    # Cached by name, so get_assistant() and get_assistant(ASSISTANT_NAME) share one assistant
+    return _assistant(assistant_name)
+
+
+@lru_cache(maxsize=None)
+def _assistant(assistant_name):
+    from knowledge_base import StreamingAssistant
+
+    return StreamingAssistant(get_pinecone().assistant.Assistant(assistant_name=assistant_name),
+                              api_key=os.getenv("PINECONE_API_KEY"))
+
+
+def get_file_list_cache(assistant_name=ASSISTANT_NAME):
+    """Knowledge-base file list shared by every session."""
+    return _file_list_cache(assistant_name)
+
+
+@lru_cache(maxsize=None)
+def _file_list_cache(assistant_name):
+    from knowledge_base import FileListCache
+
+    return FileListCache(get_assistant(assistant_name))
+
+
+@lru_cache(maxsize=None)
+def get_call_status_tracker():
+    """Live call states for every session, fed by one blocking XREAD listener per process."""
+    from call_status import CallStatusTracker
+
+    return CallStatusTracker(get_redis_client()).start()
+
+
+@lru_cache(maxsize=None)
+def start_metrics():
+    """Expose call-setup metrics once per process, as configured by the environment.
+
+    ``METRICS_PORT`` serves ``/metrics`` for this replica; with ``METRICS_REDIS=true`` every
+    replica also adds its counts to Redis, and ``/metrics?scope=cluster`` returns the totals.
+    Returns the exporter (or ``None``) and the server (or ``None``).
+    """
+    exporter = None
+    if os.getenv("METRICS_REDIS", "false").lower() == "true":
+        exporter = metrics.RedisMetricsExporter(
+            get_redis_client(), interval=float(os.getenv("METRICS_FLUSH_INTERVAL", 10))
+        ).start()
+    server = None
+    port = os.getenv("METRICS_PORT")
+    if port:
+        try:
+            server = metrics.start_metrics_server(int(port), exporter=exporter)
+        except OSError as e:
+            # Several replicas on one host cannot share a port; the first one serves
+            metrics.logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+    return exporter, server
@@ -0,0 +1,283 @@
+"""Scheduled calls: a Redis sorted set of calls by due time, moved to the dispatch queue when due.
+
+    python scheduler.py run
+    python scheduler.py status
+
+``schedule_calls`` checks each call's metadata (``metadata_schema``), stores the call under
+its ``data_id`` in the hash ``call-schedule:jobs``, adds it to the sorted set
+``call-schedule`` scored by the time it is due and reports it as ``scheduled`` on the
+call-status stream. A call can be
+limited to business hours in the callee's time zone (``CallWindow``): it is then due at the
+start of the next window it fits in, and is not placed after that window has closed.
+
+``SchedulePoller`` sleeps until the earliest call is due (or ``max_sleep``), then one Lua
+script pops up to ``batch_size`` due calls, appends them to the dispatch queue
+(``dispatch_queue``) and reports them ``queued`` in the same atomic step. A call is
+therefore either still scheduled or queued, never both: pollers can be restarted, or run in every dispatcher worker
+(``python dispatch_queue.py worker`` starts one), without calls firing twice. A call that
+comes due only after its window has closed (e.g. the pollers were down) is moved to its
+next window instead, by a second script that leaves it alone if another poller queued it
+in the meantime.
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from call_status import STATUS_KEY_PREFIX, STATUS_STREAM, STREAM_MAXLEN, add_status
+from calls import new_data_id
+from dispatch_queue import DISPATCH_STREAM
+from metadata_schema import InvalidMetadataError, validate_batch
+from metadata_store import METADATA_TTL
+from metrics import SCHEDULE_LATENESS_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_KEY = "call-schedule"
+JOBS_KEY = "call-schedule:jobs"
+
+# Callee time zone by phone number prefix; the longest matching prefix wins
+CALLEE_TIMEZONES = {"+91": "Asia/Kolkata"}
+DEFAULT_TIMEZONE = os.getenv("CALLEE_TIMEZONE", "Asia/Kolkata")
+
+# KEYS: schedule, jobs, dispatch stream, status stream. ARGV: now, batch size, status
+# stream length, status TTL, status key prefix. Due calls are appended to the dispatch
+# stream, reported ``queued`` as ``call_status.add_status`` does, and removed from the
+# schedule; calls past their window's deadline are left in place and returned so the
+# poller can move them to their next window.
+# Returns {{data_id, due time} of every queued call, {data_id} of every missed one}.
+_POP_SCRIPT = """
+local now = tonumber(ARGV[1])
+local ts = string.format('%.3f', now)
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'WITHSCORES', 'LIMIT', 0, tonumber(ARGV[2]))
+local queued, missed = {}, {}
+for i = 1, #due, 2 do
+    local data_id, score = due[i], due[i + 1]
+    local payload = redis.call('HGET', KEYS[2], data_id)
+    if not payload then
+        redis.call('ZREM', KEYS[1], data_id)
+    else
+        local job = cjson.decode(payload)
+        local deadline = tonumber(job['deadline'])
+        if deadline and now > deadline then
+            table.insert(missed, data_id)
+        else
+            redis.call('XADD', KEYS[3], '*', 'data_id', data_id, 'phone_number', job['phone_number'],
+                       'metadata', job['metadata'], 'campaign', job['campaign'], 'operator', job['operator'],
+                       'enqueued_at', ARGV[1])
+            redis.call('XADD', KEYS[4], 'MAXLEN', '~', ARGV[3], '*', 'data_id', data_id, 'status', 'queued',
+                       'ts', ts, 'detail', '')
+            redis.call('SET', ARGV[5] .. data_id,
+                       cjson.encode({data_id = data_id, status = 'queued', ts = ts, detail = ''}), 'EX', ARGV[4])
+            redis.call('ZREM', KEYS[1], data_id)
+            redis.call('HDEL', KEYS[2], data_id)
+            table.insert(queued, {data_id, score})
+        end
+    end
+end
+return {queued, missed}
+"""
+
+# KEYS: schedule, jobs. ARGV: data_id, due time, job payload, ... Moves each call that is
+# still scheduled; one already popped by another poller is not written back.
+_RESCHEDULE_SCRIPT = """
+local moved = 0
+for i = 1, #ARGV, 3 do
+    if redis.call('ZSCORE', KEYS[1], ARGV[i]) then
+        redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 2])
+        redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+
+@dataclass
+class CallWindow:
+    """Hours of the day (callee's local time) and weekdays (0 = Monday) calls may be placed in."""
+    start: int = 9
+    end: int = 18
+    days: tuple = (0, 1, 2, 3, 4)
+
+    @classmethod
+    def from_env(cls):
+        start, end = os.getenv("BUSINESS_HOURS", "9-18").split("-")
+        days = os.getenv("BUSINESS_DAYS", "0,1,2,3,4")
+        return cls(int(start), int(end), tuple(int(day) for day in days.split(",")))
+
+
+def callee_timezone(phone_number):
+    prefix = max((p for p in CALLEE_TIMEZONES if (phone_number or "").startswith(p)), key=len, default=None)
+    return ZoneInfo(CALLEE_TIMEZONES[prefix] if prefix else DEFAULT_TIMEZONE)
+
+
+def next_in_window(at, window):
+    """``(start, end)`` timestamps of the earliest time at or after ``at`` inside ``window``.
+
+    ``at`` is an aware datetime in the callee's time zone; windows follow its local clock.
+    """
+    for offset in range(8):
+        day = at.date() + timedelta(days=offset)
+        if day.weekday() not in window.days:
+            continue
+        opens = datetime(day.year, day.month, day.day, window.start, tzinfo=at.tzinfo)
+        closes = datetime(day.year, day.month, day.day, window.end, tzinfo=at.tzinfo)
+        if at < closes:
+            return max(at, opens).timestamp(), closes.timestamp()
+    raise ValueError(f"{window} has no open hours")
+
+
+def schedule_calls(redis_client, calls, at, campaign=None, operator=None, window=None, schedule_key=SCHEDULE_KEY,
+                   jobs_key=JOBS_KEY, status_stream=STATUS_STREAM):
+    """Schedule ``(phone_number, metadata)`` pairs for ``at`` in one round trip.
+
+    ``at`` is a naive datetime read as the callee's local time, or a timestamp. With a
+    ``window``, each call is due at the first time from ``at`` within the window.
+    Returns ``(data_id, due timestamp)`` per call. Raises ``InvalidMetadataError`` for the
+    first call whose metadata does not match ``CONFIG``, before any call is scheduled.
+    """
+    calls = list(calls)
+    invalid = validate_batch([metadata for _, metadata in calls])
+    if invalid:
+        raise InvalidMetadataError(invalid[min(invalid)])
+    pipe = redis_client.pipeline(transaction=True)
+    scheduled = []
+    for phone_number, metadata in calls:
+        if isinstance(at, datetime):
+            local = at.replace(tzinfo=callee_timezone(phone_number))
+        else:
+            local = datetime.fromtimestamp(at, callee_timezone(phone_number))
+        due, deadline = next_in_window(local, window) if window else (local.timestamp(), None)
+        data_id = new_data_id(phone_number)
+        job = {"phone_number": phone_number, "metadata": json.dumps(metadata), "campaign": campaign or "",
+               "operator": operator or "", "deadline": deadline, "window": asdict(window) if window else None}
+        pipe.hset(jobs_key, data_id, json.dumps(job))
+        pipe.zadd(schedule_key, {data_id: due})
+        add_status(pipe, data_id, "scheduled", f"Due {datetime.fromtimestamp(due, local.tzinfo).isoformat()}",
+                   status_stream)
+        scheduled.append((data_id, due))
+    pipe.execute()
+    return scheduled
+
+
+def schedule_call(redis_client, phone_number, metadata, at, campaign=None, operator=None, window=None, **keys):
+    return schedule_calls(redis_client, [(phone_number, metadata)], at, campaign, operator, window, **keys)[0]
+
+
+def scheduled_count(redis_client, schedule_key=SCHEDULE_KEY):
+    return redis_client.zcard(schedule_key)
+
+
+class SchedulePoller:
+    """Moves due calls from the schedule to the dispatch queue, ``batch_size`` at a time."""
+
+    def __init__(self, redis_client, batch_size=500, max_sleep=1.0, schedule_key=SCHEDULE_KEY, jobs_key=JOBS_KEY,
+                 stream=DISPATCH_STREAM, status_stream=STATUS_STREAM, clock=time.time):
+        self.redis = redis_client
+        self.batch_size = batch_size
+        # Upper bound on the sleep, so calls scheduled meanwhile for an earlier time are not late
+        self.max_sleep = max_sleep
+        self.schedule_key = schedule_key
+        self.jobs_key = jobs_key
+        self.stream = stream
+        self.status_stream = status_stream
+        self._clock = clock
+        self._pop = redis_client.register_script(_POP_SCRIPT)
+        self._move = redis_client.register_script(_RESCHEDULE_SCRIPT)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True, name="schedule-poller")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                while self.poll() == self.batch_size:
+                    pass
+                failures = 0
+                self._stop.wait(self._until_next())
+            except Exception:
+                failures += 1
+                logger.warning("Schedule poller failed; retrying", exc_info=failures == 1)
+                self._stop.wait(min(30.0, 2.0 ** failures))
+
+    def _until_next(self):
+        earliest = self.redis.zrange(self.schedule_key, 0, 0, withscores=True)
+        if not earliest:
+            return self.max_sleep
+        return min(self.max_sleep, max(0.0, earliest[0][1] - self._clock()))
+
+    def poll(self):
+        """Queue one batch of due calls; returns how many were due (queued or missed)."""
+        now = self._clock()
+        queued, missed = self._pop(keys=[self.schedule_key, self.jobs_key, self.stream, self.status_stream],
+                                   args=[now, self.batch_size, STREAM_MAXLEN, METADATA_TTL, STATUS_KEY_PREFIX])
+        for _, due in queued:
+            SCHEDULE_LATENESS_SECONDS.observe(max(0.0, now - float(due)))
+        if missed:
+            self._reschedule(missed, now)
+        return len(queued) + len(missed)
+
+    def _reschedule(self, data_ids, now):
+        """Move calls whose window closed before they were queued to their next window."""
+        args = []
+        for data_id, payload in zip(data_ids, self.redis.hmget(self.jobs_key, data_ids)):
+            if payload is None:
+                continue
+            job = json.loads(payload)
+            window = CallWindow(**dict(job["window"], days=tuple(job["window"]["days"])))
+            due, job["deadline"] = next_in_window(
+                datetime.fromtimestamp(now, callee_timezone(job["phone_number"])), window)
+            args += [data_id, due, json.dumps(job)]
+            logger.info("Call %s missed its window; moving it to %s", data_id, datetime.fromtimestamp(due).isoformat())
+        if args:
+            # Only calls still in the schedule: one another poller queued meanwhile stays queued
+            self._move(keys=[self.schedule_key, self.jobs_key], args=args)
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from resources import get_redis_client, start_metrics
+
+    parser = argparse.ArgumentParser(description="Run the schedule poller or inspect scheduled calls")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("run", help="Queue scheduled calls when they are due, until interrupted")
+    commands.add_parser("status", help="Print the number of scheduled calls and the next due time")
+    args = parser.parse_args()
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    redis_client = get_redis_client()
+    if args.command == "status":
+        earliest = redis_client.zrange(SCHEDULE_KEY, 0, 0, withscores=True)
+        print(json.dumps({
+            "scheduled": scheduled_count(redis_client),
+            "next_due": datetime.fromtimestamp(earliest[0][1]).isoformat() if earliest else None,
+        }, indent=2))
+        return
+    start_metrics()
+    poller = SchedulePoller(redis_client)
+    try:
+        poller.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
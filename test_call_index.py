@@ -0,0 +1,89 @@
+import metadata_store
+from call_index import calls_between, calls_to, campaign_calls, count_between, phone_of, recent_campaigns
+from call_status import publish_status, status_key
+from metadata_store import MetadataStore, phone_index_key, time_index_key
+
+
+def _write(store, monkeypatch, data_id, phone_number, at, campaign=None):
+    monkeypatch.setattr(metadata_store.time, "time", lambda: at)
+    store.write(data_id, {"phone_number": phone_number, "first_message": "Hi"}, campaign=campaign)
+
+
+def _all_pages(fetch):
+    records, cursor = [], None
+    while True:
+        page = fetch(cursor)
+        records.extend(page.records)
+        if page.cursor is None:
+            return records
+        cursor = page.cursor
+
+
+def test_pages_cover_a_time_range_newest_first_without_repeats(redis_client, key_prefix, monkeypatch):
+    store = MetadataStore(redis_client, ttl=600, index_prefix=f"{key_prefix}:")
+    # Several calls share a timestamp, so pages have to split ties correctly
+    for i in range(23):
+        _write(store, monkeypatch, f"{key_prefix}-{i:02d}", "+911234567890", 1000.0 + i // 4)
+    prefix = f"{key_prefix}:"
+
+    records = _all_pages(lambda cursor: calls_between(redis_client, cursor=cursor, count=3, prefix=prefix))
+    assert sorted(r.data_id for r in records) == [f"{key_prefix}-{i:02d}" for i in range(23)]
+    assert [r.created_at for r in records] == sorted((r.created_at for r in records), reverse=True)
+
+    window = _all_pages(lambda cursor: calls_between(redis_client, start=1001, end=1002, cursor=cursor, count=5,
+                                                     prefix=prefix))
+    assert len(window) == 8 == count_between(redis_client, 1001, 1002, prefix=prefix)
+
+
+def test_lookup_by_phone_includes_latest_status(redis_client, key_prefix, monkeypatch):
+    store = MetadataStore(redis_client, ttl=600, index_prefix=f"{key_prefix}:")
+    _write(store, monkeypatch, f"call-+911111111111-{key_prefix}-1", "+911111111111", 1000.0)
+    _write(store, monkeypatch, f"call-+912222222222-{key_prefix}-2", "+912222222222", 1001.0)
+    _write(store, monkeypatch, f"call-+911111111111-{key_prefix}-3", "+911111111111", 1002.0)
+    publish_status(redis_client, f"call-+911111111111-{key_prefix}-3", "failed", detail="busy",
+                   stream=f"{key_prefix}-stream")
+
+    page = calls_to(redis_client, "+911111111111", prefix=f"{key_prefix}:")
+
+    assert [r.data_id[-1] for r in page.records] == ["3", "1"] and page.cursor is None
+    assert (page.records[0].status, page.records[0].detail) == ("failed", "busy")
+    assert page.records[1].status == ""
+    redis_client.delete(status_key(f"call-+911111111111-{key_prefix}-3"))
+    for key in redis_client.scan_iter(f"call-*-{key_prefix}-*"):
+        redis_client.delete(key)
+
+
+def test_phone_is_read_from_generated_data_ids():
+    assert phone_of("call-+911234567890-1700000000-123456") == "+911234567890"
+    assert phone_of("bench-campaign-1") == ""
+
+
+def test_campaign_calls_and_discard(redis_client, key_prefix, monkeypatch):
+    store = MetadataStore(redis_client, ttl=600, index_prefix=f"{key_prefix}:")
+    prefix = f"{key_prefix}:"
+    for i in range(30):
+        _write(store, monkeypatch, f"{key_prefix}-{i}", f"+9190000000{i:02d}", 1000.0 + i, campaign="renewals")
+    _write(store, monkeypatch, f"{key_prefix}-other", "+919000000099", 1100.0, campaign="other")
+
+    records = _all_pages(lambda cursor: campaign_calls(redis_client, "renewals", cursor=cursor, count=10,
+                                                       prefix=prefix))
+    assert sorted(r.phone_number for r in records) == [f"+9190000000{i:02d}" for i in range(30)]
+    assert [name for name, _ in recent_campaigns(redis_client, prefix=prefix)] == ["other", "renewals"]
+
+    store.discard(f"{key_prefix}-0", "+919000000000", "renewals")
+    assert not redis_client.exists(f"{key_prefix}-0")
+    assert redis_client.zscore(time_index_key(prefix), f"{key_prefix}-0") is None
+    assert redis_client.zcard(phone_index_key("+919000000000", prefix)) == 0
+    assert len(campaign_calls(redis_client, "renewals", count=100, prefix=prefix).records) == 29
+
+
+def test_indexes_drop_entries_older_than_the_ttl(redis_client, key_prefix, monkeypatch):
+    store = MetadataStore(redis_client, ttl=60, index_prefix=f"{key_prefix}:")
+    store._use_script = False  # the transaction fallback keeps the same indexes
+    _write(store, monkeypatch, f"{key_prefix}-old", "+911234567890", 1000.0, campaign="c")
+    _write(store, monkeypatch, f"{key_prefix}-new", "+911234567890", 1061.0, campaign="c")
+
+    prefix = f"{key_prefix}:"
+    assert [r.data_id for r in calls_between(redis_client, prefix=prefix).records] == [f"{key_prefix}-new"]
+    assert [r.data_id for r in calls_to(redis_client, "+911234567890", prefix=prefix).records] == [
+        f"{key_prefix}-new"]
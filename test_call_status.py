@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from call_status import CallStatusTracker, publish_status, status_key
+from calls import initiate_call_with_retry
+
+
+@pytest.fixture
+def tracker(redis_client, key_prefix):
+    tracker = CallStatusTracker(redis_client, stream=f"{key_prefix}-stream", block_ms=100).start()
+    yield tracker
+    tracker.stop()
+    for data_id in list(tracker._calls):
+        redis_client.delete(status_key(data_id))
+
+
+def _wait_for(condition):
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_events_are_pushed_to_watched_calls(redis_client, tracker, key_prefix):
+    calls = [f"{key_prefix}-call-{i}" for i in range(200)]
+    for data_id in calls:
+        tracker.watch(data_id, label=data_id[-3:])
+
+    for i, data_id in enumerate(calls):
+        publish_status(redis_client, data_id, "ringing", stream=tracker.stream)
+        publish_status(redis_client, data_id, "answered" if i % 2 else "failed", detail="busy" * (i % 2 == 0),
+                       stream=tracker.stream)
+    publish_status(redis_client, f"{key_prefix}-unwatched", "ringing", stream=tracker.stream)
+
+    _wait_for(lambda: all(state.status != "ringing" and state.status != "dispatched"
+                          for state in tracker.get(calls)))
+    states = tracker.get(calls)
+    assert [s.status for s in states[:2]] == ["failed", "answered"]
+    assert states[0].detail == "busy" and states[0].finished
+    assert len(tracker.get([f"{key_prefix}-unwatched"])) == 0
+    redis_client.delete(status_key(f"{key_prefix}-unwatched"))
+
+
+def test_watch_picks_up_status_published_before_it(redis_client, tracker, key_prefix):
+    data_id = f"{key_prefix}-call"
+    publish_status(redis_client, data_id, "answered", stream=tracker.stream)
+
+    tracker.watch(data_id)
+
+    assert tracker.get([data_id])[0].status == "answered"
+
+
+def test_finished_calls_are_evicted_after_retention(redis_client, key_prefix):
+    now = [1000.0]
+    tracker = CallStatusTracker(redis_client, stream=f"{key_prefix}-stream", retention=60, clock=lambda: now[0])
+    tracker.watch("done")
+    tracker.watch("live")
+    tracker._apply({"data_id": "done", "status": "ended", "ts": "1000"})
+
+    now[0] = 1061.0
+    tracker._evict()
+
+    assert [s.data_id for s in tracker.get(["done", "live"])] == ["live"]
+
+
+def test_calls_without_events_go_stale_and_are_evicted(redis_client, key_prefix):
+    now = [1000.0]
+    tracker = CallStatusTracker(redis_client, stream=f"{key_prefix}-stream", retention=600, stale_after=300,
+                                clock=lambda: now[0])
+    tracker.watch("silent")
+    tracker.watch("revived")
+
+    now[0] = 1301.0
+    tracker._evict()
+    assert all(s.stale and s.settled and not s.finished for s in tracker.get(["silent", "revived"]))
+
+    tracker._apply({"data_id": "revived", "status": "ringing", "ts": "1301"})
+    assert not tracker.get(["revived"])[0].settled
+
+    now[0] = 1601.0
+    tracker._evict()
+    assert [s.data_id for s in tracker.get(["silent", "revived"])] == ["revived"]
+
+
+def test_dispatched_calls_are_reported_by_data_id(redis_client, key_prefix, call_metadata):
+    class Dispatcher:
+        def create_dispatch(self, data_id):
+            return True, "ok", None
+
+    dispatched = []
+    success, _, _ = initiate_call_with_retry(redis_client, "+911234567890", call_metadata,
+                                             dispatcher=Dispatcher(), on_dispatched=dispatched.append)
+
+    assert success and len(dispatched) == 1
+    assert redis_client.exists(dispatched[0])
+    redis_client.delete(dispatched[0], f"{dispatched[0]}:sha1")
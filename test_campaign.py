@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+from campaign import (CampaignRow, build_campaign_metadata, parse_campaign_csv, render_template, run_campaign,
+                      validate_campaign)
+
+
+def test_phone_column_aliases_and_header_whitespace():
+    for header in ("phone_number", "phone", " number ", "mobile"):
+        rows, errors = parse_campaign_csv(f"{header},name\n+911234567890,Asha\n")
+        assert errors == []
+        assert [(r.row_number, r.phone_number, r.variables) for r in rows] == [(2, "+911234567890", {"name": "Asha"})]
+
+
+def test_csv_without_phone_column_is_rejected():
+    with pytest.raises(ValueError, match="phone_number"):
+        parse_campaign_csv("name,city\nAsha,Pune\n")
+
+
+def test_invalid_rows_are_reported_with_spreadsheet_row_numbers():
+    data = ("\ufeffphone,name\n"
+            "+91 98765-43210,Asha\n"
+            ",Ravi\n"
+            "12345,Meera\n"
+            "+911234567890,\n").encode("utf-8")
+
+    rows, errors = parse_campaign_csv(data)
+
+    assert [(r.row_number, r.phone_number) for r in rows] == [(2, "+919876543210"), (5, "+911234567890")]
+    assert rows[1].variables == {"name": ""}
+    assert [(e.row_number, e.phone_number, e.success, e.error) for e in errors] == [
+        (3, "", False, "Invalid phone number"),
+        (4, "12345", False, "Invalid phone number"),
+    ]
+
+
+def test_render_template_leaves_unknown_placeholders():
+    assert render_template("Hi {name}, about {order}", {"name": "Asha"}) == "Hi Asha, about {order}"
+    assert render_template("", {"name": "Asha"}) == ""
+    assert render_template("Hi {name}", {}) == "Hi {name}"
+
+
+def test_campaign_metadata_is_rendered_per_row(call_metadata):
+    base = dict(call_metadata, first_message="Namaste {name}", LLM_system_prompt="Order {order} for {name}")
+    rows = [CampaignRow(2, "+919876543210", {"name": "Asha", "order": "A1"}),
+            CampaignRow(3, "+919876543211", {"name": "Ravi"})]
+
+    jobs = build_campaign_metadata(base, rows)
+
+    assert [row for row, _ in jobs] == rows
+    first, second = (metadata for _, metadata in jobs)
+    assert first["phone_number"] == "+919876543210" and second["phone_number"] == "+919876543211"
+    assert first["first_message"] == "Namaste Asha" and first["LLM_system_prompt"] == "Order A1 for Asha"
+    assert second["LLM_system_prompt"] == "Order {order} for Ravi"
+    assert first["variables"] == {"name": "Asha", "order": "A1"}
+    assert first["STT_model"] == base["STT_model"] and base["first_message"] == "Namaste {name}"
+
+
+def test_invalid_campaign_rows_are_split_off(call_metadata):
+    rows = [CampaignRow(2, "+919876543210"), CampaignRow(3, "+919876543211")]
+    jobs = build_campaign_metadata(call_metadata, rows)
+    jobs[1][1]["LLM_temperature"] = 7
+
+    valid, errors = validate_campaign(jobs)
+
+    assert [row.row_number for row, _ in valid] == [2]
+    assert [(e.row_number, e.success) for e in errors] == [(3, False)]
+    assert "LLM_temperature" in errors[0].error
+
+
+def test_run_campaign_returns_results_in_row_order_with_failures():
+    jobs = [(CampaignRow(n, f"+9198765432{n:02d}"), {"n": n}) for n in range(2, 12)]
+    threads = set()
+
+    def dispatch(redis_client, phone_number, metadata):
+        threads.add(threading.current_thread().name)
+        if metadata["n"] == 5:
+            raise RuntimeError("lost connection")
+        if metadata["n"] == 7:
+            return False, None, "HTTP 400: bad request"
+        return True, f"dispatched {phone_number}", None
+
+    progress = []
+    results = run_campaign(None, jobs, max_workers=4, dispatch=dispatch,
+                           on_progress=lambda done, total, result: progress.append((done, total, result)))
+
+    assert [r.row_number for r in results] == list(range(2, 12))
+    failed = {r.row_number: r.error for r in results if not r.success}
+    assert failed == {5: "lost connection", 7: "HTTP 400: bad request"}
+    assert results[0].output == "dispatched +919876543202"
+    assert [(done, total) for done, total, _ in progress] == [(i, 10) for i in range(1, 11)]
+    assert sorted(r.row_number for _, _, r in progress) == list(range(2, 12))
+    assert all(name != threading.current_thread().name for name in threads)
+
+
+def test_run_campaign_without_jobs_dispatches_nothing():
+    def dispatch(*args):
+        raise AssertionError("nothing to dispatch")
+
+    assert run_campaign(None, [], dispatch=dispatch) == []
@@ -0,0 +1,121 @@
+import re
+from types import MappingProxyType
+
+import pytest
+
+import catalog
+from config import CONFIG, costs_per_min
+
+# The per-rerun tables app.py built inline before catalog.py, kept here as the reference
+LEGACY_PROVIDER_MODEL_MAPPING = {
+    "STT": {
+        "azure": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("azure:")],
+        "sarvam": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("sarvam:")],
+        "deepgram": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("deepgram:")],
+        "openai": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("openai:")],
+        "iitm": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("iitm:")],
+        "groq": [model for model in CONFIG["STT"]["model"]["enum"] if model.startswith("groq:")],
+    },
+    "LLM": {
+        "openai": [model for model in CONFIG["LLM"]["model"]["enum"] if model.startswith("openai:")],
+        "togetherai": [model for model in CONFIG["LLM"]["model"]["enum"] if model.startswith("togetherai:")],
+    },
+    "TTS": {
+        "azure": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("azure:")],
+        "sarvam": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("sarvam:")],
+        "elevenlabs": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("elevenlabs:")],
+        "cartesia": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("cartesia:")],
+        "groq": [voice for voice in CONFIG["TTS"]["voice"]["enum"] if voice.startswith("groq:")],
+    }
+}
+
+LEGACY_LANGUAGE_MAPPING = {
+    'hi-IN': 'Hindi', 'en-IN': 'English', 'gu-IN': 'Gujarati',
+    'bn-IN': 'Bengali', 'kn-IN': 'Kannada', 'ml-IN': 'Malayalam', 'mr-IN': 'Marathi',
+    'od-IN': 'Odia', 'pa-IN': 'Punjabi', 'ta-IN': 'Tamil', 'te-IN': 'Telugu'
+}
+
+
+def legacy_models(component, language, provider):
+    if component == "STT":
+        return LEGACY_PROVIDER_MODEL_MAPPING[component][provider]
+    all_voices = LEGACY_PROVIDER_MODEL_MAPPING[component][provider]
+    if provider in ("azure", "elevenlabs", "cartesia"):
+        short = language.split("-")[0]
+        pattern = re.compile(rf"^{provider}:{short}(-|_)")
+        return [v for v in all_voices if pattern.search(v)]
+    return all_voices
+
+
+def legacy_providers(component, language):
+    return [p for p in CONFIG[component]["provider"]["enum"] if language in CONFIG[component]["language"][p]]
+
+
+def legacy_languages(component):
+    languages = set()
+    for provider in CONFIG[component]["provider"]["enum"]:
+        languages.update(CONFIG[component]["language"][provider])
+    return sorted(languages)
+
+
+def legacy_label(component, name, tts_provider=None):
+    cost = costs_per_min[component].get(tts_provider if component == "TTS" else name, None)
+    return f"{catalog.beautify_name(name)} - [{'$'+str(cost)+'/min' if cost is not None else 'Cost N/A'}]"
+
+
+def test_tables_match_the_inline_dicts():
+    assert {c: {p: list(m) for p, m in providers.items()} for c, providers in catalog.PROVIDER_MODEL_MAPPING.items()} \
+        == LEGACY_PROVIDER_MODEL_MAPPING
+    assert dict(catalog.LANGUAGE_MAPPING) == LEGACY_LANGUAGE_MAPPING
+    for component in ("STT", "TTS"):
+        assert list(catalog.LANGUAGES[component]) == legacy_languages(component)
+
+
+@pytest.mark.parametrize("component", ["STT", "TTS"])
+def test_lookups_match_the_per_rerun_functions(component):
+    for language in set(legacy_languages(component)) | set(LEGACY_LANGUAGE_MAPPING):
+        assert list(catalog.get_providers_for_language(component, language)) == legacy_providers(component, language)
+        for provider in CONFIG[component]["provider"]["enum"]:
+            assert list(catalog.get_models_for_language_provider(component, language, provider)) \
+                == legacy_models(component, language, provider)
+
+
+def test_unknown_language_falls_back_to_computing_the_models():
+    assert catalog.get_models_for_language_provider("TTS", "xx-XX", "azure") == ()
+    assert list(catalog.get_models_for_language_provider("TTS", "xx-XX", "sarvam")) \
+        == LEGACY_PROVIDER_MODEL_MAPPING["TTS"]["sarvam"]
+    assert catalog.get_providers_for_language("STT", "xx-XX") == ()
+
+
+def test_labels_match_the_format_functions():
+    for component in ("STT", "LLM"):
+        for name in CONFIG[component]["model"]["enum"]:
+            assert catalog.format_option(component, name) == legacy_label(component, name)
+    for voice in CONFIG["TTS"]["voice"]["enum"]:
+        assert catalog.format_option("TTS", voice) == legacy_label("TTS", voice, voice.split(":", 1)[0])
+
+
+def test_defaults_match_the_first_session_state():
+    stt_lang = legacy_languages("STT")[0]
+    stt_provider = legacy_providers("STT", stt_lang)[0]
+    tts_lang = legacy_languages("TTS")[0]
+    tts_provider = legacy_providers("TTS", tts_lang)[0]
+    assert dict(catalog.DEFAULT_VALUES) == {
+        "stt_language_select": stt_lang,
+        "stt_provider": stt_provider,
+        "stt_provider_select": stt_provider,
+        "stt_model_select": LEGACY_PROVIDER_MODEL_MAPPING["STT"][stt_provider][0],
+        "tts_language_select": tts_lang,
+        "tts_provider": tts_provider,
+        "tts_provider_select": tts_provider,
+        "tts_voice_select": legacy_models("TTS", tts_lang, tts_provider)[0],
+    }
+
+
+def test_tables_are_read_only():
+    assert isinstance(catalog.PROVIDER_MODEL_MAPPING["STT"], MappingProxyType)
+    with pytest.raises(TypeError):
+        catalog.PROVIDER_MODEL_MAPPING["STT"]["azure"] = []
+    with pytest.raises(TypeError):
+        catalog.LANGUAGE_MAPPING["xx-XX"] = "Unknown"
+    assert isinstance(catalog.get_models_for_language_provider("STT", "hi-IN", "sarvam"), tuple)
@@ -0,0 +1,66 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from catalog import LANGUAGES, cost_per_min, get_models_for_language_provider, get_providers_for_language
+from config import CONFIG
+from costs import CostEngine, project_campaign_cost
+
+
+def _brute_force(stt_language, tts_language, max_cost=None, llm_provider=None):
+    combos = []
+    for stt_provider in get_providers_for_language("STT", stt_language):
+        for stt_model in get_models_for_language_provider("STT", stt_language, stt_provider):
+            for llm_model in CONFIG["LLM"]["model"]["enum"]:
+                if llm_provider and not llm_model.startswith(f"{llm_provider}:"):
+                    continue
+                for tts_provider in get_providers_for_language("TTS", tts_language):
+                    if not get_models_for_language_provider("TTS", tts_language, tts_provider):
+                        continue
+                    costs = [cost_per_min("STT", stt_model), cost_per_min("LLM", llm_model),
+                             cost_per_min("TTS", f"{tts_provider}:")]
+                    if None in costs or (max_cost is not None and sum(costs) > max_cost):
+                        continue
+                    combos.append((sum(costs), stt_model, llm_model, tts_provider))
+    return sorted(combos)
+
+
+@pytest.mark.parametrize("stt_language,tts_language", [("hi-IN", "hi-IN"), ("en-IN", "ta-IN")])
+def test_cheapest_matches_exhaustive_search(stt_language, tts_language):
+    engine = CostEngine()
+    expected = _brute_force(stt_language, tts_language)
+
+    result = engine.cheapest(stt_language, tts_language, n=len(expected) + 10)
+
+    assert len(result) == len(expected)
+    assert [c.cost_per_min for c in result] == pytest.approx([e[0] for e in expected])
+    assert {(c.stt_model, c.llm_model, c.tts_provider) for c in result} == {e[1:] for e in expected}
+
+
+def test_cheapest_respects_provider_and_price_ceiling():
+    engine = CostEngine()
+    expected = _brute_force("hi-IN", "hi-IN", max_cost=0.04, llm_provider="openai")
+
+    result = engine.cheapest("hi-IN", n=5, max_cost=0.04, llm_provider="openai")
+
+    assert [c.cost_per_min for c in result] == pytest.approx([e[0] for e in expected[:5]])
+    assert all(c.llm_model.startswith("openai:") and c.cost_per_min <= 0.04 for c in result)
+    assert all(c.tts_voices for c in result)
+
+
+def test_every_language_prices_without_errors():
+    engine = CostEngine()
+    for stt_language, tts_language in itertools.product(LANGUAGES["STT"], LANGUAGES["TTS"]):
+        totals = engine.price_matrix(stt_language, tts_language)
+        assert totals.shape == (len(engine.stt.names), len(engine.llm.names), len(engine.tts.names))
+
+
+def test_campaign_projection_scales_with_price_and_bills_whole_minutes():
+    projection = project_campaign_cost([0.01, 0.02], calls=2500, durations=[0.5, 1.2], round_up=True,
+                                       simulations=200, seed=1)
+
+    # Every call bills 1 or 2 minutes
+    assert np.all((projection["p50"] >= [25, 50]) & (projection["p50"] <= [50, 100]))
+    assert projection["mean"][1] == pytest.approx(2 * projection["mean"][0])
+    assert projection["p50"][0] <= projection["p90"][0] <= projection["p99"][0]
@@ -0,0 +1,138 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+from bench_dispatch import run_benchmark
+from dispatch_client import CliDispatchBackend, DispatchClient, HttpDispatchBackend, create_access_token
+from dispatch_stub import DispatchStubServer
+from fake_lk import install_fake_lk
+from metrics import CALL_SETUP_DUPLICATES
+
+
+@pytest.fixture
+def stub():
+    with DispatchStubServer() as server:
+        yield server
+
+
+def _decode(segment):
+    return json.loads(base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4)))
+
+
+def test_access_token_is_signed_room_admin_jwt():
+    token = create_access_token("devkey", "secret", "room-1")
+    header, claims, signature = token.split(".")
+    expected = hmac.new(b"secret", f"{header}.{claims}".encode(), hashlib.sha256).digest()
+    assert base64.urlsafe_b64encode(expected).rstrip(b"=").decode() == signature
+    assert _decode(header)["alg"] == "HS256"
+    assert _decode(claims)["iss"] == "devkey"
+    assert _decode(claims)["video"] == {"roomAdmin": True, "room": "room-1"}
+
+
+def test_http_dispatch_reuses_one_connection(stub):
+    backend = HttpDispatchBackend(stub.url, "devkey", "secret")
+    for i in range(20):
+        success, output, error = backend.create_dispatch(f"call-{i}")
+        assert success, error
+        assert json.loads(output)["metadata"] == f"call-{i}"
+    backend.close()
+
+    assert [d["metadata"] for d in stub.dispatches] == [f"call-{i}" for i in range(20)]
+    assert len(stub.connections) == 1
+
+
+def test_http_error_is_reported_without_fallback(stub):
+    stub.failure_rate = 1.0
+    cli = CliDispatchBackend(executable="lk-that-does-not-exist")
+    client = DispatchClient(HttpDispatchBackend(stub.url, "devkey", "secret"), cli)
+
+    success, output, error = client.create_dispatch("call-1")
+    assert not success
+    assert error.startswith("HTTP 503")
+
+
+def test_unreachable_api_falls_back_to_next_backend(stub):
+    calls = []
+
+    class RecordingBackend:
+        name = "recording"
+
+        def create_dispatch(self, data_id):
+            calls.append(data_id)
+            return True, "ok", None
+
+        def close(self):
+            pass
+
+    url = stub.url
+    stub.stop()
+    client = DispatchClient(HttpDispatchBackend(url, "devkey", "secret", timeout=1.0), RecordingBackend())
+    assert client.create_dispatch("call-1") == (True, "ok", None)
+    assert calls == ["call-1"]
+
+
+def test_request_that_may_have_reached_livekit_is_not_sent_again_elsewhere(stub):
+    calls = []
+
+    class RecordingBackend:
+        name = "recording"
+
+        def create_dispatch(self, data_id):
+            calls.append(data_id)
+            return True, "ok", None
+
+    stub.latency = 1.0
+    client = DispatchClient(HttpDispatchBackend(stub.url, "devkey", "secret", timeout=0.2), RecordingBackend())
+
+    success, _, error = client.create_dispatch("call-1")
+    assert not success and error.startswith("http dispatch failed")
+    assert calls == []
+
+
+def test_hung_lk_is_killed_and_reported_failed(tmp_path):
+    hung = tmp_path / "lk"
+    hung.write_text("#!/bin/sh\nsleep 30\n")
+    hung.chmod(0o755)
+
+    started = time.monotonic()
+    success, _, error = CliDispatchBackend(executable=str(hung), timeout=0.2).create_dispatch("call-1")
+
+    assert not success and "timed out" in error
+    assert time.monotonic() - started < 5
+
+
+@pytest.fixture
+def redis_url(redis_client):
+    kwargs = redis_client.connection_pool.connection_kwargs
+    return f"redis://{kwargs['host']}:{kwargs['port']}/0"
+
+
+def test_fake_lk_only_dispatches_stored_calls(tmp_path, redis_client, redis_url, key_prefix):
+    backend = CliDispatchBackend(executable=install_fake_lk(str(tmp_path), redis_url=redis_url))
+    data_id = f"{key_prefix}-call"
+
+    success, _, error = backend.create_dispatch(data_id)
+    assert not success and "no metadata stored" in error
+
+    redis_client.set(data_id, "{}")
+    success, output, _ = backend.create_dispatch(data_id)
+    assert success
+    assert json.loads(output.split(": ", 1)[1])["metadata"] == data_id
+
+
+def test_dispatch_benchmark_reports_percentiles(redis_url):
+    duplicates = sum(CALL_SETUP_DUPLICATES.samples().values())
+    report = run_benchmark(redis_url, backend="http", calls=20, concurrency=(1, 4))
+
+    assert [run["concurrency"] for run in report["runs"]] == [1, 4]
+    for run in report["runs"]:
+        assert run["succeeded"] == 20
+        latency = run["latency_ms"]
+        assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    # Every level dispatched its own calls rather than answering from the dedup window
+    assert sum(CALL_SETUP_DUPLICATES.samples().values()) == duplicates
+    json.dumps(report)
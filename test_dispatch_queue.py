@@ -0,0 +1,151 @@
+import functools
+import json
+import threading
+import time
+
+import pytest
+
+from call_status import status_key
+from calls import initiate_call_with_retry
+from dispatch_queue import Dispatcher, dispatched_key, enqueue_call, enqueue_calls, queue_status
+from idempotency import call_fingerprint, claim_key
+
+
+class FakeSetup:
+    """Stands in for ``initiate_call_with_retry``, recording which calls were set up."""
+
+    def __init__(self, fail=(), delay=0.0):
+        self.fail = set(fail)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def __call__(self, redis_client, phone_number, metadata, on_dispatched=None, campaign=None, data_id=None,
+                 operator=None):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls.append((threading.current_thread().name, phone_number, data_id, campaign))
+        if phone_number in self.fail:
+            return False, None, "HTTP 400: bad request"
+        on_dispatched(data_id)
+        return True, "ok", None
+
+
+@pytest.fixture
+def queue(redis_client, key_prefix):
+    names = {"stream": f"{key_prefix}-queue", "status_stream": f"{key_prefix}-status"}
+    data_ids = []
+    yield names, data_ids
+    for data_id in data_ids:
+        redis_client.delete(status_key(data_id), dispatched_key(data_id))
+
+
+def _status(redis_client, data_id):
+    stored = redis_client.get(status_key(data_id))
+    return json.loads(stored) if stored else None
+
+
+def _wait_for(condition):
+    deadline = time.time() + 5
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_workers_share_the_queue_and_each_call_is_set_up_once(redis_client, queue):
+    names, data_ids = queue
+    phones = [f"+9190000000{i:02d}" for i in range(40)]
+    data_ids += enqueue_calls(redis_client, [(phone, {"phone_number": phone}) for phone in phones],
+                              campaign="renewals", **names)
+    assert {_status(redis_client, d)["status"] for d in data_ids} == {"queued"}
+
+    setup = FakeSetup(fail={phones[0]}, delay=0.01)
+    workers = [Dispatcher(redis_client, f"worker-{i}", concurrency=4, block_ms=50, dispatch=setup,
+                          stream=names["stream"], status_stream=names["status_stream"]) for i in range(2)]
+    for worker in workers:
+        worker.ensure_group()
+    threads = [threading.Thread(target=worker.run) for worker in workers]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: all(_status(redis_client, d)["status"] != "queued" for d in data_ids))
+    for worker, thread in zip(workers, threads):
+        worker.stop()
+        thread.join()
+
+    assert sorted(data_id for _, _, data_id, _ in setup.calls) == sorted(data_ids)
+    assert {campaign for _, _, _, campaign in setup.calls} == {"renewals"}
+    assert _status(redis_client, data_ids[0]) | {"ts": None} == {
+        "data_id": data_ids[0], "status": "failed", "detail": "HTTP 400: bad request", "ts": None}
+    assert {_status(redis_client, d)["status"] for d in data_ids[1:]} == {"dispatched"}
+    status = queue_status(redis_client, names["stream"])
+    assert (status["length"], status["pending"], sorted(status["consumers"])) == (0, 0, ["worker-0", "worker-1"])
+
+
+def test_calls_abandoned_by_a_dead_worker_are_reclaimed(redis_client, queue):
+    names, data_ids = queue
+    data_ids.append(enqueue_call(redis_client, "+919000000001", {}, **names))
+    dead = Dispatcher(redis_client, "dead", stream=names["stream"]).ensure_group()
+    # The dead worker read the call but never acknowledged it
+    redis_client.xreadgroup(dead.group, dead.consumer, {names["stream"]: ">"}, count=1)
+
+    setup = FakeSetup()
+    worker = Dispatcher(redis_client, "alive", block_ms=10, claim_idle_ms=50, dispatch=setup,
+                        stream=names["stream"], status_stream=names["status_stream"])
+    assert worker.poll() == 0
+    time.sleep(0.1)
+    assert worker.poll() == 1
+    _wait_for(lambda: _status(redis_client, data_ids[0])["status"] == "dispatched")
+
+    assert [data_id for _, _, data_id, _ in setup.calls] == data_ids
+    assert queue_status(redis_client, names["stream"])["pending"] == 0
+
+
+def test_calls_dispatched_by_a_worker_that_died_before_acking_are_not_dialed_again(redis_client, queue,
+                                                                                  call_metadata):
+    class DiesBeforeAck(Dispatcher):
+        def _finish(self, entry_id, data_id, status, detail):
+            raise RuntimeError("worker killed")
+
+    class CountingDispatcher:
+        data_ids = []
+
+        def create_dispatch(self, data_id):
+            self.data_ids.append(data_id)
+            return True, "ok", None
+
+    names, data_ids = queue
+    phone = "+919000000003"
+    metadata = dict(call_metadata, phone_number=phone)
+    data_ids.append(enqueue_call(redis_client, phone, metadata, **names))
+    setup = functools.partial(initiate_call_with_retry, dispatcher=CountingDispatcher())
+    dead = DiesBeforeAck(redis_client, "dead", block_ms=10, dispatch=setup, stream=names["stream"],
+                         status_stream=names["status_stream"]).ensure_group()
+    assert dead.poll() == 1
+    dead._pool.shutdown(wait=True)
+    # Reclaimed only after the dedup claim has expired
+    redis_client.delete(claim_key(call_fingerprint(phone, metadata)))
+
+    worker = Dispatcher(redis_client, "alive", block_ms=10, claim_idle_ms=0, dispatch=setup,
+                        stream=names["stream"], status_stream=names["status_stream"])
+    assert worker.poll() == 1
+    _wait_for(lambda: _status(redis_client, data_ids[0])["status"] == "dispatched")
+
+    assert CountingDispatcher.data_ids == data_ids
+    assert queue_status(redis_client, names["stream"])["pending"] == 0
+    for key in redis_client.scan_iter(f"call-{phone}-*"):
+        redis_client.delete(key)
+
+
+def test_calls_delivered_too_often_are_given_up(redis_client, queue):
+    names, data_ids = queue
+    data_ids.append(enqueue_call(redis_client, "+919000000002", {}, **names))
+    setup = FakeSetup()
+    worker = Dispatcher(redis_client, "worker", block_ms=10, claim_idle_ms=0, max_deliveries=1, dispatch=setup,
+                        stream=names["stream"], status_stream=names["status_stream"]).ensure_group()
+    redis_client.xreadgroup(worker.group, "crashed", {names["stream"]: ">"}, count=1)
+
+    assert worker.poll() == 0
+
+    assert setup.calls == []
+    assert _status(redis_client, data_ids[0])["detail"] == "Gave up after 2 deliveries"
+    assert queue_status(redis_client, names["stream"])["length"] == 0
@@ -0,0 +1,190 @@
+import json
+import threading
+
+import pytest
+import redis
+
+from calls import initiate_call_with_retry
+from idempotency import DispatchClaims, call_fingerprint, claim_key
+from metadata_store import digest_key
+from resilience import RetryPolicy
+
+
+class Dispatcher:
+    def __init__(self, failures=0, error="HTTP 503: unavailable"):
+        self.failures = failures
+        self.error = error
+        self.data_ids = []
+
+    def create_dispatch(self, data_id):
+        self.data_ids.append(data_id)
+        if len(self.data_ids) <= self.failures:
+            return False, None, self.error
+        return True, f"dispatched {data_id}", None
+
+
+@pytest.fixture
+def phone(redis_client, key_prefix):
+    """A phone number unique to the test, whose call keys are removed afterwards."""
+    number = f"+91{abs(hash(key_prefix)) % 10**10:010d}"
+    yield number
+    for key in redis_client.scan_iter(f"call-{number}-*"):
+        redis_client.delete(key)
+
+
+@pytest.fixture
+def metadata(phone, call_metadata):
+    return dict(call_metadata, phone_number=phone)
+
+
+def _no_sleep_policy():
+    return RetryPolicy(max_attempts=5, sleep=lambda seconds: None)
+
+
+def test_fingerprint_ignores_key_order():
+    assert call_fingerprint("+911234567890", {"a": 1, "b": 2}) == call_fingerprint("+911234567890", {"b": 2, "a": 1})
+    assert call_fingerprint("+911234567890", {"a": 1}) != call_fingerprint("+911234567891", {"a": 1})
+    assert call_fingerprint("+911234567890", {"a": 1}) != call_fingerprint("+911234567890", {"a": 2})
+
+
+def test_duplicate_submits_return_the_existing_dispatch(redis_client, phone, metadata):
+    dispatcher = Dispatcher()
+    dispatched = []
+
+    first = initiate_call_with_retry(redis_client, phone, metadata, dispatcher=dispatcher,
+                                     on_dispatched=dispatched.append)
+    second = initiate_call_with_retry(redis_client, phone, dict(reversed(metadata.items())), dispatcher=dispatcher,
+                                      on_dispatched=dispatched.append)
+
+    assert first == second and first[0]
+    assert len(dispatcher.data_ids) == 1
+    assert dispatched == dispatcher.data_ids * 2
+
+
+def test_concurrent_submits_dial_once(redis_client, phone, metadata):
+    dispatcher = Dispatcher()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def submit():
+        barrier.wait()
+        results.append(initiate_call_with_retry(redis_client, phone, metadata, dispatcher=dispatcher))
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(dispatcher.data_ids) == 1
+    assert len(results) == 8
+    # Submits racing the first one are refused while it is in flight, later ones get its result
+    assert all(r[0] or r[2] == "An identical call is already being set up" for r in results)
+
+
+def test_retries_reuse_one_data_id(redis_client, phone, metadata):
+    dispatcher = Dispatcher(failures=2)
+
+    success, output, _ = initiate_call_with_retry(redis_client, phone, metadata, dispatcher=dispatcher,
+                                                  policy=_no_sleep_policy())
+
+    assert success and len(dispatcher.data_ids) == 3
+    assert len(set(dispatcher.data_ids)) == 1
+    assert output == f"dispatched {dispatcher.data_ids[0]}"
+    assert redis_client.exists(dispatcher.data_ids[0])
+
+
+def test_failed_call_leaves_no_keys_and_can_be_retried(redis_client, phone, metadata):
+    dispatcher = Dispatcher(failures=1, error="HTTP 400: bad request")
+
+    success, _, error = initiate_call_with_retry(redis_client, phone, metadata, dispatcher=dispatcher,
+                                                 policy=_no_sleep_policy())
+    assert not success and error == "HTTP 400: bad request"
+    data_id = dispatcher.data_ids[0]
+    assert not redis_client.exists(data_id, digest_key(data_id), claim_key(call_fingerprint(phone, metadata)))
+
+    success, _, _ = initiate_call_with_retry(redis_client, phone, metadata, dispatcher=dispatcher,
+                                             policy=_no_sleep_policy())
+    assert success and len(dispatcher.data_ids) == 2
+
+
+def test_only_the_owner_can_update_a_claim(redis_client, key_prefix):
+    claims = DispatchClaims(redis_client, window=30)
+    fingerprint = f"{key_prefix}-fp"
+    try:
+        assert claims.claim(fingerprint, "call-a") is None
+        assert claims.claim(fingerprint, "call-b") == {"data_id": "call-a", "status": "pending"}
+        assert not claims.release(fingerprint, "call-b")
+        assert not claims.mark_dispatched(fingerprint, "call-b", "out")
+
+        assert claims.mark_dispatched(fingerprint, "call-a", "out")
+        assert claims.claim(fingerprint, "call-b")["status"] == "dispatched"
+        assert 0 < redis_client.ttl(claim_key(fingerprint)) <= 30
+    finally:
+        redis_client.delete(claim_key(fingerprint))
+
+
+def test_pending_claim_is_extended_and_taken_back_by_its_owner(redis_client, key_prefix):
+    claims = DispatchClaims(redis_client, window=30, hold=60)
+    fingerprint = f"{key_prefix}-fp"
+    try:
+        assert claims.claim(fingerprint, "call-a") is None
+        redis_client.expire(claim_key(fingerprint), 1)
+        assert claims.extend(fingerprint, "call-a")
+        assert 30 < redis_client.ttl(claim_key(fingerprint)) <= 60
+
+        redis_client.delete(claim_key(fingerprint))
+        assert claims.extend(fingerprint, "call-a")
+        assert claims.claim(fingerprint, "call-b") == {"data_id": "call-a", "status": "pending"}
+
+        redis_client.delete(claim_key(fingerprint))
+        assert claims.claim(fingerprint, "call-b") is None
+        assert not claims.extend(fingerprint, "call-a")
+    finally:
+        redis_client.delete(claim_key(fingerprint))
+
+
+def test_call_whose_claim_was_taken_over_is_not_dialed(redis_client, phone, metadata):
+    class TakenOverLimiter:
+        def acquire(self, data_id, operator=None, max_wait=None, breaker=None):
+            # Another request claims the call while this one waits for a slot
+            key = claim_key(call_fingerprint(phone, metadata))
+            redis_client.set(key, json.dumps({"data_id": "call-other", "status": "pending"}))
+            return 0.0
+
+        def release(self, data_id):
+            pass
+
+    dispatcher = Dispatcher()
+    try:
+        success, _, error = initiate_call_with_retry(redis_client, phone, metadata, dispatcher=dispatcher,
+                                                     limiter=TakenOverLimiter(), policy=_no_sleep_policy())
+        assert not success and error == "An identical call is already being set up"
+        assert dispatcher.data_ids == []
+    finally:
+        redis_client.delete(claim_key(call_fingerprint(phone, metadata)))
+
+
+def test_failed_call_cleanups_run_even_if_one_fails(redis_client, phone, metadata, monkeypatch):
+    released = []
+
+    class Limiter:
+        def acquire(self, data_id, operator=None, max_wait=None, breaker=None):
+            return 0.0
+
+        def release(self, data_id):
+            released.append(data_id)
+
+    def lost_connection(self, fingerprint, data_id):
+        raise redis.ConnectionError("connection reset")
+
+    monkeypatch.setattr(DispatchClaims, "release", lost_connection)
+    dispatcher = Dispatcher(failures=1, error="HTTP 400: bad request")
+
+    success, _, _ = initiate_call_with_retry(redis_client, phone, metadata, dispatcher=dispatcher, limiter=Limiter(),
+                                             policy=_no_sleep_policy())
+
+    data_id = dispatcher.data_ids[0]
+    assert not success and released == [data_id]
+    assert not redis_client.exists(data_id, digest_key(data_id))
+    redis_client.delete(claim_key(call_fingerprint(phone, metadata)))
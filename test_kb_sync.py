@@ -0,0 +1,180 @@
+import io
+import itertools
+import tarfile
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from kb_sync import (KnowledgeBaseSync, extract_archive, iter_directory, load_manifest, manifest_key, plan_sync,
+                     source_root, start_sync, upload_entries)
+
+
+class NotFound(Exception):
+    status = 404
+
+
+class SyncingAssistant:
+    def __init__(self):
+        self.files = {}
+        self.uploads = []
+        self.deletes = []
+        self._ids = itertools.count(1)
+
+    def list_files(self):
+        return list(self.files.values())
+
+    def upload_file(self, file_path, timeout=None, metadata=None):
+        file = SimpleNamespace(id=f"file-{next(self._ids)}", name=metadata["source_path"], status="Available")
+        self.files[file.id] = file
+        self.uploads.append(metadata["source_path"])
+        return file
+
+    def describe_file(self, file_id):
+        return self.files[file_id]
+
+    def delete_file(self, file_id, timeout=None):
+        if file_id not in self.files:
+            raise NotFound(file_id)
+        del self.files[file_id]
+        self.deletes.append(file_id)
+
+
+@pytest.fixture
+def assistant_name(redis_client, key_prefix):
+    yield key_prefix
+    keys = list(redis_client.scan_iter(f"{manifest_key(key_prefix)}*"))
+    if keys:
+        redis_client.delete(*keys)
+
+
+def _sync(assistant, redis_client, root, assistant_name, delete_missing=True):
+    sync = start_sync(assistant, redis_client, iter_directory(root), assistant_name, root=source_root(str(root)),
+                      delete_missing=delete_missing, poll_interval=0.01)
+    deadline = time.time() + 5
+    while not sync.done and time.time() < deadline:
+        time.sleep(0.01)
+    assert sync.done and not sync.errors
+    return sync
+
+
+def test_resync_only_uploads_changed_files(tmp_path, redis_client, assistant_name):
+    docs = tmp_path / "docs"
+    (docs / "policies").mkdir(parents=True)
+    for i in range(20):
+        (docs / "policies" / f"doc-{i}.txt").write_text(f"policy {i}")
+    (docs / "notes.bin").write_text("not a document")
+    assistant = SyncingAssistant()
+
+    _sync(assistant, redis_client, docs, assistant_name)
+    assert len(assistant.uploads) == 20
+    manifest = load_manifest(redis_client, assistant_name, "docs")
+    old_ids = {path: entry["file_id"] for path, entry in manifest.items()}
+
+    assistant.uploads.clear()
+    (docs / "policies" / "doc-1.txt").write_text("policy 1, revised")
+    (docs / "policies" / "doc-2.txt").write_text("policy 2, revised")
+    (docs / "policies" / "doc-3.txt").unlink()
+    (docs / "faq.md").write_text("# FAQ")
+    sync = _sync(assistant, redis_client, docs, assistant_name)
+
+    assert sorted(assistant.uploads) == ["faq.md", "policies/doc-1.txt", "policies/doc-2.txt"]
+    assert len(sync.plan.unchanged) == 17
+    assert sorted(assistant.deletes) == sorted(old_ids[f"policies/doc-{i}.txt"] for i in (1, 2, 3))
+    manifest = load_manifest(redis_client, assistant_name, "docs")
+    assert "policies/doc-3.txt" not in manifest
+    assert set(manifest) == {entry.name for entry in assistant.files.values()}
+
+
+def test_files_missing_from_assistant_are_reuploaded(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    manifest = {"a.txt": {"sha256": "stale", "file_id": "gone"}}
+    plan = plan_sync(iter_directory(tmp_path), manifest, live_file_ids=set())
+    assert [rel_path for rel_path, _, _ in plan.upload] == ["a.txt"]
+    assert plan.replaces == {}
+
+
+def test_syncing_another_folder_keeps_earlier_documents(tmp_path, redis_client, assistant_name):
+    for folder in ("hr", "sales"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "guide.txt").write_text(f"{folder} guide")
+    assistant = SyncingAssistant()
+
+    _sync(assistant, redis_client, tmp_path / "hr", assistant_name)
+    sync = _sync(assistant, redis_client, tmp_path / "sales", assistant_name)
+
+    assert sync.plan.delete == [] and assistant.deletes == []
+    assert len(assistant.files) == 2
+    assert set(load_manifest(redis_client, assistant_name, "hr")) == {"guide.txt"}
+
+
+def test_removed_files_are_kept_unless_deletion_is_requested(tmp_path, redis_client, assistant_name):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("a")
+    (docs / "b.txt").write_text("b")
+    assistant = SyncingAssistant()
+    _sync(assistant, redis_client, docs, assistant_name)
+    (docs / "b.txt").unlink()
+
+    _sync(assistant, redis_client, docs, assistant_name, delete_missing=False)
+    assert assistant.deletes == []
+    _sync(assistant, redis_client, docs, assistant_name)
+    assert len(assistant.deletes) == 1
+    assert set(load_manifest(redis_client, assistant_name, "docs")) == {"a.txt"}
+
+
+def test_entries_deleted_outside_the_sync_are_dropped(tmp_path, redis_client, assistant_name):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.txt").write_text("a")
+    (docs / "b.txt").write_text("b")
+    assistant = SyncingAssistant()
+    _sync(assistant, redis_client, docs, assistant_name)
+    assistant.files.clear()
+    (docs / "b.txt").unlink()
+
+    sync = _sync(assistant, redis_client, docs, assistant_name)
+    assert sync.plan.forget == ["b.txt"] and sync.plan.delete == []
+    assert set(load_manifest(redis_client, assistant_name, "docs")) == {"a.txt"}
+    assert _sync(assistant, redis_client, docs, assistant_name).plan.forget == []
+
+
+def test_delete_of_already_removed_file_drops_the_entry(redis_client, assistant_name):
+    assistant = SyncingAssistant()
+    redis_client.hset(manifest_key(assistant_name, "docs"), "a.txt", '{"sha256": "x", "file_id": "gone"}')
+    plan = plan_sync([], load_manifest(redis_client, assistant_name, "docs"), live_file_ids={"gone"})
+
+    sync = _sync_plan(assistant, redis_client, plan, assistant_name)
+    assert not sync.errors
+    assert load_manifest(redis_client, assistant_name, "docs") == {}
+
+
+def _sync_plan(assistant, redis_client, plan, assistant_name):
+    sync = KnowledgeBaseSync(assistant, redis_client, plan, assistant_name, root="docs", poll_interval=0.01).start()
+    deadline = time.time() + 5
+    while not sync.done and time.time() < deadline:
+        time.sleep(0.01)
+    assert sync.done
+    return sync
+
+
+def test_upload_entries_are_keyed_by_path_inside_the_folder():
+    files = [SimpleNamespace(name=name) for name in ("docs/hr/faq.md", "docs/sales/faq.md", "docs\\intro.txt")]
+    root, entries = upload_entries(files)
+    assert root == "docs"
+    assert [rel_path for rel_path, _ in entries] == ["hr/faq.md", "sales/faq.md", "intro.txt"]
+    assert upload_entries([SimpleNamespace(name="faq.md")]) == ("", [("faq.md", SimpleNamespace(name="faq.md"))])
+
+
+def test_archive_members_cannot_escape_destination(tmp_path):
+    archive = tmp_path / "docs.tar"
+    with tarfile.open(archive, "w") as tf:
+        data = b"escape"
+        info = tarfile.TarInfo("../evil.txt")
+        info.size = len(data)
+        tf.addfile(info, io.BytesIO(data))
+
+    with pytest.raises(ValueError):
+        extract_archive(str(archive), tmp_path / "out")
+    assert not (tmp_path / "evil.txt").exists()
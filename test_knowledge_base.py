@@ -0,0 +1,144 @@
+import io
+import os
+import time
+from types import SimpleNamespace
+
+from knowledge_base import CHUNK_SIZE, FileListCache, UploadJob, UploadPipeline, jobs_from_uploads
+
+
+class FakeAssistant:
+    def __init__(self, files):
+        self.files = files
+        self.list_calls = 0
+
+    def list_files(self):
+        self.list_calls += 1
+        return list(self.files)
+
+
+def _file(file_id, status="Available"):
+    return SimpleNamespace(id=file_id, name=f"{file_id}.pdf", status=status)
+
+
+def test_file_list_is_served_from_cache_until_ttl():
+    now = [0.0]
+    assistant = FakeAssistant([_file("a")])
+    cache = FileListCache(assistant, ttl=30, clock=lambda: now[0])
+
+    assert [f.id for f in cache.get()] == ["a"]
+    cache.get()
+    assert assistant.list_calls == 1
+
+    now[0] = 31.0
+    cache.get()
+    assert assistant.list_calls == 2
+
+
+def test_upload_and_delete_patch_the_cached_list():
+    assistant = FakeAssistant([_file("a"), _file("b")])
+    cache = FileListCache(assistant)
+    cache.get()
+
+    cache.add(_file("c"))
+    cache.remove("a")
+
+    assert [f.id for f in cache.get()] == ["b", "c"]
+    assert assistant.list_calls == 1
+
+
+def test_pending_files_are_refreshed_in_background():
+    assistant = FakeAssistant([_file("a", status="Processing")])
+    cache = FileListCache(assistant, pending_refresh_interval=0.01)
+    cache.get()
+
+    assistant.files = [_file("a")]
+    deadline = time.time() + 2
+    while cache.get()[0].status != "Available" and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert cache.get()[0].status == "Available"
+
+
+class UploadingAssistant(FakeAssistant):
+    def __init__(self, fail_first=()):
+        super().__init__([])
+        self.fail_first = set(fail_first)
+        self.described = {}
+
+    def upload_file(self, file_path, timeout=None):
+        name = os.path.basename(file_path)
+        if name in self.fail_first:
+            self.fail_first.discard(name)
+            raise ConnectionError("upload interrupted")
+        file = _file(f"id-{name}", status="Processing")
+        self.described[file.id] = 0
+        return file
+
+    def describe_file(self, file_id):
+        self.described[file_id] += 1
+        return _file(file_id, status="Available" if self.described[file_id] >= 2 else "Processing")
+
+
+def _stage(tmp_path, names):
+    jobs = []
+    for name in names:
+        path = tmp_path / name
+        path.write_text(f"contents of {name}")
+        jobs.append(UploadJob(name=name, path=str(path)))
+    return jobs
+
+
+def _wait(pipeline):
+    deadline = time.time() + 5
+    while not pipeline.done and time.time() < deadline:
+        time.sleep(0.01)
+    assert pipeline.done
+
+
+def test_upload_pipeline_retries_and_waits_for_processing(tmp_path):
+    assistant = UploadingAssistant(fail_first={"b.txt"})
+    seen = []
+    jobs = _stage(tmp_path, ["a.txt", "b.txt", "c.txt"])
+    pipeline = UploadPipeline(assistant, jobs, max_workers=2, retry_backoff=0, poll_interval=0.01,
+                              on_file=seen.append).start()
+    _wait(pipeline)
+
+    assert [job.status for job in jobs] == ["available"] * 3
+    assert [job.attempts for job in jobs] == [1, 2, 1]
+    assert pipeline.progress == 1.0
+    assert {f.id for f in seen if f.status == "Available"} == {"id-a.txt", "id-b.txt", "id-c.txt"}
+
+
+def test_streams_are_spooled_when_sdk_only_uploads_paths():
+    uploaded = []
+
+    class PathOnlyAssistant(UploadingAssistant):
+        def upload_file(self, file_path, timeout=None):
+            with open(file_path, "rb") as f:
+                uploaded.append(f.read())
+            return super().upload_file(file_path, timeout)
+
+    stream = io.BytesIO(b"x" * (3 * CHUNK_SIZE + 5))
+    stream.name = "folder/big.txt"
+    jobs = jobs_from_uploads([stream])
+    pipeline = UploadPipeline(PathOnlyAssistant(), jobs, poll_interval=0.01).start()
+    _wait(pipeline)
+
+    assert jobs[0].name == "big.txt"
+    assert jobs[0].status == "available"
+    assert uploaded == [stream.getvalue()]
+    assert jobs[0].stream is None
+
+
+def test_upload_pipeline_gives_up_after_max_retries(tmp_path):
+    class FailingAssistant(UploadingAssistant):
+        def upload_file(self, file_path, timeout=None):
+            raise ConnectionError("service unavailable")
+
+    jobs = _stage(tmp_path, ["a.txt"])
+    pipeline = UploadPipeline(FailingAssistant(), jobs, max_retries=3, retry_backoff=0).start()
+    _wait(pipeline)
+
+    assert jobs[0].status == "failed"
+    assert jobs[0].attempts == 3
+    assert "service unavailable" in jobs[0].error
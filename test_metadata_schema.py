@@ -0,0 +1,124 @@
+import pytest
+
+from calls import initiate_call_with_retry
+from campaign import CampaignRow, validate_campaign
+from catalog import (
+    DEFAULT_VALUES,
+    LANGUAGES,
+    PROVIDER_MODEL_MAPPING,
+    get_models_for_language_provider,
+    get_providers_for_language,
+)
+from config import CONFIG
+from idempotency import call_fingerprint, claim_key
+from metadata_schema import (
+    FieldError,
+    InvalidMetadataError,
+    metadata_from_settings,
+    metadata_name,
+    validate_batch,
+    validate_metadata,
+)
+from metrics import CALL_SETUP_FAILURES
+
+
+def _codes(metadata):
+    return {(error.field, error.code) for error in validate_metadata(metadata)}
+
+
+def test_every_config_option_validates_with_a_supported_language(call_metadata):
+    for component, key in (("STT", "model"), ("LLM", "model"), ("TTS", "voice")):
+        for provider, options in PROVIDER_MODEL_MAPPING[component].items():
+            languages = CONFIG[component].get("language", {}).get(provider, [None])
+            for language in languages:
+                for option in get_models_for_language_provider(component, language, provider) if language else options:
+                    metadata = dict(call_metadata, **{f"{component}_provider": provider,
+                                                      f"{component}_{key}": metadata_name(option)})
+                    if language:
+                        metadata[f"{component}_language"] = language
+                    assert validate_metadata(metadata) == [], (component, provider, option, language)
+
+
+def _page_selections():
+    """Every STT, LLM and TTS choice the configuration tabs offer, as session-state changes."""
+    for component, prefix, key in (("STT", "stt", "model"), ("TTS", "tts", "voice")):
+        for language in LANGUAGES[component]:
+            for provider in get_providers_for_language(component, language):
+                for option in get_models_for_language_provider(component, language, provider):
+                    yield {f"{prefix}_language_select": language, f"{prefix}_provider": provider,
+                           f"{prefix}_{key}_select": option}
+    for provider, models in PROVIDER_MODEL_MAPPING["LLM"].items():
+        for model in models:
+            yield {"llm_provider": provider, "llm_model_select": model}
+
+
+def test_every_choice_on_the_page_builds_valid_metadata():
+    defaults = dict(DEFAULT_VALUES, llm_provider="openai", llm_model_select="openai:gpt-4o-mini", first_message="Hi")
+    invalid = {}
+    for selection in _page_selections():
+        errors = validate_metadata(metadata_from_settings(dict(defaults, **selection), "+911234567890"))
+        if errors:
+            invalid[tuple(selection.values())] = errors
+    assert invalid == {}
+
+
+@pytest.mark.parametrize("changes, expected", [
+    ({"STT_model": "nova-2-general"}, {("STT_model", "enum")}),  # a deepgram model for sarvam
+    ({"STT_provider": "deepgram", "STT_model": "nova-2-general", "STT_language": "ta-IN"}, {("STT_language", "enum")}),
+    ({"LLM_provider": "anthropic"}, {("LLM_provider", "enum")}),
+    ({"TTS_language": "en-IN"}, {("TTS_voice", "enum")}),  # a Hindi azure voice on an English call
+    ({"TTS_provider": None}, {("TTS_provider", "required")}),
+    ({"LLM_temperature": 1.5}, {("LLM_temperature", "range")}),
+    ({"LLM_temperature": True}, {("LLM_temperature", "type")}),
+    ({"use_retrieval": "yes"}, {("use_retrieval", "type")}),
+    ({"first_message": ""}, {("first_message", "required")}),
+    ({"phone_number": "12345"}, {("phone_number", "pattern")}),
+    ({"STT_cost_per_min": None, "variables": {"name": "Asha"}}, set()),
+])
+def test_invalid_fields_are_reported_by_name_and_check(call_metadata, changes, expected):
+    assert _codes(dict(call_metadata, **changes)) == expected
+
+
+def test_batches_report_only_invalid_payloads(call_metadata):
+    payloads = [call_metadata] * 1000
+    payloads[3] = dict(call_metadata, LLM_model="gpt-5")
+    payloads[700] = None
+
+    invalid = validate_batch(payloads)
+
+    assert list(invalid) == [3, 700]
+    assert invalid[3] == [FieldError("LLM_model", "enum", "'gpt-5' is not a model of openai")]
+    assert invalid[700][0].code == "type"
+
+
+def test_campaign_rows_with_invalid_metadata_become_row_errors(call_metadata):
+    jobs = [(CampaignRow(2, "+919000000001"), call_metadata),
+            (CampaignRow(3, "+919000000002"), dict(call_metadata, STT_language="xx-IN"))]
+
+    valid, errors = validate_campaign(jobs)
+
+    assert valid == jobs[:1]
+    assert [(e.row_number, e.success) for e in errors] == [(3, False)]
+    assert "STT_language" in errors[0].error
+
+
+def test_invalid_metadata_fails_before_anything_is_claimed_or_dialed(redis_client, call_metadata):
+    class Dispatcher:
+        calls = 0
+
+        def create_dispatch(self, data_id):
+            self.calls += 1
+            return True, "ok", None
+
+    def failures():
+        return CALL_SETUP_FAILURES.samples().get(("_total", (("reason", "invalid_metadata"),)), 0)
+
+    before = failures()
+    dispatcher = Dispatcher()
+    metadata = dict(call_metadata, TTS_voice="en-IN-NeerjaNeural")
+    success, _, error = initiate_call_with_retry(redis_client, "+911234567890", metadata, dispatcher=dispatcher)
+
+    assert not success and dispatcher.calls == 0
+    assert error == str(InvalidMetadataError(validate_metadata(metadata)))
+    assert not redis_client.exists(claim_key(call_fingerprint("+911234567890", metadata)))
+    assert failures() == before + 1
@@ -0,0 +1,74 @@
+import json
+
+from campaign import CampaignRow, build_campaign_metadata
+from metadata_store import MetadataStore, digest_key, metadata_digest, serialize_metadata, split_metadata
+
+METADATA = {"phone_number": "+911234567890", "first_message": "Hello", "LLM_temperature": 0.5}
+
+
+def test_write_is_confirmed_by_digest(redis_client, key_prefix):
+    store = MetadataStore(redis_client, ttl=60, index_prefix=f"{key_prefix}:")
+    data_id = f"{key_prefix}-call"
+
+    digest = store.write(data_id, METADATA)
+
+    assert digest == metadata_digest(serialize_metadata(METADATA))
+    assert json.loads(redis_client.get(data_id)) == METADATA
+    assert redis_client.get(digest_key(data_id)) == digest
+    assert 0 < redis_client.ttl(data_id) <= 60
+    assert store.read(data_id) == METADATA
+
+
+def test_transaction_fallback_writes_same_digest(redis_client, key_prefix):
+    store = MetadataStore(redis_client, ttl=60, index_prefix=f"{key_prefix}:")
+    store._use_script = False
+    data_id = f"{key_prefix}-call"
+
+    assert store.write(data_id, METADATA) == redis_client.get(digest_key(data_id))
+    assert store.read(data_id) == METADATA
+
+
+def test_presets_store_shared_configuration_once(redis_client, key_prefix):
+    store = MetadataStore(redis_client, ttl=60, use_presets=True, index_prefix=f"{key_prefix}:")
+    first, second = f"{key_prefix}-call-1", f"{key_prefix}-call-2"
+    other = dict(METADATA, phone_number="+919876543210")
+
+    store.write(first, METADATA)
+    store.write(second, other)
+
+    preset_key, _, _ = split_metadata(METADATA)
+    assert json.loads(redis_client.get(first)) == {"phone_number": METADATA["phone_number"], "preset": preset_key}
+    assert json.loads(redis_client.get(second))["preset"] == preset_key
+    assert store.read(first) == METADATA
+    assert store.read(second) == other
+    redis_client.delete(preset_key)
+
+
+def test_missing_preset_is_resent(redis_client, key_prefix):
+    store = MetadataStore(redis_client, ttl=60, use_presets=True, index_prefix=f"{key_prefix}:")
+    preset_key, _, _ = split_metadata(METADATA)
+    store.write(f"{key_prefix}-call-1", METADATA)
+    redis_client.delete(preset_key)
+
+    store.write(f"{key_prefix}-call-2", METADATA)
+
+    assert store.read(f"{key_prefix}-call-2") == METADATA
+    redis_client.delete(preset_key)
+
+
+def test_templated_campaign_rows_share_one_preset(redis_client, key_prefix):
+    store = MetadataStore(redis_client, ttl=60, use_presets=True, index_prefix=f"{key_prefix}:")
+    base = dict(METADATA, first_message="Hello {name}", LLM_system_prompt="Remind {name} about {plan}")
+    rows = [CampaignRow(i + 2, f"+91900000000{i}", {"name": f"Customer {i}", "plan": "gold"}) for i in range(3)]
+    presets_before = set(redis_client.scan_iter("preset:*"))
+
+    jobs = build_campaign_metadata(base, rows)
+    for i, (_, metadata) in enumerate(jobs):
+        store.write(f"{key_prefix}-call-{i}", metadata)
+
+    written = set(redis_client.scan_iter("preset:*")) - presets_before
+    assert len(written) == 1
+    assert {json.loads(redis_client.get(f"{key_prefix}-call-{i}"))["preset"] for i in range(3)} == written
+    assert store.read(f"{key_prefix}-call-1")["first_message"] == "Hello Customer 1"
+    assert store.read(f"{key_prefix}-call-2") == jobs[2][1]
+    redis_client.delete(*written)
@@ -0,0 +1,102 @@
+import urllib.request
+
+import pytest
+
+import calls
+from metrics import (
+    CALL_SETUP_FAILURES,
+    CALL_SETUP_RETRIES,
+    CALL_SETUP_STAGE_SECONDS,
+    Registry,
+    RedisMetricsExporter,
+    start_metrics_server,
+)
+
+
+def test_histogram_renders_cumulative_prometheus_buckets():
+    registry = Registry()
+    latency = registry.histogram("setup_seconds", "Setup time", buckets=(0.1, 1.0))
+    latency.observe(0.05, stage="dispatch")
+    latency.observe(0.5, stage="dispatch")
+    latency.observe(3.0, stage="dispatch")
+
+    lines = registry.render().splitlines()
+
+    assert lines[:2] == ["# HELP setup_seconds Setup time", "# TYPE setup_seconds histogram"]
+    assert lines[2:] == [
+        'setup_seconds_bucket{stage="dispatch",le="0.1"} 1',
+        'setup_seconds_bucket{stage="dispatch",le="1"} 2',
+        'setup_seconds_bucket{stage="dispatch",le="+Inf"} 3',
+        'setup_seconds_sum{stage="dispatch"} 3.55',
+        'setup_seconds_count{stage="dispatch"} 3',
+    ]
+
+
+class FlakyDispatcher:
+    backend_name = "fake"
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def create_dispatch(self, data_id):
+        if self.failures:
+            self.failures -= 1
+            return False, None, "HTTP 503"
+        return True, "ok", None
+
+
+def _sample(metric, suffix, **labels):
+    return metric.samples().get((suffix, tuple(sorted(labels.items()))), 0)
+
+
+def test_call_setup_records_stages_retries_and_failures(redis_client, monkeypatch, call_metadata):
+    monkeypatch.setattr(calls.time, "sleep", lambda seconds: None)
+    retries = _sample(CALL_SETUP_RETRIES, "_total", reason="dispatch_rejected")
+    failures = _sample(CALL_SETUP_FAILURES, "_total", reason="dispatch_rejected")
+    dispatches = _sample(CALL_SETUP_STAGE_SECONDS, "_count", stage="dispatch", backend="fake")
+
+    assert calls.initiate_call_with_retry(redis_client, "+911234567890", call_metadata,
+                                          dispatcher=FlakyDispatcher(2))[0]
+    assert not calls.initiate_call_with_retry(redis_client, "+911234567891", call_metadata, max_retries=2,
+                                              dispatcher=FlakyDispatcher(5))[0]
+
+    assert _sample(CALL_SETUP_RETRIES, "_total", reason="dispatch_rejected") == retries + 3
+    assert _sample(CALL_SETUP_FAILURES, "_total", reason="dispatch_rejected") == failures + 1
+    assert _sample(CALL_SETUP_STAGE_SECONDS, "_count", stage="dispatch", backend="fake") == dispatches + 5
+    for key in redis_client.scan_iter("call-+91123456789[01]-*"):
+        redis_client.delete(key)
+
+
+@pytest.fixture
+def two_replicas(redis_client, key_prefix):
+    replicas = []
+    for _ in range(2):
+        registry = Registry()
+        registry.counter("calls", "Calls")
+        replicas.append(RedisMetricsExporter(redis_client, registry, prefix=f"{key_prefix}:"))
+    return replicas
+
+
+def test_replicas_aggregate_through_redis(two_replicas):
+    first, second = two_replicas
+    first.registry.metrics[0].inc(2, outcome="ok")
+    first.flush()
+    first.registry.metrics[0].inc(1, outcome="ok")
+    first.flush()
+    second.registry.metrics[0].inc(4, outcome="ok")
+    second.flush()
+    second.flush()
+
+    server = start_metrics_server(0, host="127.0.0.1", registry=first.registry, exporter=first)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url) as response:
+            local = response.read().decode()
+        with urllib.request.urlopen(url + "?scope=cluster") as response:
+            cluster = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert 'calls_total{outcome="ok"} 3' in local
+    assert 'calls_total{outcome="ok"} 7' in cluster
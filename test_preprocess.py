@@ -0,0 +1,93 @@
+import io
+import logging
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+from bench_preprocess import build_sample_corpus
+from knowledge_base import UploadPipeline
+from preprocess import (
+    _pdf_pages,
+    cleanup_when_done,
+    preprocess_documents,
+    preprocess_uploads,
+    split_text,
+    strip_boilerplate,
+)
+
+
+def test_running_headers_footers_and_page_numbers_are_stripped():
+    pages = [f"ACME Handbook\n\nSection {i} body text.\n\nConfidential\nPage {i} of 4" for i in range(1, 5)]
+
+    text = strip_boilerplate(pages)
+
+    assert text == "\n\n".join(f"Section {i} body text." for i in range(1, 5))
+
+
+def test_oversized_text_is_split_on_paragraphs():
+    paragraphs = [f"paragraph {i} " + "x" * 80 for i in range(10)]
+
+    parts = split_text("\n\n".join(paragraphs), max_chars=250)
+
+    assert all(len(part) <= 250 for part in parts)
+    assert "\n\n".join(parts) == "\n\n".join(paragraphs)
+
+
+def test_pool_extracts_docx_and_text_in_order(tmp_path):
+    build_sample_corpus(str(tmp_path), documents=4)
+    names = sorted(os.listdir(tmp_path))
+    sources = [(name, str(tmp_path / name)) for name in names]
+
+    results = preprocess_documents(sources, max_workers=2, max_chars=10_000)
+
+    assert [r.name for r in results] == names
+    for result in results:
+        assert result.parts and result.text_bytes < result.original_bytes
+        assert all(name.endswith(".txt") for name, _ in result.parts)
+        assert "Confidential" not in "".join(text for _, text in result.parts)
+
+
+def test_workdir_is_removed_after_upload(tmp_path):
+    class Assistant:
+        def upload_file(self, file_path, timeout=None):
+            with open(file_path) as f:
+                uploaded.append(f.read())
+            return SimpleNamespace(id=os.path.basename(file_path), status="Available")
+
+    uploaded = []
+    upload = io.BytesIO(b"Hello   world\r\n\r\n\r\n\r\nBye")
+    upload.name = "notes/readme.md"
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+
+    _, jobs = preprocess_uploads([upload], str(workdir), max_workers=1)
+    pipeline = cleanup_when_done(UploadPipeline(Assistant(), jobs), str(workdir)).start()
+    deadline = time.time() + 5
+    while not pipeline.done and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert [job.name for job in jobs] == ["readme.txt"]
+    assert uploaded == ["Hello world\n\nBye"]
+    assert not workdir.exists()
+
+
+def test_pdfs_without_pypdf_are_passed_through_with_a_warning(tmp_path, monkeypatch, caplog):
+    monkeypatch.setitem(sys.modules, "pypdf", None)
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4")
+
+    with caplog.at_level(logging.WARNING, logger="preprocess"):
+        assert _pdf_pages(str(path)) is None
+    assert "pypdf is not installed" in caplog.text and "report.pdf" in caplog.text
+
+
+def test_extraction_failures_are_reported_by_file_name(tmp_path, caplog):
+    path = tmp_path / "broken.docx"
+    path.write_bytes(b"not a zip archive")
+
+    with caplog.at_level(logging.WARNING, logger="preprocess"):
+        [result] = preprocess_documents([("policies/broken.docx", str(path))])
+
+    assert result.parts == [] and result.error.startswith("policies/broken.docx: ")
+    assert "policies/broken.docx" in caplog.text
@@ -0,0 +1,171 @@
+import threading
+import time
+
+import pytest
+
+from call_status import publish_status
+from calls import initiate_call_with_retry
+from rate_limit import OPERATOR, TRUNK, CallLimiter, get_call_limiter
+from resilience import RateLimitedError
+
+UNLIMITED = {TRUNK: {"rate": 0, "burst": 0, "concurrent": 0}, OPERATOR: {"rate": 0, "burst": 0, "concurrent": 0}}
+
+
+def _limits(trunk=None, operator=None):
+    return {TRUNK: dict(UNLIMITED[TRUNK], **(trunk or {})), OPERATOR: dict(UNLIMITED[OPERATOR], **(operator or {}))}
+
+
+@pytest.fixture
+def clock():
+    return [1000.0]
+
+
+@pytest.fixture
+def limiter_for(redis_client, key_prefix, clock):
+    def build(**defaults):
+        return CallLimiter(redis_client, trunk="main", defaults=_limits(**defaults), prefix=f"{key_prefix}:",
+                           clock=lambda: clock[0], sleep=lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    return build
+
+
+def test_token_bucket_paces_calls_per_trunk(limiter_for, clock):
+    limiter = limiter_for(trunk={"rate": 2, "burst": 2})
+
+    assert [limiter.try_acquire(f"call-{i}")[0] for i in range(2)] == [None, None]
+    assert limiter.try_acquire("call-2") == ((TRUNK, "main"), 0.5)
+    clock[0] += 0.5
+    assert limiter.try_acquire("call-2") == (None, 0.0)
+    assert limiter.budget()[0].tokens == 0
+
+
+def test_concurrent_calls_are_capped_per_operator_until_released(limiter_for):
+    limiter = limiter_for(operator={"concurrent": 2})
+
+    limiter.acquire("a-1", "a@example.com")
+    limiter.acquire("a-2", "a@example.com")
+    assert limiter.try_acquire("a-3", "a@example.com")[0] == (OPERATOR, "a@example.com")
+    assert limiter.try_acquire("b-1", "b@example.com")[0] is None
+
+    assert limiter.release("a-1") and not limiter.release("a-1")
+    assert limiter.try_acquire("a-3", "a@example.com")[0] is None
+    trunk, operator = limiter.budget("a@example.com")
+    assert (trunk.active, operator.active, operator.concurrent) == (3, 2, 2)
+
+
+def test_limits_set_in_redis_apply_at_once(limiter_for, clock):
+    limiter = limiter_for()
+    assert limiter.budget()[0].unlimited
+
+    limiter.set_limits(TRUNK, "main", rate=1, burst=1)
+    limiter.acquire("call-1")
+    # The wait for the next token fits within max_wait, so acquire sleeps and succeeds
+    assert limiter.acquire("call-2") == pytest.approx(1.0)
+    limiter.max_wait = 0.5
+    with pytest.raises(RateLimitedError, match="trunk main"):
+        limiter.acquire("call-3")
+
+
+def test_slots_are_taken_atomically(limiter_for):
+    limiter = limiter_for(trunk={"concurrent": 10})
+    granted = []
+
+    def call(i):
+        if limiter.try_acquire(f"call-{i}")[0] is None:
+            granted.append(i)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(granted) == 10
+
+
+def test_budget_is_read_on_the_server_clock(redis_client, key_prefix, monkeypatch):
+    limiter = CallLimiter(redis_client, trunk="main", defaults=_limits(trunk={"concurrent": 2}),
+                          prefix=f"{key_prefix}:", lease_seconds=60)
+    limiter.acquire("call-1")
+
+    # A replica whose own clock is off by hours still sees the slot held
+    ahead = time.time() + 7200
+    monkeypatch.setattr(time, "time", lambda: ahead)
+    assert limiter.budget()[0].active == 1
+
+
+def test_only_attempts_go_through_the_breaker_not_the_wait(limiter_for, clock):
+    limiter = limiter_for(trunk={"rate": 1, "burst": 1})
+    limiter.acquire("call-1")
+    inside = []
+
+    class Breaker:
+        def __init__(self):
+            self.calls = 0
+
+        def call(self, fn, *args):
+            self.calls += 1
+            inside.append(True)
+            try:
+                return fn(*args)
+            finally:
+                inside.pop()
+
+    def sleep(seconds):
+        assert not inside
+        clock[0] += seconds
+
+    limiter._sleep = sleep
+    breaker = Breaker()
+    assert limiter.acquire("call-2", max_wait=5, breaker=breaker) == 1.0
+    assert breaker.calls == 2
+
+
+def test_calls_over_budget_are_refused_and_final_statuses_free_their_slots(redis_client, key_prefix, call_metadata):
+    # publish_status frees the slots through the process-wide limiter, so share its keys
+    limiter = CallLimiter(redis_client, trunk=key_prefix, defaults=_limits(trunk={"concurrent": 1}), max_wait=0,
+                          prefix=get_call_limiter(redis_client).prefix)
+    dispatched = []
+
+    class Dispatcher:
+        def create_dispatch(self, data_id):
+            return True, "ok", None
+
+    first = initiate_call_with_retry(redis_client, "+919000000011", call_metadata, dispatcher=Dispatcher(),
+                                     limiter=limiter, on_dispatched=dispatched.append)
+    second = initiate_call_with_retry(redis_client, "+919000000012", call_metadata, dispatcher=Dispatcher(),
+                                      limiter=limiter)
+    assert first[0] and second == (False, None,
+                                   f"Rate limited: Call limit reached for trunk {key_prefix}; try again in 1.0s")
+
+    publish_status(redis_client, dispatched[0], "ended", stream=f"{key_prefix}-stream")
+    assert limiter.budget()[0].active == 0
+    assert initiate_call_with_retry(redis_client, "+919000000012", call_metadata, dispatcher=Dispatcher(),
+                                    limiter=limiter)[0]
+    for key in redis_client.scan_iter("call-+91900000001*"):
+        redis_client.delete(key)
+
+
+def test_interactive_calls_are_refused_at_once_and_workers_wait(redis_client, key_prefix, call_metadata):
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        time.sleep(seconds)
+
+    limiter = CallLimiter(redis_client, trunk=key_prefix, defaults=_limits(trunk={"rate": 1, "burst": 1}),
+                          max_wait=5, prefix=f"{key_prefix}:", sleep=sleep)
+
+    class Dispatcher:
+        def create_dispatch(self, data_id):
+            return True, "ok", None
+
+    calls = [(f"+91900000001{i}", dict(call_metadata, phone_number=f"+91900000001{i}")) for i in range(3, 6)]
+    assert initiate_call_with_retry(redis_client, *calls[0], dispatcher=Dispatcher(), limiter=limiter)[0]
+    success, _, error = initiate_call_with_retry(redis_client, *calls[1], dispatcher=Dispatcher(), limiter=limiter,
+                                                 limit_wait=0)
+    assert not success and error.startswith("Rate limited: ") and waits == []
+
+    assert initiate_call_with_retry(redis_client, *calls[2], dispatcher=Dispatcher(), limiter=limiter)[0]
+    assert len(waits) == 1 and 0 < waits[0] <= 1
+    for key in redis_client.scan_iter("call-+91900000001*"):
+        redis_client.delete(key)
@@ -0,0 +1,11 @@
+from bench_rerun import WIDGETS, run_benchmark
+
+
+def test_a_configuration_change_renders_its_own_panel(redis_client):
+    report = run_benchmark(runs=len(WIDGETS), files=3)
+
+    assert report["exceptions"] == []
+    assert {"knowledge_base", "dispatch", "llm_tab", "stt_tab", "tts_tab", "settings_tab"} <= set(report["panels"])
+    assert set(report["widgets"]) == set(WIDGETS)
+    for widget in report["widgets"].values():
+        assert widget["panel_ms"] < widget["full_rerun_ms"]
@@ -0,0 +1,178 @@
+import random
+
+import pytest
+import redis
+
+from calls import initiate_call_with_retry
+from resilience import (
+    PERMANENT,
+    TRANSIENT,
+    Backoff,
+    CircuitBreaker,
+    CircuitOpenError,
+    DispatchError,
+    RetryPolicy,
+    classify_error,
+    get_breaker,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _failing(errors):
+    """Callable raising each of ``errors`` in turn, then returning "ok"."""
+    errors = list(errors)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    fn.calls = calls
+    return fn
+
+
+@pytest.mark.parametrize("error,kind", [
+    (redis.ConnectionError("refused"), TRANSIENT),
+    (redis.TimeoutError("timed out"), TRANSIENT),
+    (redis.AuthenticationError("bad password"), PERMANENT),
+    (redis.ResponseError("WRONGTYPE"), PERMANENT),
+    (DispatchError("HTTP 503: unavailable"), TRANSIENT),
+    (DispatchError("HTTP 429: slow down"), TRANSIENT),
+    (DispatchError("HTTP 401: unauthenticated"), PERMANENT),
+    (DispatchError("lk: connection reset"), TRANSIENT),
+])
+def test_errors_are_classified(error, kind):
+    assert classify_error(error) == kind
+
+
+def test_backoff_is_jittered_and_capped():
+    backoff = Backoff(base=0.1, cap=1.0, rng=random.Random(3))
+    for retry in range(8):
+        delays = [backoff.delay(retry) for _ in range(200)]
+        ceiling = min(1.0, 0.1 * 2 ** retry)
+        assert all(0 <= d <= ceiling for d in delays)
+        assert max(delays) > ceiling * 0.8 and len(set(delays)) == 200
+
+
+def test_transient_errors_are_retried_with_backoff():
+    clock = FakeClock()
+    policy = RetryPolicy(max_attempts=5, backoff=Backoff(rng=random.Random(1)), sleep=clock.sleep, clock=clock)
+    fn = _failing([redis.ConnectionError("down")] * 3)
+    retries = []
+
+    assert policy.call(fn, on_retry=lambda attempt, error, delay: retries.append((attempt, delay))) == "ok"
+    assert len(fn.calls) == 4
+    assert [attempt for attempt, _ in retries] == [1, 2, 3]
+    assert clock.sleeps == [delay for _, delay in retries]
+
+
+def test_permanent_errors_and_exhausted_budgets_are_not_retried():
+    clock = FakeClock()
+    policy = RetryPolicy(max_attempts=5, sleep=clock.sleep, clock=clock)
+    fn = _failing([DispatchError("HTTP 400: bad request")])
+    with pytest.raises(DispatchError):
+        policy.call(fn)
+    assert len(fn.calls) == 1 and clock.sleeps == []
+
+    policy = RetryPolicy(max_attempts=10, backoff=Backoff(base=1.0, cap=1.0, rng=random.Random(0)), budget=2.0,
+                         sleep=clock.sleep, clock=clock)
+    fn = _failing([redis.ConnectionError("down")] * 10)
+    with pytest.raises(redis.ConnectionError):
+        policy.call(fn)
+    assert sum(clock.sleeps) <= 2.0 and len(fn.calls) < 10
+
+
+def test_circuit_opens_fails_fast_and_recovers_through_one_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker("dispatch", failure_threshold=3, reset_timeout=10, clock=clock)
+    down = _failing([redis.ConnectionError("down")] * 4)
+
+    for _ in range(3):
+        with pytest.raises(redis.ConnectionError):
+            breaker.call(down)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.call(down)
+    assert excinfo.value.retry_in == 10
+    assert len(down.calls) == 3
+
+    clock.now = 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.allow()  # the single trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20.0
+    assert breaker.call(lambda: "back") == "back"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_permanent_errors_do_not_open_the_circuit():
+    breaker = CircuitBreaker("dispatch", failure_threshold=2, clock=FakeClock())
+    for _ in range(5):
+        with pytest.raises(DispatchError):
+            breaker.call(_failing([DispatchError("HTTP 401: unauthenticated")]))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_permanent_errors_leave_the_breaker_state_unchanged():
+    clock = FakeClock()
+    breaker = CircuitBreaker("dispatch", failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(2):
+        with pytest.raises(redis.ConnectionError):
+            breaker.call(_failing([redis.ConnectionError("down")]))
+    with pytest.raises(DispatchError):
+        breaker.call(_failing([DispatchError("HTTP 400: bad request")]))
+    with pytest.raises(redis.ConnectionError):
+        breaker.call(_failing([redis.ConnectionError("down")]))
+    assert breaker.state == CircuitBreaker.OPEN  # the permanent error did not reset the count
+
+    clock.now = 10.0
+    with pytest.raises(DispatchError):
+        breaker.call(_failing([DispatchError("HTTP 400: bad request")]))
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.call(lambda: "back") == "back"  # the next trial is let through
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_call_setup_fails_fast_while_dispatch_is_down(redis_client, call_metadata):
+    class DownDispatcher:
+        calls = 0
+
+        def create_dispatch(self, data_id):
+            self.calls += 1
+            return False, None, "HTTP 503: unavailable"
+
+    clock = FakeClock()
+    dispatcher = DownDispatcher()
+    policy = RetryPolicy(max_attempts=5, sleep=clock.sleep, clock=clock)
+    messages = []
+
+    success, _, error = initiate_call_with_retry(redis_client, "+911234567890", call_metadata,
+                                                 on_retry=messages.append, dispatcher=dispatcher, policy=policy)
+    assert not success and error == "HTTP 503: unavailable"
+    assert dispatcher.calls == 5
+    assert messages[0] == "Attempt 1: Call initiation failed, retrying..."
+    assert get_breaker("dispatch").state == CircuitBreaker.OPEN
+
+    success, _, error = initiate_call_with_retry(redis_client, "+911234567890", call_metadata,
+                                                 dispatcher=dispatcher, policy=policy)
+    assert not success and "unavailable, not retrying" in error
+    assert dispatcher.calls == 5
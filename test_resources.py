@@ -0,0 +1,72 @@
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import resources
+
+GETTERS = (resources.get_redis_client, resources.get_user_store, resources.get_pinecone, resources._assistant,
+           resources._file_list_cache, resources.get_call_status_tracker, resources.start_metrics)
+
+
+@pytest.fixture
+def fresh_resources(monkeypatch):
+    """Local, non-SSL Redis settings, with every getter's cache empty before and after the test."""
+    monkeypatch.setenv("REDIS_HOST", "localhost")
+    monkeypatch.setenv("REDIS_PORT", "6379")
+    monkeypatch.setenv("REDIS_SSL", "false")
+    monkeypatch.setenv("SEED_DEFAULT_USERS", "false")
+    for getter in GETTERS:
+        getter.cache_clear()
+    yield
+    for getter in GETTERS:
+        getter.cache_clear()
+
+
+def test_import_loads_no_client_library():
+    code = "import sys, resources; print(sorted({'redis', 'pinecone', 'requests', 'knowledge_base'} & set(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_redis_client_and_user_store_are_built_once(fresh_resources):
+    client = resources.get_redis_client()
+
+    assert resources.get_redis_client() is client
+    assert resources.get_user_store() is resources.get_user_store()
+    assert resources.get_user_store().redis is client
+    pool = client.connection_pool
+    assert pool.max_connections == 32 and pool.connection_kwargs["port"] == 6379
+
+
+def test_demo_accounts_are_only_seeded_on_request(fresh_resources, monkeypatch):
+    seeded = []
+    monkeypatch.setattr(resources.UserStore, "seed", lambda self: seeded.append(self))
+    monkeypatch.delenv("SEED_DEFAULT_USERS")
+
+    resources.get_user_store()
+    assert seeded == []
+
+    resources.get_user_store.cache_clear()
+    monkeypatch.setenv("SEED_DEFAULT_USERS", "true")
+    assert seeded == [resources.get_user_store()]
+
+
+def test_assistant_and_file_list_are_shared(fresh_resources, monkeypatch):
+    built = []
+
+    def assistant(assistant_name):
+        built.append(assistant_name)
+        return SimpleNamespace(name=assistant_name)
+
+    monkeypatch.setattr(resources, "get_pinecone", lambda: SimpleNamespace(assistant=SimpleNamespace(Assistant=assistant)))
+
+    first = resources.get_assistant()
+    assert resources.get_assistant() is first
+    assert resources.get_assistant(resources.ASSISTANT_NAME) is first
+    assert first.assistant.name == resources.ASSISTANT_NAME
+    assert resources.get_file_list_cache() is resources.get_file_list_cache(resources.ASSISTANT_NAME)
+    assert resources.get_file_list_cache().assistant is first
+    assert resources.get_assistant("other") is not first
+    assert built == [resources.ASSISTANT_NAME, "other"]
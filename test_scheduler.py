@@ -0,0 +1,156 @@
+import json
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from call_status import STATUS_KEY_PREFIX, status_key
+from metadata_schema import InvalidMetadataError
+from scheduler import CallWindow, SchedulePoller, next_in_window, schedule_call, schedule_calls, scheduled_count
+
+IST = ZoneInfo("Asia/Kolkata")
+# Wednesday 2026-01-07 10:00 IST
+WEDNESDAY_10AM = datetime(2026, 1, 7, 10, tzinfo=IST).timestamp()
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def keys(redis_client, key_prefix):
+    yield {"schedule_key": f"{key_prefix}-schedule", "jobs_key": f"{key_prefix}-jobs",
+           "status_stream": f"{key_prefix}-status"}
+    for key in redis_client.scan_iter(f"{STATUS_KEY_PREFIX}call-+9190000000*"):
+        redis_client.delete(key)
+
+
+@pytest.fixture
+def metadata(call_metadata):
+    return call_metadata
+
+
+def _poller(redis_client, keys, key_prefix, clock, **kwargs):
+    return SchedulePoller(redis_client, stream=f"{key_prefix}-queue", clock=clock, schedule_key=keys["schedule_key"],
+                          jobs_key=keys["jobs_key"], status_stream=keys["status_stream"], **kwargs)
+
+
+def _queued(redis_client, key_prefix):
+    return [fields for _, fields in redis_client.xrange(f"{key_prefix}-queue")]
+
+
+def test_due_calls_are_queued_once_in_due_order(redis_client, keys, key_prefix, metadata):
+    clock = Clock(WEDNESDAY_10AM)
+    later, _ = schedule_call(redis_client, "+919000000002", dict(metadata, first_message="2"), WEDNESDAY_10AM + 60,
+                             operator="op@x", **keys)
+    first, _ = schedule_call(redis_client, "+919000000001", dict(metadata, first_message="1"), WEDNESDAY_10AM - 5,
+                             campaign="renewals", **keys)
+    poller = _poller(redis_client, keys, key_prefix, clock)
+
+    assert poller.poll() == 1
+    assert poller.poll() == 0
+    queued = _queued(redis_client, key_prefix)
+    assert [(q["data_id"], q["campaign"], json.loads(q["metadata"])) for q in queued] == [
+        (first, "renewals", dict(metadata, first_message="1"))
+    ]
+    assert scheduled_count(redis_client, keys["schedule_key"]) == 1
+
+    clock.now += 60
+    assert poller.poll() == 1
+    assert [q["data_id"] for q in _queued(redis_client, key_prefix)] == [first, later]
+    assert _queued(redis_client, key_prefix)[1]["operator"] == "op@x"
+    assert scheduled_count(redis_client, keys["schedule_key"]) == 0
+    assert redis_client.hlen(keys["jobs_key"]) == 0
+
+
+def test_pollers_sharing_a_schedule_never_queue_a_call_twice(redis_client, keys, key_prefix, metadata):
+    calls = [(f"+9190000000{i:02d}", metadata) for i in range(50)]
+    scheduled = schedule_calls(redis_client, calls, WEDNESDAY_10AM, **keys)
+    clock = Clock(WEDNESDAY_10AM + 1)
+    pollers = [_poller(redis_client, keys, key_prefix, clock, batch_size=7) for _ in range(3)]
+
+    while sum(poller.poll() for poller in pollers):
+        pass
+
+    queued = [q["data_id"] for q in _queued(redis_client, key_prefix)]
+    assert sorted(queued) == sorted(data_id for data_id, _ in scheduled)
+
+
+def test_naive_times_are_the_callees_local_time(redis_client, keys, metadata):
+    _, due = schedule_call(redis_client, "+919000000001", metadata, datetime(2026, 1, 7, 10), **keys)
+    assert due == WEDNESDAY_10AM
+
+
+@pytest.mark.parametrize("local, expected", [
+    (datetime(2026, 1, 7, 10, 30), (datetime(2026, 1, 7, 10, 30), datetime(2026, 1, 7, 18))),  # inside
+    (datetime(2026, 1, 7, 7), (datetime(2026, 1, 7, 9), datetime(2026, 1, 7, 18))),  # before opening
+    (datetime(2026, 1, 7, 19), (datetime(2026, 1, 8, 9), datetime(2026, 1, 8, 18))),  # after closing
+    (datetime(2026, 1, 9, 18), (datetime(2026, 1, 12, 9), datetime(2026, 1, 12, 18))),  # Friday evening
+    (datetime(2026, 1, 10, 12), (datetime(2026, 1, 12, 9), datetime(2026, 1, 12, 18))),  # Saturday
+])
+def test_next_in_window(local, expected):
+    start, end = next_in_window(local.replace(tzinfo=IST), CallWindow(9, 18))
+    assert (start, end) == tuple(t.replace(tzinfo=IST).timestamp() for t in expected)
+
+
+def test_calls_past_their_window_move_to_the_next_window(redis_client, keys, key_prefix, metadata):
+    data_id, due = schedule_call(redis_client, "+919000000001", metadata, WEDNESDAY_10AM, window=CallWindow(9, 18),
+                                 **keys)
+    assert due == WEDNESDAY_10AM
+    # The pollers were down until after closing time
+    clock = Clock(datetime(2026, 1, 7, 20, tzinfo=IST).timestamp())
+    poller = _poller(redis_client, keys, key_prefix, clock)
+
+    assert poller.poll() == 1
+    assert _queued(redis_client, key_prefix) == []
+    thursday_9am = datetime(2026, 1, 8, 9, tzinfo=IST).timestamp()
+    assert redis_client.zscore(keys["schedule_key"], data_id) == thursday_9am
+
+    clock.now = thursday_9am
+    assert poller.poll() == 1
+    assert [q["data_id"] for q in _queued(redis_client, key_prefix)] == [data_id]
+
+
+def test_scheduled_calls_are_reported_as_scheduled_then_queued(redis_client, keys, key_prefix, metadata):
+    data_id, _ = schedule_call(redis_client, "+919000000001", metadata, WEDNESDAY_10AM, **keys)
+
+    stored = json.loads(redis_client.get(status_key(data_id)))
+    assert (stored["status"], stored["detail"]) == ("scheduled", "Due 2026-01-07T10:00:00+05:30")
+    assert redis_client.xlen(keys["status_stream"]) == 1
+
+    assert _poller(redis_client, keys, key_prefix, Clock(WEDNESDAY_10AM + 1)).poll() == 1
+    stored = json.loads(redis_client.get(status_key(data_id)))
+    assert (stored["data_id"], stored["status"], float(stored["ts"])) == (data_id, "queued", WEDNESDAY_10AM + 1)
+    events = [fields for _, fields in redis_client.xrange(keys["status_stream"])]
+    assert [(e["data_id"], e["status"]) for e in events] == [(data_id, "scheduled"), (data_id, "queued")]
+    assert 0 < redis_client.ttl(status_key(data_id))
+
+
+def test_invalid_metadata_is_refused_before_anything_is_scheduled(redis_client, keys, metadata):
+    calls = [("+919000000001", metadata), ("+919000000002", dict(metadata, LLM_temperature=7))]
+
+    with pytest.raises(InvalidMetadataError, match="LLM_temperature"):
+        schedule_calls(redis_client, calls, WEDNESDAY_10AM, **keys)
+    assert scheduled_count(redis_client, keys["schedule_key"]) == 0
+    assert not redis_client.exists(keys["status_stream"])
+
+
+def test_a_call_queued_during_its_reschedule_is_not_brought_back(redis_client, keys, key_prefix, monkeypatch,
+                                                                 metadata):
+    data_id, _ = schedule_call(redis_client, "+919000000001", metadata, WEDNESDAY_10AM, window=CallWindow(9, 18),
+                               **keys)
+    stale = redis_client.hmget(keys["jobs_key"], [data_id])
+    # Another poller queues the call after this one read its job but before it moves it
+    redis_client.zrem(keys["schedule_key"], data_id)
+    redis_client.hdel(keys["jobs_key"], data_id)
+    monkeypatch.setattr(redis_client, "hmget", lambda key, data_ids: stale)
+    poller = _poller(redis_client, keys, key_prefix, Clock(datetime(2026, 1, 7, 20, tzinfo=IST).timestamp()))
+
+    poller._reschedule([data_id], poller._clock())
+
+    assert redis_client.zcard(keys["schedule_key"]) == 0
+    assert redis_client.hlen(keys["jobs_key"]) == 0
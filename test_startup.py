@@ -0,0 +1,22 @@
+from bench_startup import APP, MARKER, _render, parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       500 |     300000 | streamlit
+bench-startup: rendering
+import time:      1000 |       1000 |     numpy.core
+import time:      2000 |       3000 |   numpy
+import time:       400 |        400 | resources
+"""
+
+
+def test_importtime_profile_keeps_top_level_imports_after_the_marker():
+    assert parse_importtime(IMPORTTIME, MARKER) == [("resources", 0.4)]
+    assert parse_importtime(IMPORTTIME) == [("streamlit", 300.0), ("resources", 0.4)]
+
+
+def test_login_page_does_not_load_feature_dependencies():
+    _, result, _ = _render(APP)
+
+    assert result["exceptions"] == []
+    assert not {"redis", "requests", "numpy", "pinecone"} & set(result["modules"])
@@ -0,0 +1,104 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Size of the document uploaded through the pipeline, and how far peak RSS may rise above
+# what the process held before the upload started
+FILE_MB = int(os.getenv("UPLOAD_RSS_TEST_MB", 300))
+RSS_CEILING_MB = 64
+
+# Runs in a fresh interpreter so ru_maxrss only reflects this upload. Uploads go through
+# StreamingAssistant, as resources.get_assistant returns it, to a local server standing in for
+# the assistant files endpoint.
+_CHILD = r"""
+import io, json, resource, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from knowledge_base import StreamingAssistant, UploadJob, UploadPipeline
+
+mode, path, size = sys.argv[1], sys.argv[2], int(sys.argv[3])
+received = []
+
+
+class FilesEndpoint(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        remaining = int(self.headers["Content-Length"])
+        length = 0
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 65536))
+            remaining -= len(chunk)
+            length += len(chunk)
+        received.append({"path": self.path.split("?")[0], "api_key": self.headers["Api-Key"],
+                         "content_type": self.headers["Content-Type"], "length": length})
+        body = json.dumps({"id": "file-1", "name": "big.pdf", "status": "Available"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), FilesEndpoint)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+sdk_assistant = SimpleNamespace(host=f"http://127.0.0.1:{server.server_address[1]}/assistant", name="test-rag")
+assistant = StreamingAssistant(sdk_assistant, api_key="test-key")
+
+if mode == "path":
+    job = UploadJob(name="big.pdf", path=path)
+else:
+    # Stand-in for the Streamlit uploader's buffer, which already holds the whole file
+    with open(path, "rb") as f:
+        buffer = io.BytesIO(f.read())
+    job = UploadJob(name="big.pdf", stream=buffer)
+
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+pipeline = UploadPipeline(assistant, [job], poll_interval=0.01).start()
+while not pipeline.done:
+    time.sleep(0.05)
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"status": job.status, "error": job.error, "received": received,
+                  "baseline_kb": baseline, "peak_kb": peak}))
+"""
+
+
+@pytest.fixture(scope="module")
+def big_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("upload") / "big.pdf"
+    chunk = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(FILE_MB):
+            f.write(chunk)
+    return path
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="ru_maxrss is reported in KiB on Linux")
+@pytest.mark.parametrize("mode", ["path", "stream"])
+def test_upload_peak_rss_is_bounded(big_file, tmp_path, mode):
+    size = FILE_MB * 1024 * 1024
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD, mode, str(big_file), str(size)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, TMPDIR=str(tmp_path)),
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout)
+
+    assert report["status"] == "available", report["error"]
+    [request] = report["received"]
+    assert request["path"] == "/assistant/files/test-rag"
+    assert request["api_key"] == "test-key"
+    assert request["content_type"].startswith("multipart/form-data; boundary=")
+    assert size < request["length"] < size + 1024
+    assert (report["peak_kb"] - report["baseline_kb"]) / 1024 < RSS_CEILING_MB
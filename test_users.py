@@ -0,0 +1,103 @@
+import pytest
+
+import hashlib
+
+from users import UserStore, hash_password, session_key, user_key, verify_password
+
+
+class CountingRedis:
+    """Wraps a client and counts the commands that reach it."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            return attr(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+def email(redis_client, key_prefix):
+    address = f"{key_prefix}@example.com"
+    yield address
+    redis_client.delete(user_key(address))
+
+
+def test_logins_are_served_from_the_local_cache(redis_client, email):
+    now = [0.0]
+    counting = CountingRedis(redis_client)
+    store = UserStore(counting, cache_ttl=60, clock=lambda: now[0])
+    store.add_user(email, "secret", "Operator")
+    counting.calls = 0
+
+    assert store.authenticate(email, "secret") == {"email": email, "name": "Operator", "role": "user"}
+    assert store.authenticate(email, "wrong") is None
+    assert store.authenticate(email, "secret") is not None
+    assert counting.calls == 1
+
+    # Another replica changes the password; this one notices once its entry expires
+    UserStore(redis_client).add_user(email, "rotated", "Operator")
+    assert store.authenticate(email, "secret") is not None
+    now[0] = 61.0
+    assert store.authenticate(email, "secret") is None
+    assert store.authenticate(email, "rotated") is not None
+
+
+def test_accounts_added_elsewhere_can_log_in_at_once(redis_client, email):
+    store = UserStore(redis_client, cache_ttl=60, clock=lambda: 0.0)
+    assert store.authenticate(email, "secret") is None
+
+    UserStore(redis_client).add_user(email, "secret", "Operator")
+
+    assert store.authenticate(email, "secret") is not None
+
+
+def test_seed_keeps_existing_accounts(redis_client, email):
+    store = UserStore(redis_client)
+    store.add_user(email, "changed", "Operator", role="admin")
+
+    store.seed({email: {"password": "default", "name": "Default", "role": "user"}})
+
+    assert store.authenticate(email, "changed")["role"] == "admin"
+    assert store.authenticate(email, "default") is None
+
+
+def test_sessions_are_shared_between_replicas(redis_client, email):
+    first, second = UserStore(redis_client, session_ttl=60), UserStore(redis_client, session_ttl=60)
+    first.add_user(email, "secret", "Operator")
+
+    token = first.create_session(first.authenticate(email, "secret"))
+
+    assert second.get_session(token)["email"] == email
+    assert 0 < redis_client.ttl(session_key(token)) <= 60
+    second.end_session(token)
+    assert first.get_session(token) is None
+
+
+def test_passwords_are_salted_scrypt_hashes():
+    first, second = hash_password("secret"), hash_password("secret")
+
+    assert first != second and first.startswith("scrypt$")
+    assert verify_password("secret", first) and verify_password("secret", second)
+    assert not verify_password("Secret", first)
+    assert not verify_password("secret", "scrypt$broken")
+
+
+def test_legacy_hashes_are_upgraded_at_login(redis_client, email):
+    legacy = hashlib.sha256(b"secret").hexdigest()
+    redis_client.hset(user_key(email), mapping={"password": legacy, "name": "Operator", "role": "user"})
+    store = UserStore(redis_client)
+
+    assert store.authenticate(email, "wrong") is None
+    assert redis_client.hget(user_key(email), "password") == legacy
+    assert store.authenticate(email, "secret") is not None
+    upgraded = redis_client.hget(user_key(email), "password")
+    assert upgraded.startswith("scrypt$") and verify_password("secret", upgraded)
+    assert store.authenticate(email, "secret") is not None
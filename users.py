@@ -0,0 +1,170 @@
+"""Operator accounts and login sessions in Redis, so any app replica can serve any operator.
+
+    python users.py add operator@example.com --name "Operator" --role user
+
+Users are hashes ``user:<email>`` holding the ``password`` hash, ``name`` and ``role``.
+Passwords are hashed with scrypt and a random per-user salt, stored together with the cost
+parameters as ``scrypt$<n>$<r>$<p>$<salt>$<hash>``; an unsalted SHA-256 hash from older
+versions is still accepted and replaced by a scrypt hash at the next successful login. Logging in creates a random token stored under ``session:<token>`` for
+``SESSION_TTL`` seconds, refreshed on use; the app keeps it in the ``SESSION_COOKIE``
+cookie (never in the URL), so a reload or reconnect routed to another replica stays
+logged in without sticky sessions. Each process keeps a read-through cache of known
+accounts' credentials for ``CREDENTIALS_CACHE_TTL`` seconds: repeated login checks cost
+one scrypt hash and no round trip, and a changed password is picked up once the cached entry
+expires. Unknown emails are not cached, so a newly added account can log in at once.
+"""
+import argparse
+import getpass
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+USER_PREFIX = "user:"
+SESSION_PREFIX = "session:"
+SESSION_TTL = int(os.getenv("SESSION_TTL", 12 * 3600))
+SESSION_COOKIE = "stackvoice_session"
+CREDENTIALS_CACHE_TTL = float(os.getenv("CREDENTIALS_CACHE_TTL", 60))
+
+# scrypt cost: 16 MiB and tens of milliseconds per hash
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2 ** 14, 8, 1
+
+# Demo accounts created on first use when they do not exist yet, only with ``SEED_DEFAULT_USERS=true``
+DEFAULT_USERS = {
+    "admin@gmail.com": {"password": "admin123", "name": "Admin User", "role": "admin"},
+    "user@gmail.com": {"password": "user123", "name": "Demo User", "role": "user"},
+}
+
+
+def hash_password(password, salt=None):
+    """Salted scrypt hash of ``password``, with its salt and cost parameters."""
+    salt = salt or secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
+
+
+def _legacy_hash(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def verify_password(password, stored):
+    """Whether ``password`` matches ``stored``, compared in constant time."""
+    if not stored.startswith("scrypt$"):
+        return hmac.compare_digest(stored, _legacy_hash(password))
+    try:
+        _, n, r, p, salt, digest = stored.split("$")
+        candidate = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=int(n), r=int(r), p=int(p))
+    except ValueError:
+        return False
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+# Replace a legacy hash only if it is still the one that was checked, not a password set meanwhile
+_UPGRADE_HASH_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'password') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'password', ARGV[2])
+return 1
+"""
+
+
+def user_key(email):
+    return f"{USER_PREFIX}{email}"
+
+
+def session_key(token):
+    return f"{SESSION_PREFIX}{token}"
+
+
+class UserStore:
+    """Users and sessions in Redis, with a per-process cache of the hashed credentials."""
+
+    def __init__(self, redis_client, cache_ttl=CREDENTIALS_CACHE_TTL, session_ttl=SESSION_TTL,
+                 clock=time.monotonic):
+        self.redis = redis_client
+        self.cache_ttl = cache_ttl
+        self.session_ttl = session_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # email -> (record, time it was fetched); only existing accounts are cached
+        self._cache = {}
+        self._upgrade_hash = redis_client.register_script(_UPGRADE_HASH_SCRIPT)
+
+    def add_user(self, email, password, name, role="user"):
+        self.redis.hset(user_key(email), mapping={"password": hash_password(password), "name": name, "role": role})
+        self.invalidate(email)
+
+    def seed(self, users=DEFAULT_USERS):
+        """Create ``users`` that do not exist yet; existing accounts are left untouched."""
+        pipe = self.redis.pipeline(transaction=False)
+        for email, user in users.items():
+            for field, value in (("password", hash_password(user["password"])), ("name", user["name"]),
+                                 ("role", user["role"])):
+                pipe.hsetnx(user_key(email), field, value)
+        pipe.execute()
+
+    def invalidate(self, email):
+        with self._lock:
+            self._cache.pop(email, None)
+
+    def _credentials(self, email):
+        now = self._clock()
+        with self._lock:
+            cached = self._cache.get(email)
+        if cached is not None and now - cached[1] < self.cache_ttl:
+            return cached[0]
+        record = self.redis.hgetall(user_key(email)) or None
+        if record is not None:
+            # Misses are not cached: an account added on another process must work at once
+            with self._lock:
+                self._cache[email] = (record, now)
+        return record
+
+    def authenticate(self, email, password):
+        """The user's ``{"email", "name", "role"}`` if ``password`` matches, else ``None``."""
+        record = self._credentials(email)
+        if record is None or not verify_password(password, record["password"]):
+            return None
+        if not record["password"].startswith("scrypt$"):
+            self._upgrade_hash(keys=[user_key(email)], args=[record["password"], hash_password(password)])
+            self.invalidate(email)
+        return {"email": email, "name": record["name"], "role": record["role"]}
+
+    def create_session(self, user):
+        token = secrets.token_urlsafe(32)
+        self.redis.set(session_key(token), json.dumps(user), ex=self.session_ttl)
+        return token
+
+    def get_session(self, token):
+        """The user logged in with ``token``, or ``None``; each use extends the session."""
+        payload = self.redis.getex(session_key(token), ex=self.session_ttl)
+        return json.loads(payload) if payload else None
+
+    def end_session(self, token):
+        self.redis.delete(session_key(token))
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from resources import get_redis_client
+
+    parser = argparse.ArgumentParser(description="Manage operator accounts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Create a user or reset their password")
+    add.add_argument("email")
+    add.add_argument("--name", required=True)
+    add.add_argument("--role", choices=("admin", "user"), default="user")
+    args = parser.parse_args()
+    load_dotenv()
+
+    UserStore(get_redis_client()).add_user(args.email, getpass.getpass("Password: "), args.name, args.role)
+    print(f"Saved {args.email}")
+
+
+if __name__ == "__main__":
+    main()